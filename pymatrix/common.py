@@ -0,0 +1,317 @@
+""" Characters, colors and frames shared by the rain and its outputs. """
+import collections
+import curses
+import queue
+import threading
+
+from typing import Optional
+from typing import Tuple
+
+CHAR_LIST = ["a", "b", "c", "d", "e", "f", "g", "h", "i", "j", "k", "l", "m",
+             "n", "o", "p", "q", "r", "s", "t", "u", "v", "w", "x", "y", "z",
+             "A", "B", "C", "D", "E", "F", "G", "H", "I", "J", "K", "L", "M",
+             "N", "O", "P", "Q", "R", "S", "T", "U", "V", "W", "X", "Y", "Z",
+             "0", "1", "2", "3", "4", "5", "6", "7", "8", "9", "!", "#", "$",
+             "%", "^", "&", "(", ")", "-", "+", "=", "[", "]", "{", "}", "|",
+             ";", ":", "<", ">", ",", ".", "?", "~", "`", "@", "*", "_", "'",
+             "\\", "/", '"']
+
+EXT_CHAR_LIST = ["Ç", "È", "Ì", "Í", "Ð", "Ñ", "Ò", "×", "Ø", "Ù", "Ú", "Ý",
+                 "Þ", "ß", "à", "£", "¤", "¥", "§", "ª", "¶", "º", "»", "¿",
+                 "Ä", "Å", "é", "ê", "í", "ï", "å", "æ", "ç", "è", "ð", "ñ",
+                 "ò", "ö", "ø", "ù", "ý", "þ", "ā", "ć", "ĉ", "ė", "ě", "ĝ",
+                 "ģ", "ħ", "ī", "ı", "ķ", "Ľ", "Ł", "ł", "ń", "ň", "ō", "Œ",
+                 "œ", "ŕ", "ŗ", "ś", "ŝ", "š", "ť", "ū", "ų", "Ÿ", "ź", "ż",
+                 "Ž", "ž", "ș", "ț", "ë", "Ĉ", "Ď", "ď", "Ġ", "Ř", "°", "«",
+                 "±", "Δ", "Ξ", "Λ", ]
+
+KATAKANA_CHAR_LIST = ["ｦ", "ｱ", "ｳ", "ｴ", "ｵ", "ｶ", "ｷ", "ｹ", "ｺ", "ｻ", "ｼ",
+                      "ｽ", "ｾ", "ｿ", "ﾀ", "ﾂ", "ﾃ", "ﾅ", "ﾆ", "ﾇ", "ﾈ", "ﾊ",
+                      "ﾋ", "ﾎ", "ﾏ", "ﾐ", "ﾑ", "ﾒ", "ﾓ", "ﾔ", "ﾕ", "ﾗ", "ﾘ",
+                      "ﾜ", "ﾍ", "ｲ", "ｸ", "ﾁ", "ﾄ", "ﾉ", "ﾌ", "ﾖ", "ﾙ", "ﾚ",
+                      "ﾛ", "ﾝ"]
+
+KATAKANA_CHAR_LIST_ADDON = ["0", "1", "2", "3", "4", "5", "7", "8", "9", "Z",
+                            ":", ".", "=", "*", "+", "-", "<", ">"]
+
+
+# the lowest bit of the color pair in a curses attribute
+COLOR_SHIFT = (curses.A_COLOR & -curses.A_COLOR).bit_length() - 1
+
+
+RECORD_QUEUE = 256  # frames waiting to be written while recording
+
+
+class PyMatrixError(Exception):
+    pass
+
+
+class Colors:
+    """
+    Color pairs. On a terminal the pairs are set up in curses. Running
+    headless there is no terminal, so the pairs are only remembered.
+    Attributes are made and read with the layout curses uses, so that
+    works without a terminal. Each MatrixEngine has color pairs of its
+    own, the pairs here are those set up on the terminal.
+    """
+    pairs = {}
+    headless = False
+
+    @classmethod
+    def init_pair(cls, pair: int, fg: int, bg: int) -> None:
+        cls.pairs[pair] = (fg, bg)
+        if not cls.headless:
+            curses.init_pair(pair, fg, bg)
+
+    @classmethod
+    def init_pairs(cls, pairs: dict) -> None:
+        """ Sets up every pair of pairs, {pair: (fg, bg)}. """
+        for pair, (fg, bg) in pairs.items():
+            cls.init_pair(pair, fg, bg)
+
+    @classmethod
+    def color_pair(cls, pair: int) -> int:
+        return pair << COLOR_SHIFT
+
+    @classmethod
+    def pair_number(cls, attr: int) -> int:
+        return (attr & curses.A_COLOR) >> COLOR_SHIFT
+
+
+class FrameWriter:
+    """
+    Writes frames to the screen on its own thread so the next frame can be
+    simulated while the last one is flushed to the terminal. The write
+    syscalls made by refresh() release the GIL. The queue holds one frame
+    so a slow terminal blocks the main loop instead of building up latency.
+    """
+    def __init__(self, max_frames: int = 1):
+        self.jobs = queue.Queue(max_frames)
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                return
+            try:
+                job[0](*job[1:])
+            except Exception as e:
+                self.error = self.error or e
+            finally:
+                self.jobs.task_done()
+
+    def check(self) -> None:
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def submit(self, func, *args) -> None:
+        self.check()
+        self.jobs.put((func, *args))
+
+    def busy(self) -> bool:
+        with self.jobs.mutex:
+            return self.jobs.unfinished_tasks > 0
+
+    def wait(self) -> None:
+        """ Blocks until every submitted frame is on the screen. """
+        self.jobs.join()
+        self.check()
+
+    def close(self) -> None:
+        self.jobs.put(None)
+        self.thread.join()
+
+
+def color_palette() -> dict:
+    """ Returns the foreground and background of the color pairs. """
+    return dict(Colors.pairs)
+
+
+def record_attr(attr: int, palette: dict) -> Tuple[int, int, int]:
+    """
+    Returns the foreground, background and flags an attribute is shown
+    with. Cells without a color pair use the background pair.
+    """
+    fg, bg = palette.get(Colors.pair_number(attr), palette[1])
+    flags = 0
+    if attr & curses.A_BOLD:
+        flags += 1
+    if attr & curses.A_ITALIC:
+        flags += 2
+    return fg, bg, flags
+
+
+class Palette:
+    """
+    The colors of the color pairs at one point in time. The colors and
+    escape sequences of attributes are worked out once and kept. A new
+    palette is made whenever the pairs may have changed, so outputs only
+    need to check whether a frame's palette is the one they last saw.
+    """
+    def __init__(self, pairs: dict):
+        self.pairs = pairs
+        self.attrs = {}
+        self.escapes = {}
+
+    def colors(self, attr: int) -> Tuple[int, int, int]:
+        colors = self.attrs.get(attr)
+        if colors is None:
+            colors = self.attrs[attr] = record_attr(attr, self.pairs)
+        return colors
+
+    def escape(self, attr: int) -> str:
+        text = self.escapes.get(attr)
+        if text is None:
+            text = self.escapes[attr] = sgr(self.colors(attr))
+        return text
+
+
+class FrameDelta:
+    """
+    One frame as handed to the outputs. cells holds the cells that changed,
+    or every cell shown when redraw is set, after a clear or when the
+    colors may have changed. shown is the whole screen after the frame and
+    may only be used while the frame is handed out. Encodings that several
+    outputs use are made once by the first one and kept.
+    """
+    def __init__(self, size: Tuple[int, int], cells: dict, redraw: bool,
+                 palette: Palette, shown: Optional[dict] = None):
+        self.size = size
+        self.cells = cells
+        self.redraw = redraw
+        self.palette = palette
+        self.shown = shown
+        self.encoded = None
+
+    def ansi(self) -> str:
+        """ Returns the ANSI escape sequences that draw the frame. """
+        if self.encoded is None:
+            text = ansi_cells(self.cells, self.palette.escape)
+            if self.redraw:
+                text = self.palette.escape(0) + "\x1b[2J" + text
+            self.encoded = text
+        return self.encoded
+
+    def merge(self, later: "FrameDelta") -> "FrameDelta":
+        """ Returns one frame with the changes of this and a later frame. """
+        if later.redraw:
+            return later
+        cells = dict(self.cells)
+        cells.update(later.cells)
+        return FrameDelta(later.size, cells, self.redraw, later.palette)
+
+
+class SinkWriter:
+    """
+    Hands frames to an output on its own thread. At most max_frames wait
+    to be written. When the output falls further behind, new frames are
+    merged into the last waiting one, so a slow output skips frames
+    instead of holding up the main loop. With block set put() waits for
+    room instead, so no frame is lost when nobody is watching in real
+    time. Each frame comes with the time it was made.
+    """
+    def __init__(self, write, max_frames: int = RECORD_QUEUE,
+                 block: bool = False):
+        self.write = write
+        self.max_frames = max_frames
+        self.block = block
+        self.pending = collections.deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.error = None
+        self.merged = 0
+        self.writing = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                seconds, delta = self.pending.popleft()
+                self.writing = True
+            try:
+                self.write(seconds, delta)
+            except Exception as e:
+                self.error = self.error or e
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+
+    def check(self) -> None:
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def put(self, seconds: float, delta: FrameDelta) -> None:
+        self.check()
+        with self.condition:
+            while self.block and len(self.pending) >= self.max_frames:
+                self.condition.wait()
+            if len(self.pending) >= self.max_frames:
+                self.pending[-1] = (seconds, self.pending[-1][1].merge(delta))
+                self.merged += 1
+            else:
+                self.pending.append((seconds, delta))
+                self.condition.notify_all()
+
+    def wait(self) -> None:
+        """ Waits until the waiting frames are written. """
+        with self.condition:
+            while self.pending or self.writing:
+                self.condition.wait()
+
+    def close(self) -> None:
+        """ Writes the waiting frames and stops the thread. """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+
+
+def sgr(colors: Tuple[int, int, int]) -> str:
+    """ Returns the SGR escape sequence for foreground, background, flags. """
+    fg, bg, flags = colors
+    codes = ["0"]
+    if flags & 1:
+        codes.append("1")
+    if flags & 2:
+        codes.append("3")
+    if fg < 0:
+        codes.append("39")
+    else:
+        codes.append(f"3{fg}" if fg < 8 else f"38;5;{fg}")
+    if bg < 0:
+        codes.append("49")
+    else:
+        codes.append(f"4{bg}" if bg < 8 else f"48;5;{bg}")
+    return f"\x1b[{';'.join(codes)}m"
+
+
+def ansi_cells(cells: dict, escape) -> str:
+    """
+    Returns the ANSI escape sequences that draw the cells. escape returns
+    the SGR sequence for an attribute. The cursor is only moved when the
+    next cell does not follow the last one.
+    """
+    out = []
+    position = None
+    last_sgr = None
+    for (y, x), (char, attr) in sorted(cells.items()):
+        if (y, x) != position:
+            out.append(f"\x1b[{y + 1};{x + 1}H")
+        attr_sgr = escape(attr)
+        if attr_sgr != last_sgr:
+            out.append(attr_sgr)
+            last_sgr = attr_sgr
+        out.append(char)
+        position = (y, x + 1)
+    return "".join(out)
@@ -0,0 +1,170 @@
+""" BDF and PSF fonts for drawing the rain in pixels. """
+import gzip
+import struct
+
+from typing import Tuple
+
+from pymatrix.common import CHAR_LIST
+from pymatrix.common import EXT_CHAR_LIST
+from pymatrix.common import KATAKANA_CHAR_LIST
+from pymatrix.common import KATAKANA_CHAR_LIST_ADDON
+from pymatrix.common import PyMatrixError
+
+PSF1_MAGIC = b"\x36\x04"
+PSF2_MAGIC = b"\x72\xb5\x4a\x86"
+
+
+def read_bdf(text: str, wanted: set) -> Tuple[int, int, dict]:
+    """
+    Reads the wanted characters from a BDF font. Returns the cell width and
+    height and the glyphs as rows of bits, the left pixel being the high bit.
+    """
+    width = height = x_offset = y_offset = 0
+    ascent = None
+    glyphs = {}
+    encoding = -1
+    bbx = None
+    lines = iter(text.splitlines())
+    for line in lines:
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0] == "FONTBOUNDINGBOX":
+            width, height, x_offset, y_offset = map(int, parts[1:5])
+        elif parts[0] == "FONT_ASCENT":
+            ascent = int(parts[1])
+        elif parts[0] == "STARTCHAR":
+            encoding = -1
+            bbx = None
+        elif parts[0] == "ENCODING":
+            encoding = int(parts[1])
+        elif parts[0] == "BBX":
+            bbx = [int(v) for v in parts[1:5]]
+        elif parts[0] == "BITMAP":
+            data = []
+            for line in lines:
+                if line.strip() == "ENDCHAR":
+                    break
+                data.append(line.strip())
+            if encoding < 0 or chr(encoding) not in wanted:
+                continue
+            if ascent is None:
+                ascent = height + y_offset
+            glyph_width, glyph_height, glyph_x, glyph_y = bbx or [
+                width, height, x_offset, y_offset]
+            top = ascent - (glyph_height + glyph_y)
+            shift = width - (glyph_x - x_offset) - glyph_width
+            rows = [0] * height
+            for i, hex_row in enumerate(data):
+                if not 0 <= top + i < height or not hex_row:
+                    continue
+                bits = int(hex_row, 16) >> (len(hex_row) * 4 - glyph_width)
+                bits = bits << shift if shift >= 0 else bits >> -shift
+                rows[top + i] = bits & ((1 << width) - 1)
+            glyphs[chr(encoding)] = tuple(rows)
+    if not width or not height:
+        raise ValueError("no FONTBOUNDINGBOX")
+    return width, height, glyphs
+
+
+def read_psf(data: bytes, wanted: set) -> Tuple[int, int, dict]:
+    """
+    Reads the wanted characters from a PSF 1 or 2 console font. Fonts
+    without a unicode table map glyph numbers to code points.
+    """
+    if data[:2] == PSF1_MAGIC:
+        mode, height = data[2], data[3]
+        width = 8
+        count = 512 if mode & 1 else 256
+        offset = 4
+        has_table = mode & 6
+        row_bytes = 1
+    elif data[:4] == PSF2_MAGIC:
+        _, _, offset, flags, count, _, height, width = struct.unpack_from(
+            "<8I", data)
+        has_table = flags & 1
+        row_bytes = (width + 7) // 8
+    else:
+        raise ValueError("not a psf font")
+    glyph_size = row_bytes * height
+    table = offset + count * glyph_size
+    if has_table and data[:2] == PSF1_MAGIC:
+        entries = struct.unpack_from(f"<{(len(data) - table) // 2}H", data,
+                                     table)
+        chars = []
+        current = []
+        sequence = False
+        for entry in entries:
+            if entry == 0xFFFF:
+                chars.append(current)
+                current = []
+                sequence = False
+            elif entry == 0xFFFE:
+                sequence = True
+            elif not sequence:
+                current.append(chr(entry))
+    elif has_table:
+        chars = []
+        for entry in data[table:].split(b"\xff")[:count]:
+            chars.append(list(entry.split(b"\xfe")[0].decode("utf-8")))
+    else:
+        chars = [[chr(i)] for i in range(count)]
+    glyphs = {}
+    for i, glyph_chars in enumerate(chars[:count]):
+        glyph_chars = [c for c in glyph_chars if c in wanted]
+        if not glyph_chars:
+            continue
+        start = offset + i * glyph_size
+        rows = tuple(
+            int.from_bytes(data[start + r * row_bytes:
+                                start + (r + 1) * row_bytes], "big")
+            >> (row_bytes * 8 - width)
+            for r in range(height))
+        for char in glyph_chars:
+            glyphs[char] = rows
+    return width, height, glyphs
+
+
+class GlyphAtlas:
+    """
+    Glyph bitmaps for every character the rain can show, read once from a
+    BDF or PSF font. Each glyph is a row of bits per pixel row of the cell.
+    Characters missing from the font are drawn blank. Each font file is
+    only read once.
+    """
+    CHARS = set(CHAR_LIST + EXT_CHAR_LIST + KATAKANA_CHAR_LIST
+                + KATAKANA_CHAR_LIST_ADDON
+                + [chr(c) for c in range(32, 127)])
+    loaded = {}
+
+    def __init__(self, width: int, height: int, glyphs: dict):
+        self.width = width
+        self.height = height
+        self.glyphs = glyphs
+        self.blank = (0,) * height
+
+    @classmethod
+    def load(cls, path: str) -> "GlyphAtlas":
+        if path not in cls.loaded:
+            cls.loaded[path] = cls.read(path)
+        return cls.loaded[path]
+
+    @classmethod
+    def read(cls, path: str) -> "GlyphAtlas":
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            raise PyMatrixError(f"Error reading {path}: {e.strerror}")
+        try:
+            if data[:2] == b"\x1f\x8b":
+                data = gzip.decompress(data)
+            if data[:2] == PSF1_MAGIC or data[:4] == PSF2_MAGIC:
+                return cls(*read_psf(data, cls.CHARS))
+            return cls(*read_bdf(data.decode("latin-1"), cls.CHARS))
+        except (ValueError, IndexError, TypeError, struct.error, OSError,
+                EOFError):
+            raise PyMatrixError(f"Error {path} is not a BDF or PSF font.")
+
+    def rows(self, char: str) -> Tuple[int, ...]:
+        return self.glyphs.get(char, self.blank)
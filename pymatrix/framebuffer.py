@@ -0,0 +1,95 @@
+""" Drawing the rain straight into a Linux framebuffer. """
+import mmap
+import os
+
+from typing import Tuple
+
+from pymatrix.common import FrameDelta
+from pymatrix.common import PyMatrixError
+from pymatrix.fonts import GlyphAtlas
+from pymatrix.video import attr_rgb
+from pymatrix.video import PixelCanvas
+from pymatrix.video import PixelPlane
+
+
+def rgb565(rgb: Tuple[int, int, int]) -> bytes:
+    red, green, blue = rgb
+    value = (red >> 3) << 11 | (green >> 2) << 5 | blue >> 3
+    return value.to_bytes(2, "little")
+
+
+def rgb_bgr(rgb: Tuple[int, int, int]) -> bytes:
+    return bytes((rgb[2], rgb[1], rgb[0]))
+
+
+def rgb_bgrx(rgb: Tuple[int, int, int]) -> bytes:
+    return bytes((rgb[2], rgb[1], rgb[0], 0))
+
+
+# Pixel encoding of the Linux framebuffer by bits per pixel.
+FRAMEBUFFER_FORMATS = {16: rgb565, 24: rgb_bgr, 32: rgb_bgrx}
+
+
+def framebuffer_layout(path: str) -> dict:
+    """
+    Returns the size, bits per pixel and stride of a Linux framebuffer
+    device from sysfs. Returns what could be read, nothing for other files.
+    """
+    name = os.path.basename(os.path.realpath(path))
+    sysfs = os.path.join("/sys/class/graphics", name)
+    layout = {}
+    try:
+        with open(os.path.join(sysfs, "virtual_size")) as f:
+            width, height = f.read().strip().split(",")
+            layout["size"] = (int(width), int(height))
+        with open(os.path.join(sysfs, "bits_per_pixel")) as f:
+            layout["bpp"] = int(f.read())
+        with open(os.path.join(sysfs, "stride")) as f:
+            layout["stride"] = int(f.read())
+    except (OSError, ValueError):
+        pass
+    return layout
+
+
+class FramebufferWriter:
+    """
+    Draws frames straight into a memory mapped framebuffer, such as
+    /dev/fb0, or any file at least stride * height bytes long. Only the
+    cells changed by a frame are copied from the glyph cache into the
+    mapping, so a frame costs the same whatever the screen size. The
+    whole screen is only drawn after a clear or when the colors change.
+    """
+    def __init__(self, path: str, size: Tuple[int, int], bpp: int,
+                 stride: int, atlas: GlyphAtlas):
+        width, height = size
+        length = stride * height
+        try:
+            with open(path, "r+b") as f:
+                file_size = os.fstat(f.fileno()).st_size
+                if 0 < file_size < length:
+                    raise PyMatrixError(f"Error {path} is smaller than "
+                                        f"{length} bytes.")
+                self.map = mmap.mmap(f.fileno(), length)
+        except OSError as e:
+            raise PyMatrixError(f"Error opening {path}: {e.strerror}")
+        except ValueError:
+            raise PyMatrixError(f"Error {path} can not be memory mapped.")
+        plane = PixelPlane(self.map, 0, stride, bpp // 8,
+                           FRAMEBUFFER_FORMATS[bpp])
+        self.canvas = PixelCanvas(atlas, width, height, [plane])
+        self.palette = None
+
+    def colors(self, attr: int):
+        return attr_rgb(self.palette.colors(attr))
+
+    def record(self, delta: FrameDelta) -> None:
+        if delta.palette is not self.palette:
+            self.palette = delta.palette
+            self.canvas.cache.clear()
+        if delta.redraw:
+            self.canvas.fill(self.colors(0)[1])
+        self.canvas.draw(delta.cells, self.colors)
+
+    def close(self) -> None:
+        self.canvas.fill((0, 0, 0))
+        self.map.close()
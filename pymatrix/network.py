@@ -0,0 +1,104 @@
+""" Streaming the rain to telnet or nc clients. """
+import asyncio
+
+from pymatrix.common import ansi_cells
+from pymatrix.common import FrameDelta
+from pymatrix.common import PyMatrixError
+
+CLIENT_BUFFER = 1 << 16  # bytes queued for a --serve client before skipping
+
+
+class BroadcastClient(asyncio.Protocol):
+    """ A client of the broadcast server. Anything it sends is ignored. """
+    def __init__(self, server: "BroadcastServer"):
+        self.server = server
+        self.transport = None
+        self.paused = False
+        self.behind = True
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+        transport.set_write_buffer_limits(high=CLIENT_BUFFER)
+        self.server.connect(self)
+
+    def connection_lost(self, exc) -> None:
+        self.server.clients.discard(self)
+
+    def pause_writing(self) -> None:
+        self.paused = True
+        self.behind = True
+
+    def resume_writing(self) -> None:
+        self.paused = False
+
+
+class BroadcastServer:
+    """
+    Streams the frames as ANSI escape sequences to any number of TCP
+    clients, such as telnet or nc. Each frame is encoded once and the same
+    bytes are written to every client. New clients get the whole screen
+    first and then the changes of each frame.
+
+    Writes never block. A client that has more than CLIENT_BUFFER bytes
+    waiting is skipped until it has caught up, and then gets the whole
+    screen again, so the frames it missed are merged into one.
+    """
+    def __init__(self):
+        self.server = None
+        self.clients = set()
+        self.shown = {}
+        self.size = None
+        self.palette = None
+
+    async def start(self, host: str, port: int) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            self.server = await loop.create_server(
+                lambda: BroadcastClient(self), host, port)
+        except (OSError, OverflowError) as e:
+            raise PyMatrixError(f"Error serving on port {port}: "
+                                f"{getattr(e, 'strerror', None) or e}")
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    def screen(self) -> bytes:
+        """ Returns the escape sequences that draw the whole screen. """
+        if self.size is None:
+            return b""
+        escape = self.palette.escape
+        return ("\x1b[?25l" + escape(0) + "\x1b[2J"
+                + ansi_cells(self.shown, escape)).encode()
+
+    def connect(self, client: BroadcastClient) -> None:
+        self.clients.add(client)
+        if self.size is not None:
+            client.transport.write(self.screen())
+            client.behind = False
+
+    def record(self, delta: FrameDelta) -> None:
+        self.shown = delta.shown
+        self.size = delta.size
+        self.palette = delta.palette
+        whole = changes = None
+        for client in self.clients:
+            if client.paused:
+                continue
+            if client.behind or delta.redraw:
+                if whole is None:
+                    whole = (b"\x1b[?25l" + delta.ansi().encode()
+                             if delta.redraw else self.screen())
+                client.transport.write(whole)
+                client.behind = False
+            else:
+                if changes is None:
+                    changes = delta.ansi().encode()
+                client.transport.write(changes)
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+        for client in list(self.clients):
+            client.transport.write(b"\x1b[0m\x1b[2J\x1b[H\x1b[?25h")
+            client.transport.close()
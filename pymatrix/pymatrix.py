@@ -1,52 +1,60 @@
 #! /usr/bin/python3
 """ Matrix style rain using Python 3 and curses. """
 import argparse
+import array
+import asyncio
 import curses
-import datetime
+import hashlib
+import json
+import mmap
+import multiprocessing
+import os
 import random
+import shutil
+import signal
+import stat
+import struct
 import sys
+import tempfile
 import time
 
+from typing import Dict
+from typing import Iterator
 from typing import List
 from typing import Optional
 from typing import Sequence
 from typing import Tuple
 from typing import Union
 
+from pymatrix.common import ansi_cells
+from pymatrix.common import CHAR_LIST
+from pymatrix.common import color_palette
+from pymatrix.common import Colors
+from pymatrix.common import EXT_CHAR_LIST
+from pymatrix.common import FrameDelta
+from pymatrix.common import FrameWriter
+from pymatrix.common import KATAKANA_CHAR_LIST
+from pymatrix.common import KATAKANA_CHAR_LIST_ADDON
+from pymatrix.common import Palette
+from pymatrix.common import PyMatrixError
+from pymatrix.common import SinkWriter
+from pymatrix.fonts import GlyphAtlas
+from pymatrix.framebuffer import FRAMEBUFFER_FORMATS
+from pymatrix.framebuffer import framebuffer_layout
+from pymatrix.framebuffer import FramebufferWriter
+from pymatrix.network import BroadcastServer
+from pymatrix.network import CLIENT_BUFFER
+from pymatrix.video import VideoWriter
+
 if sys.version_info >= (3, 8):
     import importlib.metadata as importlib_metadata
+    from multiprocessing import shared_memory
 else:
     import importlib_metadata
+    shared_memory = None
 
 version = importlib_metadata.version("pymatrix-rain")
 
-CHAR_LIST = ["a", "b", "c", "d", "e", "f", "g", "h", "i", "j", "k", "l", "m",
-             "n", "o", "p", "q", "r", "s", "t", "u", "v", "w", "x", "y", "z",
-             "A", "B", "C", "D", "E", "F", "G", "H", "I", "J", "K", "L", "M",
-             "N", "O", "P", "Q", "R", "S", "T", "U", "V", "W", "X", "Y", "Z",
-             "0", "1", "2", "3", "4", "5", "6", "7", "8", "9", "!", "#", "$",
-             "%", "^", "&", "(", ")", "-", "+", "=", "[", "]", "{", "}", "|",
-             ";", ":", "<", ">", ",", ".", "?", "~", "`", "@", "*", "_", "'",
-             "\\", "/", '"']
-
-EXT_CHAR_LIST = ["Ç", "È", "Ì", "Í", "Ð", "Ñ", "Ò", "×", "Ø", "Ù", "Ú", "Ý",
-                 "Þ", "ß", "à", "£", "¤", "¥", "§", "ª", "¶", "º", "»", "¿",
-                 "Ä", "Å", "é", "ê", "í", "ï", "å", "æ", "ç", "è", "ð", "ñ",
-                 "ò", "ö", "ø", "ù", "ý", "þ", "ā", "ć", "ĉ", "ė", "ě", "ĝ",
-                 "ģ", "ħ", "ī", "ı", "ķ", "Ľ", "Ł", "ł", "ń", "ň", "ō", "Œ",
-                 "œ", "ŕ", "ŗ", "ś", "ŝ", "š", "ť", "ū", "ų", "Ÿ", "ź", "ż",
-                 "Ž", "ž", "ș", "ț", "ë", "Ĉ", "Ď", "ď", "Ġ", "Ř", "°", "«",
-                 "±", "Δ", "Ξ", "Λ", ]
-
-KATAKANA_CHAR_LIST = ["ｦ", "ｱ", "ｳ", "ｴ", "ｵ", "ｶ", "ｷ", "ｹ", "ｺ", "ｻ", "ｼ",
-                      "ｽ", "ｾ", "ｿ", "ﾀ", "ﾂ", "ﾃ", "ﾅ", "ﾆ", "ﾇ", "ﾈ", "ﾊ",
-                      "ﾋ", "ﾎ", "ﾏ", "ﾐ", "ﾑ", "ﾒ", "ﾓ", "ﾔ", "ﾕ", "ﾗ", "ﾘ",
-                      "ﾜ", "ﾍ", "ｲ", "ｸ", "ﾁ", "ﾄ", "ﾉ", "ﾌ", "ﾖ", "ﾙ", "ﾚ",
-                      "ﾛ", "ﾝ"]
-
-KATAKANA_CHAR_LIST_ADDON = ["0", "1", "2", "3", "4", "5", "7", "8", "9", "Z",
-                            ":", ".", "=", "*", "+", "-", "<", ">"]
-
 
 DELAY_SPEED = {0: 0.005, 1: 0.01, 2: 0.025, 3: 0.04, 4: 0.055, 5: 0.07,
                6: 0.085, 7: 0.1, 8: 0.115, 9: 0.13}
@@ -54,6 +62,10 @@ DELAY_SPEED = {0: 0.005, 1: 0.01, 2: 0.025, 3: 0.04, 4: 0.055, 5: 0.07,
 CURSES_CH_CODES_CYCLE_DELAY = {41: 1, 33: 2, 64: 3, 35: 4, 36: 5, 37: 6,
                                94: 7, 38: 8, 42: 9, 40: 10}
 
+DIRECTION_KEYS = {261: "right", 260: "left", 259: "up", 258: "down"}
+# --control command words for the keys that are not characters
+CONTROL_WORDS = {"up": 259, "down": 258, "left": 260, "right": 261}
+
 CURSES_COLOR = {"red": curses.COLOR_RED, "green": curses.COLOR_GREEN,
                 "blue": curses.COLOR_BLUE, "yellow": curses.COLOR_YELLOW,
                 "magenta": curses.COLOR_MAGENTA, "cyan": curses.COLOR_CYAN,
@@ -71,38 +83,78 @@ CURSES_CH_CODES_COLOR = {114: "red", 82: "red", 116: "green", 84: "green",
                          15: "cyan", 16: "white", 27: "black", 91: "black",
                          123: "black"}
 WAKE_UP_PAIR = 21
+# fixed point one, async scroll speeds are in 1/SPEED_ONE cells a frame
+SPEED_ONE = 1 << 16
+# full screen redraws a second at most, for colors changed by keys
+REPAINTS_PER_SECOND = 4
+# seconds between the reads of the frame delay by wake_up_timer
+WAKE_UP_POLL = 0.25
 MIN_SCREEN_SIZE_Y = 10
 MIN_SCREEN_SIZE_X = 10
-
-
-class PyMatrixError(Exception):
-    pass
+RECORD_MAGIC = b"PYMX"
+RECORD_VERSION = 1
+RECORD_BUFFER = 1 << 20
+KEYFRAME_INTERVAL = 5000  # milliseconds of recording between keyframes
+DELTA = 0
+KEYFRAME = 1
+FRAME_HEADER = struct.Struct("<BII")  # kind, time in ms, number of cells
+KEYFRAME_HEADER = struct.Struct("<HHH")  # rows, columns, background attr
+RECORD_ATTR = struct.Struct("<hhB")  # foreground, background, flags
+RECORD_FOOTER = struct.Struct("<Q4s")  # trailer offset, magic
+SEEK_STEP = 10000  # milliseconds skipped by the arrow keys during play
+LOOP_MAGIC = b"PYML"
+LOOP_VERSION = 1
+LOOP_HEADER = struct.Struct("<4sHHHId")  # magic, version, rows, columns,
+# frames, frame delay
+LOOP_CACHE_FILES = 8  # loops kept in the cache, the most recently used
+# Options that do not change the picture of a --loop.
+LOOP_IGNORED = {"screen_saver", "disable_keys", "start_timer", "run_timer",
+                "pipeline", "cpu_budget", "status", "record", "play",
+                "play_speed", "asciicast", "ansi", "headless", "frames",
+                "size", "workers", "jobs", "video", "video_format",
+                "video_size", "video_fps", "font", "framebuffer", "fb_size",
+                "fb_bpp", "fb_stride", "shared_memory", "serve", "serve_host",
+                "wall", "wall_columns", "wall_tile", "control",
+                "loop_cache",
+                "list_colors", "list_commands", "wakeup"}
+CONTROL_LINE = 1024  # longest --control command line
+# redraw, ANSI bytes, cells and color pairs of a tile
+TILE_HEADER = struct.Struct("<?III")
+TILE_RECORD = struct.Struct("<HHII")  # row, column, code point, attribute
+TILE_PAIR = struct.Struct("<Hhh")  # pair, foreground, background
+SHARED_MAGIC = b"PYMS"
+SHARED_VERSION = 1
+# magic, version, glyphs, sequence, frame, columns, rows, cell size
+SHARED_HEADER = struct.Struct("<4sHHQQHHH2x")
+SHARED_CELL = struct.Struct("<HhhH")  # glyph, foreground, background, flags
 
 
 class SingleLine:
-    def __init__(self, y: int, x: int, width: int, height: int, direction: str):
+    def __init__(self, y: int, x: int, width: int, height: int, direction: str,
+                 rng=random):
         self.direction = direction
         self.height = height - 2
         self.width = width - 1
-        self.async_scroll_count = 0
-        self.async_scroll_rate = random.randint(0, 4)
-        self.line_color_number = random.randint(1, 7)  # keep for now
+        # For async scroll, in 1/SPEED_ONE cells a frame at the set delay.
+        self.speed = rng.randint(SPEED_ONE // 5, SPEED_ONE)
+        self.travel = 0
+        self.line_color_number = rng.randint(1, 7)  # keep for now
         if direction == "down":
             self.lead_y = 0
             self.y = -1
             self.x = x
-            length = random.randint(3, height - 3)
+            length = rng.randint(3, height - 3)
             self.last_y = -length  # track when to start removing characters
         elif direction == "up":
             self.lead_y = height - 2
             self.y = height - 1
             self.x = x
-            length = random.randint(3, height - 3)
+            length = rng.randint(3, height - 3)
             self.last_y = height - 3 + length
         elif direction == "right":
             self.lead_x = 0
             self.x = -1
-            length = random.randint(3, width - 3)
+            length = rng.randint(3, width - 3)
             self.last_x = -length
             self.y = y
             self.lead_y = 0
@@ -110,7 +162,7 @@ class SingleLine:
         elif direction == "left":
             self.lead_x = width - 2
             self.x = width - 1
-            length = random.randint(3, width - 3)
+            length = rng.randint(3, width - 3)
             self.last_x = width - 2 + length
             self.y = y
             self.lead_y = 0
@@ -234,29 +286,38 @@ class SingleLine:
             else:
                 return False
 
-    def async_scroll_turn(self) -> bool:
-        if self.async_scroll_count == self.async_scroll_rate:
-            self.async_scroll_count = 0
-            return True
-        else:
-            self.async_scroll_count += 1
-            return False
+    def moves(self, ticks: int) -> int:
+        """
+        Used by async scroll. Returns how many cells the line moves on in
+        ticks, the time passed in 1/SPEED_ONE frames at the set delay. The
+        part of a cell left over is kept for the next time.
+        """
+        moves, self.travel = divmod(self.travel + self.speed * ticks,
+                                    SPEED_ONE * SPEED_ONE)
+        return moves
 
 
 class OldScrollingLine:
     old_scroll_chr_list = []
+    direction = "old scrolling"
 
-    def __init__(self, x: int, width: int, height: int):
+    def __init__(self, x: int, width: int, height: int,
+                 char_list: Optional[List[str]] = None, rng=random):
         self.height = height - 2
         self.width = width - 1
         self.y = -1
         self.x = x
-        self.length = random.randint(3, height - 3)
+        # Without a char_list the class wide list is used.
+        if char_list is None:
+            char_list = OldScrollingLine.old_scroll_chr_list
+        self.char_list = char_list
+        self.random = rng
+        self.length = rng.randint(3, height - 3)
         self.lead_y = 0
-        self.lead_char = random.choice(OldScrollingLine.old_scroll_chr_list)
+        self.lead_char = rng.choice(char_list)
         self.location_list = []
-        self.line_color_number = random.randint(1, 7)
-        self.bold = True if random.randint(1, 3) <= 1 else False
+        self.line_color_number = rng.randint(1, 7)
+        self.bold = True if rng.randint(1, 3) <= 1 else False
 
     @classmethod
     def update_char_list(cls, updated_char_list: List[str]) -> None:
@@ -282,7 +343,7 @@ class OldScrollingLine:
                 cell[0] += 1
         if len(self.location_list) < self.length and 0 <= self.y < self.height:
             self.location_list.append(
-                [0, self.x, random.choice(OldScrollingLine.old_scroll_chr_list)]
+                [0, self.x, self.random.choice(self.char_list)]
             )
         if self.y > self.height:
             self.location_list.pop(0)
@@ -296,559 +357,2899 @@ class OldScrollingLine:
             return False
 
 
+class VirtualScreen:
+    """
+    Stands in for the curses screen when running headless. Only the size
+    is kept. Frames are seen through the recorders.
+    """
+    def __init__(self, height: int, width: int):
+        self.height = height
+        self.width = width
+
+    def getmaxyx(self) -> Tuple[int, int]:
+        return self.height, self.width
+
+    def addstr(self, y: int, x: int, text: str, attr: int = 0) -> None:
+        pass
+
+    def bkgd(self, char: str, attr: int = 0) -> None:
+        pass
+
+    def timeout(self, delay: int) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def erase(self) -> None:
+        pass
+
+    def refresh(self) -> None:
+        pass
+
+
+class FrameClock:
+    """
+    Simulated time in seconds. It advances by the frame delay after every
+    frame, so frames are timed the same whether they are shown live or
+    rendered headless as fast as possible. frames counts the frames.
+    """
+    def __init__(self):
+        self.time = 0.0
+        self.frames = 0
+
+    def __call__(self) -> float:
+        return self.time
+
+    def tick(self, seconds: float) -> None:
+        self.time += seconds
+        self.frames += 1
+
+    def advance(self, seconds: float) -> None:
+        """ Moves the time on without a frame. """
+        self.time += seconds
+
+
+def write_cells(screen, cells: dict) -> None:
+    for (y, x), (char, attr) in cells.items():
+        screen.addstr(y, x, char, attr)
+    screen.refresh()
+
+
+class FrameBuffer:
+    """
+    Collects the cells drawn during a frame and writes them to the screen.
+    Cells already showing the same character and attribute are dropped so
+    a frame without changes does not call screen.refresh(). With a writer
+    the changes are handed over as a new dict each frame and written on the
+    writer thread, so sync() must be called before using the screen
+    directly.
+
+    When the terminal can not keep up the frame is dropped. Its changes stay
+    in the buffer and are merged with the following frames into one update
+    once the terminal has caught up. Without a writer the terminal is behind
+    when the last write took longer than the frame budget. With a writer it
+    is behind while the writer is still busy with the last frame.
+
+    Every frame written to the screen is also handed to the recorders, as
+    one FrameDelta made for all of them.
+    """
+    def __init__(self,
+                 writer: Optional[FrameWriter] = None,
+                 recorders: Sequence = ()):
+        self.writer = writer
+        self.recorders = recorders
+        self.shown = {}
+        self.changes = {}
+        self.touched = False
+        self.dropped = 0
+        self.behind_until = 0.0
+        self.palette = None
+        self.redraw = True
+
+    def draw(self, y: int, x: int, char: str, attr: int = 0) -> None:
+        cell = (char, attr)
+        if self.shown.get((y, x)) == cell:
+            self.changes.pop((y, x), None)
+        else:
+            self.changes[(y, x)] = cell
+
+    def touch(self) -> None:
+        """ Forces a refresh for changes made outside of the cells. """
+        self.touched = True
+        self.redraw = True
+
+    def recolor(self, palette: Optional["Palette"] = None) -> None:
+        """
+        The color pairs changed. Later frames use the colors of palette, or
+        of the pairs in Colors when it is not given.
+        """
+        self.palette = palette
+
+    def sync(self) -> None:
+        if self.writer is not None:
+            self.writer.wait()
+
+    def clear(self, screen) -> None:
+        self.sync()
+        self.shown.clear()
+        self.changes.clear()
+        self.touched = False
+        screen.clear()
+        screen.refresh()
+        self.redraw = False
+        self.publish(screen, {}, True)
+
+    def publish(self, screen, cells: dict, redraw: bool) -> None:
+        """ Hands a frame to the recorders. """
+        if not self.recorders:
+            return
+        if self.palette is None:
+            self.palette = Palette(color_palette())
+        delta = FrameDelta(screen.getmaxyx(), cells, redraw, self.palette,
+                           self.shown)
+        for recorder in self.recorders:
+            recorder.record(delta)
+
+    def behind(self) -> bool:
+        if self.writer is not None:
+            return self.writer.busy()
+        return time.monotonic() < self.behind_until
+
+    def flush(self, screen, budget: Optional[float] = None) -> bool:
+        """
+        Writes the changes to the screen. Returns False when there was
+        nothing to write or the frame was dropped. Frames are only dropped
+        when a budget in seconds is given.
+        """
+        if not self.changes and not self.touched:
+            return False
+        if budget is not None and self.behind():
+            self.dropped += 1
+            return False
+        changes = self.changes
+        self.shown.update(changes)
+        self.changes = {}
+        self.touched = False
+        if self.redraw:
+            self.redraw = False
+            self.publish(screen, dict(self.shown), True)
+        else:
+            self.publish(screen, changes, False)
+        if isinstance(screen, VirtualScreen):
+            return True  # Headless, the frame is only seen by the recorders.
+        if self.writer is not None:
+            self.writer.submit(write_cells, screen, changes)
+            return True
+        start = time.monotonic()
+        write_cells(screen, changes)
+        write_time = time.monotonic() - start
+        if budget is not None and write_time > budget:
+            # Give the terminal the time the write ran over to catch up.
+            self.behind_until = start + 2 * write_time - budget
+        return True
+
+
+class FrameRecorder:
+    """
+    Records frames to a binary file. Each frame holds only the cells that
+    changed, as row, column, glyph index and attribute index. Attributes
+    are stored as colors so the recording does not depend on the color
+    pairs. Full keyframes are written at least every interval milliseconds
+    and whenever the screen is cleared or the colors may have changed. The
+    glyph table, the attribute table and an index with a keyframe for
+    every interval are written at the end.
+
+    Frames are encoded and written on a SinkWriter thread while the main
+    loop sleeps, and the file has a large buffer, so recording does not
+    add to the frame time. The thread keeps its own copy of the screen for
+    the keyframes.
+    """
+    def __init__(self,
+                 path: str,
+                 interval: int = KEYFRAME_INTERVAL,
+                 clock=time.monotonic,
+                 block: bool = False):
+        try:
+            self.file = open(path, "wb", buffering=RECORD_BUFFER)
+        except OSError as e:
+            raise PyMatrixError(f"Error recording to {path}: {e.strerror}")
+        self.file.write(RECORD_MAGIC + bytes([RECORD_VERSION]))
+        self.offset = len(RECORD_MAGIC) + 1
+        self.interval = interval
+        self.clock = clock
+        self.start = clock()
+        self.writer = SinkWriter(self.write, block=block)
+        # Used on the writer thread.
+        self.screen = {}
+        self.slots = 0
+        self.glyphs = {}
+        self.attrs = {}
+        self.attr_cache = {}
+        self.cache_palette = None
+        self.index = []
+
+    def now(self) -> int:
+        return int((self.clock() - self.start) * 1000)
+
+    def record(self, delta: FrameDelta) -> None:
+        self.writer.put(self.now(), delta)
+
+    def attr(self, attr: int, palette: Palette) -> int:
+        if palette is not self.cache_palette:
+            self.attr_cache.clear()
+            self.cache_palette = palette
+        index = self.attr_cache.get(attr)
+        if index is None:
+            colors = palette.colors(attr)
+            index = self.attrs.setdefault(colors, len(self.attrs))
+            self.attr_cache[attr] = index
+        return index
+
+    def write(self, ms: int, delta: FrameDelta) -> None:
+        palette = delta.palette
+        if delta.redraw:
+            self.screen = dict(delta.cells)
+        else:
+            self.screen.update(delta.cells)
+        header = b""
+        slot = ms // self.interval
+        if delta.redraw or slot >= self.slots:
+            kind = KEYFRAME
+            self.slots = slot + 1
+            while len(self.index) < slot:
+                self.index.append(self.index[-1] if self.index
+                                  else self.offset)
+            if len(self.index) == slot:
+                self.index.append(self.offset)
+            cells = {cell: value for cell, value in self.screen.items()
+                     if value[0] != " "}
+            header = KEYFRAME_HEADER.pack(*delta.size, self.attr(0, palette))
+        else:
+            kind = DELTA
+            cells = delta.cells
+        glyphs = self.glyphs
+        attr_cache = self.attr_cache
+        values = []
+        for (y, x), (char, attr) in cells.items():
+            glyph = glyphs.get(char)
+            if glyph is None:
+                glyph = glyphs[char] = len(glyphs)
+            index = attr_cache.get(attr)
+            if index is None or palette is not self.cache_palette:
+                index = self.attr(attr, palette)
+            values += (y, x, glyph, index)
+        frame = (FRAME_HEADER.pack(kind, ms, len(cells)) + header
+                 + struct.pack(f"<{len(values)}H", *values))
+        self.file.write(frame)
+        self.offset += len(frame)
+
+    def close(self) -> None:
+        self.writer.close()
+        trailer = bytearray(struct.pack("<I", len(self.glyphs)))
+        for char in self.glyphs:
+            encoded = char.encode()
+            trailer += bytes([len(encoded)]) + encoded
+        trailer += struct.pack("<I", len(self.attrs))
+        for colors in self.attrs:
+            trailer += RECORD_ATTR.pack(*colors)
+        trailer += struct.pack(f"<III{len(self.index)}Q", self.interval,
+                               self.now(), len(self.index), *self.index)
+        trailer += RECORD_FOOTER.pack(self.offset, RECORD_MAGIC)
+        self.file.write(trailer)
+        self.file.close()
+        self.writer.check()
+
+
+class AsciicastWriter:
+    """
+    Streams frames to an asciicast v2 file that can be played with
+    asciinema. Every frame is one output event holding the ANSI escape
+    sequences for the changed cells, timed by the frame clock. The first
+    frame and frames after the colors may have changed redraw the whole
+    screen, as the colors of cells already shown change with the pairs.
+
+    Events are written on a SinkWriter thread through a buffered file as
+    they arrive, so memory use stays the same however long the run is.
+    Without head the header is left out and without tail the closing
+    event, for the parts of a --jobs export.
+    """
+    def __init__(self, path: str, size: Tuple[int, int], clock,
+                 block: bool = False, head: bool = True, tail: bool = True):
+        try:
+            self.file = open(path, "w", encoding="utf-8",
+                             buffering=RECORD_BUFFER)
+        except OSError as e:
+            raise PyMatrixError(f"Error recording to {path}: {e.strerror}")
+        self.size = size
+        self.clock = clock
+        self.start = clock()
+        self.tail = tail
+        self.writer = SinkWriter(self.write, block=block)
+        if head:
+            header = {"version": 2, "width": size[1], "height": size[0],
+                      "timestamp": int(time.time()),
+                      "env": {"TERM": os.environ.get("TERM",
+                                                     "xterm-256color")}}
+            self.file.write(json.dumps(header, ensure_ascii=False) + "\n")
+            self.event(0.0, "\x1b[?25l")  # hide the cursor
+
+    def record(self, delta: FrameDelta) -> None:
+        self.writer.put(self.clock() - self.start, delta)
+
+    def write(self, seconds: float, delta: FrameDelta) -> None:
+        if delta.size != self.size:
+            self.size = delta.size
+            self.event(seconds, f"{self.size[1]}x{self.size[0]}", "r")
+        data = delta.ansi()
+        if data:
+            self.event(seconds, data)
+
+    def event(self, seconds: float, data: str, kind: str = "o") -> None:
+        self.file.write(json.dumps([round(seconds, 6), kind, data],
+                                   ensure_ascii=False) + "\n")
+
+    def close(self) -> None:
+        self.writer.close()
+        if self.tail:
+            self.event(self.clock() - self.start, "\x1b[0m\x1b[?25h")
+        self.file.close()
+        self.writer.check()
+
+
+class AnsiWriter:
+    """
+    Writes the frames as ANSI escape sequences to a file, a pipe or
+    another terminal, such as /dev/pts/3 to show the rain there as well.
+    The same escape sequences are shared with the other outputs. They are
+    written on a SinkWriter thread through a large buffer that is flushed
+    whenever no frame is waiting, so a slow terminal skips frames instead
+    of holding up the rain and a fast run writes in large blocks.
+    written counts the bytes written. Without head and tail the cursor is
+    not hidden at the start and shown at the end, for the parts of a
+    --jobs export.
+    """
+    def __init__(self, path: str, block: bool = False, head: bool = True,
+                 tail: bool = True):
+        try:
+            if path == "-":
+                self.file = open(sys.stdout.fileno(), "wb",
+                                 buffering=RECORD_BUFFER, closefd=False)
+            else:
+                self.file = open(path, "wb", buffering=RECORD_BUFFER)
+        except OSError as e:
+            raise PyMatrixError(f"Error writing to {path}: {e.strerror}")
+        self.writer = SinkWriter(self.write, block=block)
+        self.written = 0
+        self.tail = tail
+        if head:
+            self.file.write(b"\x1b[?25l")  # hide the cursor
+
+    def record(self, delta: FrameDelta) -> None:
+        self.writer.put(0.0, delta)
+
+    def write(self, seconds: float, delta: FrameDelta) -> None:
+        data = delta.ansi().encode()
+        self.file.write(data)
+        self.written += len(data)
+        if not self.writer.pending:
+            self.file.flush()
+
+    def close(self) -> None:
+        self.writer.close()
+        if self.tail:
+            self.file.write(b"\x1b[0m\x1b[?25h")
+        self.file.close()
+        self.writer.check()
+
+
+class WallTile(asyncio.Protocol):
+    """ One terminal of a video wall, showing rows and columns from origin. """
+    def __init__(self, origin: Tuple[int, int], size: Tuple[int, int]):
+        self.origin = origin
+        self.size = size
+        self.transport = None
+        self.paused = False
+        self.behind = True
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+        transport.set_write_buffer_limits(high=CLIENT_BUFFER)
+
+    def connection_lost(self, exc) -> None:
+        self.transport = None
+
+    def pause_writing(self) -> None:
+        self.paused = True
+        self.behind = True
+
+    def resume_writing(self) -> None:
+        self.paused = False
+
+
+class VideoWall:
+    """
+    Shows the screen across several terminals laid out as the tiles of a
+    grid, columns tiles wide and filled row by row, like a video wall. One
+    simulation runs across the whole screen so lines carry on from one
+    tile into the next, and every terminal shows its own slice of it.
+
+    Writes never block. Each terminal is written through its own asyncio
+    pipe transport. A terminal with more than CLIENT_BUFFER bytes waiting
+    is skipped until it has caught up and then gets its whole slice again,
+    so one slow terminal does not hold up the others.
+    """
+    def __init__(self, paths: Sequence[str], columns: int,
+                 tile_size: Tuple[int, int]):
+        self.paths = paths
+        width, height = tile_size
+        self.tile_rows = height
+        self.tile_columns = width
+        self.columns = columns
+        self.tiles = [WallTile((i // columns * height, i % columns * width),
+                               (height, width)) for i in range(len(paths))]
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        for path, tile in zip(self.paths, self.tiles):
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_NOCTTY | os.O_NONBLOCK)
+                pipe = open(fd, "wb", buffering=0)
+                await loop.connect_write_pipe(lambda tile=tile: tile, pipe)
+            except (OSError, ValueError) as e:
+                self.close()
+                raise PyMatrixError(f"Error opening {path}: "
+                                    f"{getattr(e, 'strerror', None) or e}")
+
+    def split(self, cells: dict) -> List[dict]:
+        """ Returns the cells of each tile, placed within the tile. """
+        parts = [{} for _ in self.tiles]
+        rows, columns = self.tile_rows, self.tile_columns
+        for (y, x), cell in cells.items():
+            tile_x = x // columns
+            if tile_x >= self.columns:
+                continue
+            index = y // rows * self.columns + tile_x
+            if index < len(parts):
+                parts[index][(y % rows, x % columns)] = cell
+        return parts
+
+    def record(self, delta: FrameDelta) -> None:
+        escape = delta.palette.escape
+        parts = shown = None
+        for index, tile in enumerate(self.tiles):
+            if tile.transport is None or tile.paused:
+                continue
+            if tile.behind or delta.redraw:
+                if shown is None:
+                    shown = self.split(delta.shown)
+                data = ("\x1b[?25l" + escape(0) + "\x1b[2J"
+                        + ansi_cells(shown[index], escape))
+                tile.behind = False
+            else:
+                if parts is None:
+                    parts = self.split(delta.cells)
+                data = ansi_cells(parts[index], escape)
+            if data:
+                tile.transport.write(data.encode())
+
+    def close(self) -> None:
+        for tile in self.tiles:
+            if tile.transport is not None:
+                tile.transport.write(b"\x1b[0m\x1b[2J\x1b[H\x1b[?25h")
+                tile.transport.close()
+
+
+def wall_tile_size(paths: Sequence[str]) -> Optional[Tuple[int, int]]:
+    """
+    Returns the width and height that fit on every terminal of a video
+    wall, None when the size of one of them can not be read.
+    """
+    sizes = []
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY | os.O_NOCTTY | os.O_NONBLOCK)
+            try:
+                sizes.append(os.get_terminal_size(fd))
+            finally:
+                os.close(fd)
+        except OSError:
+            return None
+    return (min(size.columns for size in sizes),
+            min(size.lines for size in sizes))
+
+
+class SharedGridWriter:
+    """
+    Publishes the screen in a shared memory segment for other processes.
+    Readers map the segment by name and read the cells in place.
+
+    Layout, little endian:
+
+    - Header, 32 bytes: magic "PYMS", version (u16), number of glyphs
+      (u16), sequence (u64), frame (u64), columns (u16), rows (u16), cell
+      size (u16) and 2 bytes of padding.
+    - Glyph table at offset 32: the unicode code point of each glyph as
+      u32. Glyph 0 is the space.
+    - Cells, starting at the next multiple of 8 bytes: rows * columns
+      cells, row by row. A cell is the glyph (u16), foreground and
+      background color (i16, -1 is the terminal default) and flags (u16,
+      1 bold, 2 italic).
+
+    The sequence is a seqlock. It is odd while a frame is written and is
+    increased again once the frame is complete. Readers read the sequence,
+    copy what they need and read it again. The copy is whole when both
+    reads are the same even number. The frame counts the frames published.
+    The grid keeps the size of the screen when it was created, cells
+    outside of it are not published.
+    """
+    GLYPHS = sorted(GlyphAtlas.CHARS)
+
+    def __init__(self, name: str, size: Tuple[int, int]):
+        if shared_memory is None:
+            raise PyMatrixError("Error --shared_memory needs Python 3.8 or "
+                                "newer.")
+        self.rows, self.columns = size
+        self.glyph_index = {char: i for i, char in enumerate(self.GLYPHS)}
+        table_size = SHARED_HEADER.size + 4 * len(self.GLYPHS)
+        self.cells_offset = (table_size + 7) // 8 * 8
+        # The segment can be rounded up to a whole page, so the grid does
+        # not always end at the end of the buffer.
+        self.cells_end = (self.cells_offset
+                          + self.rows * self.columns * SHARED_CELL.size)
+        try:
+            self.memory = shared_memory.SharedMemory(name, create=True,
+                                                     size=self.cells_end)
+        except (OSError, ValueError) as e:
+            raise PyMatrixError(f"Error creating shared memory {name}: "
+                                f"{getattr(e, 'strerror', None) or e}")
+        self.buffer = self.memory.buf
+        self.sequence = 0
+        self.frame = 0
+        SHARED_HEADER.pack_into(self.buffer, 0, SHARED_MAGIC, SHARED_VERSION,
+                                len(self.GLYPHS), 0, 0, self.columns,
+                                self.rows, SHARED_CELL.size)
+        table = array.array("I", (ord(char) for char in self.GLYPHS))
+        if sys.byteorder == "big":
+            table.byteswap()
+        self.buffer[SHARED_HEADER.size:table_size] = table.tobytes()
+        self.palette = None
+        self.cache = {}
+
+    def cell(self, char: str, attr: int) -> bytes:
+        packed = self.cache.get((char, attr))
+        if packed is None:
+            packed = self.cache[(char, attr)] = SHARED_CELL.pack(
+                self.glyph_index.get(char, 0),
+                *self.palette.colors(attr))
+        return packed
+
+    def begin(self) -> None:
+        self.sequence += 1
+        struct.pack_into("<Q", self.buffer, 8, self.sequence)
+
+    def end(self) -> None:
+        self.frame += 1
+        struct.pack_into("<Q", self.buffer, 16, self.frame)
+        self.sequence += 1
+        struct.pack_into("<Q", self.buffer, 8, self.sequence)
+
+    def write(self, cells: dict, clear: bool) -> None:
+        buffer = self.buffer
+        size = SHARED_CELL.size
+        if clear:
+            blank = self.cell(" ", 0) * self.columns * self.rows
+            buffer[self.cells_offset:self.cells_end] = blank
+        for (y, x), (char, attr) in cells.items():
+            if y >= self.rows or x >= self.columns:
+                continue
+            start = self.cells_offset + (y * self.columns + x) * size
+            buffer[start:start + size] = self.cell(char, attr)
+
+    def record(self, delta: FrameDelta) -> None:
+        if delta.palette is not self.palette:
+            self.palette = delta.palette
+            self.cache.clear()
+        self.begin()
+        self.write(delta.cells, delta.redraw)
+        self.end()
+
+    def close(self) -> None:
+        self.buffer = None
+        self.memory.close()
+        self.memory.unlink()
+
+
+class SharedGridReader:
+    """ Reads the frames published by SharedGridWriter. """
+    def __init__(self, name: str):
+        if shared_memory is None:
+            raise PyMatrixError("Error shared memory needs Python 3.8 or "
+                                "newer.")
+        try:
+            self.memory = shared_memory.SharedMemory(name)
+        except OSError as e:
+            raise PyMatrixError(f"Error opening shared memory {name}: "
+                                f"{e.strerror}")
+        if sys.version_info < (3, 13):
+            # Only the writer removes the segment.
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.memory._name, "shared_memory")
+        (magic, _, glyphs, _, _, self.columns, self.rows,
+         self.cell_size) = SHARED_HEADER.unpack_from(self.memory.buf, 0)
+        if magic != SHARED_MAGIC:
+            self.memory.close()
+            raise PyMatrixError(f"Error {name} is not a pymatrix grid.")
+        table = self.memory.buf[SHARED_HEADER.size:
+                                SHARED_HEADER.size + 4 * glyphs]
+        self.glyphs = [chr(c) for c in struct.unpack(f"<{glyphs}I", table)]
+        table.release()
+        self.cells_offset = (SHARED_HEADER.size + 4 * glyphs + 7) // 8 * 8
+
+    def read(self) -> Tuple[int, List[List[Tuple[str, int, int, int]]]]:
+        """ Returns the frame number and the rows of cells of a frame. """
+        buffer = self.memory.buf
+        end = self.cells_offset + self.rows * self.columns * self.cell_size
+        while True:
+            sequence = struct.unpack_from("<Q", buffer, 8)[0]
+            if sequence % 2:
+                time.sleep(0)
+                continue
+            frame = struct.unpack_from("<Q", buffer, 16)[0]
+            data = bytes(buffer[self.cells_offset:end])
+            if struct.unpack_from("<Q", buffer, 8)[0] == sequence:
+                break
+        del buffer
+        cells = [(self.glyphs[glyph], fg, bg, flags) for glyph, fg, bg, flags
+                 in SHARED_CELL.iter_unpack(data)]
+        return frame, [cells[y * self.columns:(y + 1) * self.columns]
+                       for y in range(self.rows)]
+
+    def close(self) -> None:
+        self.memory.close()
+
+
+class Recording:
+    """
+    Reads a recording made by FrameRecorder. The file is memory mapped and
+    frames are decoded as they are played. Seeking looks up the keyframe
+    for the wanted time in the index, so only the frames of one keyframe
+    interval are decoded to reach any point.
+    """
+    def __init__(self, path: str):
+        try:
+            with open(path, "rb") as f:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            msg = getattr(e, "strerror", None) or "empty file"
+            raise PyMatrixError(f"Error reading {path}: {msg}")
+        try:
+            self.read_trailer()
+        except (struct.error, IndexError, UnicodeDecodeError):
+            self.data.close()
+            raise PyMatrixError(f"Error {path} is not a pymatrix recording.")
+
+    def read_trailer(self) -> None:
+        data = self.data
+        trailer, magic = RECORD_FOOTER.unpack_from(
+            data, len(data) - RECORD_FOOTER.size)
+        if (magic != RECORD_MAGIC or data[:4] != RECORD_MAGIC
+                or data[4] != RECORD_VERSION):
+            raise struct.error("bad magic")
+        self.end = trailer
+        offset = trailer
+        self.glyphs = []
+        count, = struct.unpack_from("<I", data, offset)
+        offset += 4
+        for _ in range(count):
+            length = data[offset]
+            self.glyphs.append(data[offset + 1:offset + 1 + length].decode())
+            offset += 1 + length
+        count, = struct.unpack_from("<I", data, offset)
+        offset += 4
+        self.attrs = []
+        for _ in range(count):
+            self.attrs.append(RECORD_ATTR.unpack_from(data, offset))
+            offset += RECORD_ATTR.size
+        self.interval, self.duration, count = struct.unpack_from(
+            "<III", data, offset)
+        self.index = struct.unpack_from(f"<{count}Q", data, offset + 12)
+
+    def time_at(self, offset: int) -> int:
+        return FRAME_HEADER.unpack_from(self.data, offset)[1]
+
+    def seek(self, ms: int) -> int:
+        """ Returns the offset of the last keyframe at or before ms. """
+        if not self.index:
+            return self.end
+        slot = min(max(ms, 0) // self.interval, len(self.index) - 1)
+        offset = self.index[slot]
+        if slot > 0 and self.time_at(offset) > ms:
+            offset = self.index[slot - 1]
+        return offset
+
+    def frames(self, offset: int):
+        """
+        Yields the frames from offset as kind, time in ms, keyframe header
+        (rows, columns, background attr) or None, and the cells as a flat
+        array of row, column, glyph and attr.
+        """
+        while offset < self.end:
+            kind, ms, count = FRAME_HEADER.unpack_from(self.data, offset)
+            offset += FRAME_HEADER.size
+            header = None
+            if kind == KEYFRAME:
+                header = KEYFRAME_HEADER.unpack_from(self.data, offset)
+                offset += KEYFRAME_HEADER.size
+            cells = array.array("H")
+            cells.frombytes(self.data[offset:offset + 8 * count])
+            if sys.byteorder == "big":
+                cells.byteswap()
+            offset += 8 * count
+            yield kind, ms, header, cells
+
+    def close(self) -> None:
+        self.data.close()
+
+
+class LoopRecorder:
+    """
+    Collects the frames of a run for build_loop by frame number. Cells
+    keep the SGR sequence they were shown with, so the colors of a cycle
+    are kept as they were.
+    """
+    def __init__(self, clock, delay: float):
+        self.clock = clock
+        self.delay = delay
+        self.frames = {}
+        self.palette = None
+
+    def escape(self, attr: int) -> str:
+        return self.palette.escape(attr)
+
+    def record(self, delta: FrameDelta) -> None:
+        self.palette = delta.palette
+        number = round(self.clock() / self.delay)
+        frame = self.frames.setdefault(number, [False, {}])
+        if delta.redraw:
+            frame[0] = True
+            frame[1].clear()
+        escape = self.palette.escape
+        frame[1].update((position, (char, escape(attr)))
+                        for position, (char, attr) in delta.cells.items())
+
+
+class LoopCache:
+    """
+    Reads a loop written by build_loop. The file is memory mapped and
+    frames are handed out as slices of it without copying. Blob 0 draws
+    the whole first frame and blob n changes the screen from frame n - 1
+    to frame n. The last blob changes the last frame back to the first.
+    """
+    def __init__(self, path: str):
+        try:
+            with open(path, "rb") as f:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            msg = getattr(e, "strerror", None) or "empty file"
+            raise PyMatrixError(f"Error reading {path}: {msg}")
+        try:
+            (magic, loop_version, self.rows, self.columns, self.frames,
+             self.delay) = LOOP_HEADER.unpack_from(self.data, 0)
+            if magic != LOOP_MAGIC or loop_version != LOOP_VERSION:
+                raise struct.error("bad magic")
+            self.offsets = struct.unpack_from(f"<{self.frames + 2}Q",
+                                              self.data, LOOP_HEADER.size)
+        except struct.error:
+            self.data.close()
+            raise PyMatrixError(f"Error {path} is not a pymatrix loop.")
+        self.view = memoryview(self.data)
+
+    def blob(self, number: int) -> memoryview:
+        return self.view[self.offsets[number]:self.offsets[number + 1]]
+
+    def close(self) -> None:
+        self.view.release()
+        self.data.close()
+
+
+class CpuGovernor:
+    """
+    Holds the process to a CPU budget given in percent of one core. CPU
+    time is measured over a window of wall time. When over budget the speed
+    is lowered, which stretches the frame delay and spawns fewer lines.
+    The speed is raised again once usage has dropped well below the budget.
+    The governor has random numbers of its own, so the lines it holds back
+    do not change the random numbers of the engine.
+    """
+    MIN_SPEED = 0.05
+
+    def __init__(self, budget: float, window: float = 1.0):
+        self.budget = budget
+        self.window = window
+        self.random = random.Random()
+        self.speed = 1.0
+        self.usage = 0.0
+        self.wall_start = time.monotonic()
+        self.cpu_start = time.process_time()
+
+    def update(self) -> None:
+        wall = time.monotonic() - self.wall_start
+        if wall < self.window:
+            return
+        self.usage = 100 * (time.process_time() - self.cpu_start) / wall
+        if self.usage > self.budget:
+            self.speed = max(self.MIN_SPEED,
+                             self.speed * self.budget / self.usage)
+        elif self.usage < 0.8 * self.budget:
+            self.speed = min(1.0, self.speed * 1.25)
+        self.wall_start = time.monotonic()
+        self.cpu_start = time.process_time()
+
+    def delay(self, delay: float) -> float:
+        return delay / self.speed
+
+    def spawn(self) -> bool:
+        return self.speed >= 1.0 or self.random.random() < self.speed
+
+    def status(self) -> str:
+        return (f"cpu {self.usage:.0f}%/{self.budget}% "
+                f"speed {self.speed * 100:.0f}%")
+
+
+def draw_status(frame: FrameBuffer, y: int, width: int, text: str) -> None:
+    """ Draws a status line. An empty text clears the line. """
+    for x, char in enumerate(text[:width - 1].ljust(width - 1)):
+        frame.draw(y, x, char, Colors.color_pair(10))
+
+
 def build_character_set2(args: argparse.Namespace):
-    if args.zero_one:
+    new_list = character_set(args)
+    OldScrollingLine.update_char_list(new_list)
+    return new_list
+
+
+def character_set(settings) -> List[str]:
+    """
+    Returns the characters of the rain for the character options of
+    settings, command line options or MatrixSettings.
+    """
+    if settings.zero_one:
         new_list = ["0", "1"]
-    elif args.ext_only:
-        if args.test_mode:
+    elif settings.ext_only:
+        if settings.test_mode:
             new_list = ["Ä"]
         else:
             new_list = EXT_CHAR_LIST
-    elif args.Katakana_only:
-        if args.test_mode:
+    elif settings.Katakana_only:
+        if settings.test_mode:
             new_list = ["ﾎ", "0"]
         else:
             new_list = KATAKANA_CHAR_LIST + KATAKANA_CHAR_LIST_ADDON
-    elif args.katakana and args.ext:
-        if args.test_mode:
+    elif settings.katakana and settings.ext:
+        if settings.test_mode:
             new_list = ["T", "ﾎ", "Ä"]
         else:
             new_list = KATAKANA_CHAR_LIST + EXT_CHAR_LIST + CHAR_LIST
-    elif args.ext:
-        if args.test_mode:
+    elif settings.ext:
+        if settings.test_mode:
             new_list = ["Ä", "T"]
         else:
             new_list = CHAR_LIST + EXT_CHAR_LIST
-    elif args.katakana:
-        if args.test_mode:
+    elif settings.katakana:
+        if settings.test_mode:
             new_list = ["T", "ﾎ"]
         else:
             new_list = CHAR_LIST + KATAKANA_CHAR_LIST
     else:
-        if args.test_mode:
+        if settings.test_mode:
             new_list = ["T"]
         else:
             new_list = CHAR_LIST
-    OldScrollingLine.update_char_list(new_list)
     return new_list
 
 
+def read_keys(screen, keys: asyncio.Queue) -> None:
+    """ Stdin reader callback. Moves every pending key into the queue. """
+    ch = screen.getch()
+    while ch != -1:
+        keys.put_nowait(ch)
+        ch = screen.getch()
+
+
+async def poll_keys(screen, keys: asyncio.Queue) -> None:
+    """ Fallback key reader for event loops without add_reader support. """
+    while True:
+        read_keys(screen, keys)
+        await asyncio.sleep(0.01)
+
+
+def keys_window():
+    """
+    Window used to read keys while a writer thread refreshes the screen.
+    It is never drawn on so getch() on it never refreshes anything.
+    """
+    window = curses.newwin(1, 1, 0, 0)
+    window.nodelay(True)
+    window.keypad(True)
+    window.untouchwin()
+    return window
+
+
+def control_keys(line: str) -> List[int]:
+    """
+    Returns the key codes of a --control command line. Each word is the
+    character of a key command, ^ and a letter for the ctrl keys, or up,
+    down, left or right for the arrow keys. Raises ValueError for anything
+    else, and for f as nothing could end the freeze.
+    """
+    codes = []
+    for word in line.split():
+        if word in CONTROL_WORDS:
+            codes.append(CONTROL_WORDS[word])
+        elif len(word) == 2 and word[0] == "^" and "@" <= word[1] <= "_":
+            codes.append(ord(word[1]) & 0x1f)
+        elif len(word) == 1 and word != "f" and 32 < ord(word) < 127:
+            codes.append(ord(word))
+        else:
+            raise ValueError(word)
+    return codes
+
+
+class ControlClient(asyncio.Protocol):
+    """ A connection to the control server. Reads command lines. """
+    def __init__(self, server: "ControlServer"):
+        self.server = server
+        self.transport = None
+        self.buffer = b""
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+        self.server.clients.add(self)
+
+    def connection_lost(self, exc) -> None:
+        self.server.clients.discard(self)
+
+    def data_received(self, data: bytes) -> None:
+        *lines, self.buffer = (self.buffer + data).split(b"\n")
+        for line in lines:
+            self.transport.write(self.server.command(line))
+        if len(self.buffer) > CONTROL_LINE:
+            self.transport.close()
+
+
+class ControlServer:
+    """
+    Takes key commands on a Unix domain socket, one line at a time, such
+    as "t 5 up". The key codes of each line are put in commands for the
+    render loop. Every line gets ok or an error back.
+    """
+    def __init__(self, commands: asyncio.Queue):
+        self.commands = commands
+        self.server = None
+        self.path = None
+        self.clients = set()
+
+    async def start(self, path: str) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            if stat.S_ISSOCK(os.stat(path).st_mode):
+                os.unlink(path)  # left over from an earlier run
+        except OSError:
+            pass
+        try:
+            self.server = await loop.create_unix_server(
+                lambda: ControlClient(self), path)
+        except NotImplementedError:
+            raise PyMatrixError("Error --control needs Unix domain sockets.")
+        except OSError as e:
+            raise PyMatrixError(f"Error opening control socket {path}: "
+                                f"{e.strerror}")
+        self.path = path
+
+    def command(self, line: bytes) -> bytes:
+        """ Queues the key codes of a line. Returns the reply. """
+        try:
+            codes = control_keys(line.decode(errors="replace"))
+        except ValueError as e:
+            return f"error unknown command {e}\n".encode()
+        if codes:
+            self.commands.put_nowait(codes)
+        return b"ok\n"
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        for client in list(self.clients):
+            client.transport.close()
+
+
+def resize_terminal(keys: asyncio.Queue,
+                    writer: Optional[FrameWriter] = None) -> None:
+    """ SIGWINCH handler. Resizes curses to match the terminal. """
+    try:
+        size = os.get_terminal_size()
+    except OSError:
+        return
+    if writer is not None:
+        writer.wait()
+    curses.resizeterm(size.lines, size.columns)
+    keys.put_nowait(curses.KEY_RESIZE)
+
+
+async def wait_for_key(keys: asyncio.Queue,
+                       stop: asyncio.Event,
+                       wanted: Optional[Sequence[int]] = None,
+                       timeout: Optional[float] = None) -> Optional[int]:
+    """
+    Pauses until one of the wanted keys, or any key when wanted is None,
+    is pressed or the loop is told to stop. Nothing is scheduled while
+    waiting so the process sleeps in the kernel until input or a signal
+    arrives. Returns None when stopped or when timeout seconds have passed.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    stop_wait = asyncio.ensure_future(stop.wait())
+    key_wait = None
+    try:
+        while True:
+            remaining = None
+            if deadline is not None:
+                remaining = max(0.0, deadline - time.monotonic())
+            key_wait = asyncio.ensure_future(keys.get())
+            await asyncio.wait([key_wait, stop_wait], timeout=remaining,
+                               return_when=asyncio.FIRST_COMPLETED)
+            if not key_wait.done():
+                key_wait.cancel()
+                return None
+            if wanted is None or key_wait.result() in wanted:
+                return key_wait.result()
+    finally:
+        stop_wait.cancel()
+        if key_wait is not None:
+            # When cancelled, so that it does not take the next key.
+            key_wait.cancel()
+
+
+class Cutscene:
+    """
+    Messages typed over a blank screen, kept as a timeline that the render
+    loop plays between its waits, so the keys are still read. Each message
+    is (text, type_time, hold_time): the letters are typed type_time
+    seconds apart on the second row, held for hold_time seconds and then
+    erased. The first message starts after start seconds and the cutscene
+    ends end seconds after the last one.
+    """
+    def __init__(self,
+                 messages: Sequence[Tuple[str, float, float]],
+                 start: float = 0.0,
+                 end: float = 0.0):
+        self.events = []  # (seconds, x, letter), no letter erases to x
+        seconds = start
+        for text, type_time, hold_time in messages:
+            for x, letter in enumerate(text, start=1):
+                self.events.append((seconds, x, letter))
+                seconds += type_time
+            seconds += hold_time
+            self.events.append((seconds, len(text), None))
+        self.length = seconds + end
+        self.played = 0
+
+    def next_time(self) -> float:
+        """ Returns the seconds when the next event is due. """
+        if self.played < len(self.events):
+            return self.events[self.played][0]
+        return self.length
+
+    def play(self, frame: FrameBuffer, seconds: float, width: int) -> bool:
+        """
+        Draws the events due by seconds on a screen width wide. Returns
+        False once the cutscene is over.
+        """
+        attr = Colors.color_pair(WAKE_UP_PAIR) + curses.A_BOLD
+        while (self.played < len(self.events)
+               and self.events[self.played][0] <= seconds):
+            _, x, letter = self.events[self.played]
+            if letter is None:
+                for x in range(1, min(x + 1, width - 1)):
+                    frame.draw(1, x, " ")
+            elif x < width - 1:
+                frame.draw(1, x, letter, attr)
+            self.played += 1
+        return seconds < self.length
+
+
+async def wake_up_timer(cutscenes: asyncio.Queue,
+                        settings: "MatrixSettings") -> None:
+    """
+    Schedules the wake up cutscene every 2000 to 3000 frames, while
+    settings.wakeup is set. The frames are counted at the delay in
+    settings, the one the render loop uses, so a change of speed while it
+    counts down is picked up within WAKE_UP_POLL seconds. The countdown
+    restarts once the main loop has played the cutscene.
+    """
+    while True:
+        frames = 20 if settings.test_mode else random.randint(2000, 3000)
+        while frames > 0:
+            delay = DELAY_SPEED[settings.delay]
+            wait = min(frames * delay, WAKE_UP_POLL)
+            await asyncio.sleep(wait)
+            frames -= wait / delay
+        if settings.wakeup:
+            cutscenes.put_nowait(wake_up_neo(settings.test_mode))
+            await cutscenes.join()
+
+
 def matrix_loop(screen, args: argparse.Namespace) -> None:
     """ Main loop. """
-    curses.curs_set(0)  # Set the cursor to off.
-    screen.timeout(0)  # Turn blocking off for screen.getch().
-    setup_curses_wake_up_colors(args.over_ride)
-    if args.color_number is not None:
-        setup_curses_color_number(args.color_number, args.background,
-                                  args.over_ride)
-    else:
-        setup_curses_colors(args.color, args.background, args.over_ride)
-    curses_lead_color(args.lead_color, args.background, args.over_ride)
-    screen.bkgd(" ", curses.color_pair(1))
-    count = cycle = 0  # used for cycle through colors mode
-    cycle_delay = 500
-    line_list = []
-    spacer = 2 if args.double_space else 1
-    keys_pressed = 0
-    if args.reverse:
-        direction = "up"
-    elif args.scroll_right:
-        direction = "right"
-    elif args.scroll_left:
-        direction = "left"
-    elif args.old_school_scrolling:
-        direction = "old scrolling"
-    else:
-        direction = "down"
+    asyncio.run(async_matrix_loop(screen, args))
 
-    char_set = build_character_set2(args)
 
-    wake_up_time = 20 if args.test_mode else random.randint(2000, 3000)
+async def async_matrix_loop(screen, args: argparse.Namespace,
+                            recorders: Optional[list] = None,
+                            clock: Optional[FrameClock] = None,
+                            cutscenes: Optional[asyncio.Queue] = None
+                            ) -> Optional[int]:
+    """
+    Main loop as a coroutine so it can be embedded in other asyncio
+    applications. Keys are read by a stdin reader callback, the run timer
+    and the wake up timer are scheduled on the event loop and cutscenes are
+    queued for the render loop to play between frames. Other Cutscenes can
+    be put in cutscenes.
+
+    The outputs asked for by args are added to recorders and closed at the
+    end. Frames are timed by clock. Returns the number of frames drawn,
+    None for --play and --loop.
+    """
+    loop = asyncio.get_running_loop()
+    keys = asyncio.Queue()
+    cutscenes = asyncio.Queue() if cutscenes is None else cutscenes
+    stop = asyncio.Event()
+    writer = FrameWriter() if args.pipeline and not args.headless else None
+    clock = clock or FrameClock()
+    recorders = [] if recorders is None else recorders
+    # Nobody watches an offline run, so outputs wait instead of skipping.
+    block = args.headless and not live_output(args)
+    frames = None
+    control_server = control = None
+    key_screen = screen if writer is None else keys_window()
+    tasks = []
+    settings = MatrixSettings.from_args(args)
+    if not args.play and not args.loop and not args.headless:
+        tasks.append(asyncio.create_task(wake_up_timer(cutscenes,
+                                                       settings)))
+    if not args.headless:
+        try:
+            loop.add_reader(sys.stdin.fileno(), read_keys, key_screen, keys)
+        except NotImplementedError:
+            tasks.append(asyncio.create_task(poll_keys(key_screen, keys)))
+    signals = [(getattr(signal, "SIGTERM", None), stop.set),
+               (getattr(signal, "SIGHUP", None), stop.set)]
+    if not args.headless:
+        signals.append((getattr(signal, "SIGWINCH", None), resize_terminal,
+                        keys, writer))
+    for sig, handler, *handler_args in signals:
+        try:
+            loop.add_signal_handler(sig, handler, *handler_args)
+        except (NotImplementedError, RuntimeError, TypeError, ValueError):
+            pass  # Not supported or not the main thread.
+    run_timer = None
+    if args.run_timer and (live_output(args) or not args.headless):
+        run_timer = loop.call_later(args.run_timer, stop.set)
 
-    if args.multiple_mode:
-        color_mode = "multiple"
-        setup_curses_colors("random", args.background, args.over_ride)
-    elif args.random_mode:
-        color_mode = "random"
-        setup_curses_colors("random", args.background, args.over_ride)
-    elif args.cycle:
-        color_mode = "cycle"
-    else:
-        color_mode = "normal"
+    try:
+        if args.play:
+            await play_loop(screen, args, keys, stop, writer)
+        elif args.loop:
+            await loop_play(screen, args, keys, stop)
+        else:
+            if args.record:
+                recorders.append(FrameRecorder(
+                    args.record,
+                    clock=clock if args.headless else time.monotonic,
+                    block=block))
+            if args.asciicast:
+                recorders.append(AsciicastWriter(
+                    args.asciicast, screen.getmaxyx(), clock, block))
+            if args.ansi:
+                recorders.append(AnsiWriter(args.ansi, block))
+            if args.video:
+                recorders.append(VideoWriter(
+                    args.video, args.video_format, args.video_size,
+                    GlyphAtlas.load(args.font), clock, args.video_fps,
+                    block))
+            if args.framebuffer:
+                recorders.append(FramebufferWriter(
+                    args.framebuffer, args.fb_size, args.fb_bpp,
+                    args.fb_stride, GlyphAtlas.load(args.font)))
+            if args.shared_memory:
+                recorders.append(SharedGridWriter(args.shared_memory,
+                                                  screen.getmaxyx()))
+            if args.serve:
+                server = BroadcastServer()
+                recorders.append(server)
+                await server.start(args.serve_host, args.serve)
+            if args.wall:
+                wall = VideoWall(args.wall, args.wall_columns, args.wall_tile)
+                recorders.append(wall)
+                await wall.start()
+            if args.seed is not None:
+                random.seed(args.seed)
+            if args.control:
+                control_server = ControlServer(asyncio.Queue())
+                await control_server.start(args.control)
+                control = control_server.commands
+            if args.workers:
+                frames = await tiled_render_loop(screen, args, stop,
+                                                 recorders, clock)
+            else:
+                frames = await render_loop(screen, args, keys, cutscenes,
+                                           stop, writer, recorders, clock,
+                                           control=control,
+                                           settings=settings)
+    finally:
+        if writer is not None:
+            writer.close()
+        if control_server is not None:
+            control_server.close()
+        for recorder in recorders:
+            recorder.close()
+        if run_timer is not None:
+            run_timer.cancel()
+        for task in tasks:
+            task.cancel()
+        if not args.headless:
+            try:
+                loop.remove_reader(sys.stdin.fileno())
+            except NotImplementedError:
+                pass
+        for sig, *_ in signals:
+            try:
+                loop.remove_signal_handler(sig)
+            except (NotImplementedError, RuntimeError, TypeError, ValueError):
+                pass
+    return frames
 
-    size_y, size_x = screen.getmaxyx()
-    if size_y < MIN_SCREEN_SIZE_Y:
-        raise PyMatrixError("Error screen height is to short.")
-    if size_x < MIN_SCREEN_SIZE_X:
-        raise PyMatrixError("Error screen width is to narrow.")
-    x_list = [x for x in range(0, size_x, spacer)]
-    y_list = [y for y in range(1, size_y)]
-
-    time_delta = datetime.timedelta(seconds=args.run_timer)
-    end_time = datetime.datetime.now() + time_delta
-    while True:
-        remove_list = []
-        if direction == "right" or direction == "left":
-            y = random.choice(y_list)
-            line_list.append(SingleLine(y, 0, size_x, size_y, direction))
+
+class MatrixSettings:
+    """
+    The settings of a MatrixEngine. direction is down, up, right, left or
+    old scrolling and color_mode normal, multiple, random or cycle. The
+    engine reads them every frame, so they can be changed while it runs.
+    Call MatrixEngine.update_characters after changing the characters and
+    MatrixEngine.reset_columns after changing double_space and
+    MatrixEngine.update_colors after changing the colors, color_number or
+    over_ride. In cycle mode the engine changes color. With static_glyphs
+    every cell keeps one character that the lines light up, and
+    glyph_mutations of the cells get a new character each frame. wakeup is
+    read by the wake up timer.
+    """
+    def __init__(self,
+                 direction: str = "down",
+                 color_mode: str = "normal",
+                 color: str = "green",
+                 lead_color: str = "white",
+                 background: str = "black",
+                 bold_on: bool = False,
+                 bold_all: bool = False,
+                 italic: bool = False,
+                 async_scroll: bool = False,
+                 do_not_clear: bool = False,
+                 double_space: bool = False,
+                 zero_one: bool = False,
+                 ext: bool = False,
+                 ext_only: bool = False,
+                 katakana: bool = False,
+                 Katakana_only: bool = False,
+                 test_mode: bool = False,
+                 delay: int = 4,
+                 static_glyphs: bool = False,
+                 glyph_mutations: int = 0,
+                 color_number: Optional[int] = None,
+                 over_ride: bool = False,
+                 wakeup: bool = False):
+        self.direction = direction
+        self.color_mode = color_mode
+        self.color = color
+        self.lead_color = lead_color
+        self.background = background
+        self.bold_on = bold_on
+        self.bold_all = bold_all
+        self.italic = italic
+        self.async_scroll = async_scroll
+        self.do_not_clear = do_not_clear
+        self.double_space = double_space
+        self.zero_one = zero_one
+        self.ext = ext
+        self.ext_only = ext_only
+        self.katakana = katakana
+        self.Katakana_only = Katakana_only
+        self.test_mode = test_mode
+        self.delay = delay
+        self.static_glyphs = static_glyphs
+        self.glyph_mutations = glyph_mutations
+        self.color_number = color_number
+        self.over_ride = over_ride
+        self.wakeup = wakeup
+
+    def reset(self) -> None:
+        """ Sets the defaults, but keeps test_mode, over_ride and wakeup. """
+        self.__init__(test_mode=self.test_mode, over_ride=self.over_ride,
+                      wakeup=self.wakeup)
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "MatrixSettings":
+        """ Returns the settings of the command line options. """
+        if args.reverse:
+            direction = "up"
+        elif args.scroll_right:
+            direction = "right"
+        elif args.scroll_left:
+            direction = "left"
+        elif args.old_school_scrolling:
+            direction = "old scrolling"
         else:
-            if len(line_list) < size_x - 1 and len(x_list) > 3:
-                for _ in range(2):
-                    x = random.choice(x_list)
-                    x_list.pop(x_list.index(x))
-                    if direction == "old scrolling":
-                        line_list.append(OldScrollingLine(x, size_x, size_y))
-                    else:
-                        line_list.append(
-                            SingleLine(0, x, size_x, size_y, direction))
-
-        resize = curses.is_term_resized(size_y, size_x)
-        if resize is True:
-            size_y, size_x = screen.getmaxyx()
-            if size_y < MIN_SCREEN_SIZE_Y:
-                raise PyMatrixError("Error screen height is to short.")
-            if size_x < MIN_SCREEN_SIZE_X:
-                raise PyMatrixError("Error screen width is to narrow.")
-            x_list = [x for x in range(0, size_x, spacer)]
-            y_list = [y for y in range(0, size_y)]
-
-            line_list.clear()
-            screen.clear()
-            screen.refresh()
-            continue
+            direction = "down"
+        if args.multiple_mode:
+            color_mode = "multiple"
+        elif args.random_mode:
+            color_mode = "random"
+        elif args.cycle:
+            color_mode = "cycle"
+        else:
+            color_mode = "normal"
+        return cls(direction, color_mode, args.color, args.lead_color,
+                   args.background, args.bold_on, args.bold_all, args.italic,
+                   args.async_scroll, args.do_not_clear, args.double_space,
+                   args.zero_one, args.ext, args.ext_only, args.katakana,
+                   args.Katakana_only, args.test_mode, args.delay,
+                   args.static_glyphs or bool(args.glyph_mutations),
+                   args.glyph_mutations, args.color_number, args.over_ride,
+                   args.wakeup)
 
-        if color_mode == "cycle":
-            if count <= 0:
-                setup_curses_colors(list(CURSES_COLOR.keys())[cycle],
-                                    args.background, args.over_ride)
-                count = cycle_delay
-                cycle = 0 if cycle == 6 else cycle + 1
+
+class MatrixEngine:
+    """
+    The rain without a screen. Every step() moves the lines on by one frame
+    and returns the cells the frame changed, as {(y, x): (char, attr)}.
+    Cleared cells are a space with attribute 0. deltas() yields the steps
+    one frame at a time.
+
+    All of the state is kept on the engine, and each engine has its own
+    random numbers, seeded with seed, so any number of engines can run in
+    one process and an engine with a seed makes the same frames every time.
+    The color pairs of the attributes are the engine's own, pairs, made
+    from its settings, and palette gives the colors the attributes are
+    shown with. Set them up with Colors.init_pairs to show the cells on a
+    terminal. In cycle color mode the engine changes settings.color and
+    sets recolor, the pairs and the palette are then new. While spawning
+    is off no new lines start. A governor limits how many lines start.
+
+    Changing the direction or double space does not clear anything. The
+    lines already running go on in their own direction until they are
+    gone, while the new lines start in the free columns.
+
+    With columns, (first, last), the engine only runs the lines of those
+    columns of the screen, one tile of a --workers run. The tile starts
+    its share of the new lines of the whole screen.
+
+    With settings.static_glyphs the characters come from glyphs, a field
+    of one character for each cell made on the first step after a resize
+    or a change of characters, so the lines only change the attributes of
+    the cells they pass. shown keeps the attributes of the lit cells while
+    glyphs are mutated, so a mutated cell that is lit changes at once.
+    Call shown.clear() when the screen is cleared without the engine.
+    """
+    def __init__(self,
+                 size: Tuple[int, int],
+                 settings: Optional[MatrixSettings] = None,
+                 seed: Optional[Union[int, str]] = None,
+                 governor: Optional["CpuGovernor"] = None,
+                 columns: Optional[Tuple[int, int]] = None):
+        self.settings = settings or MatrixSettings()
+        self.columns = columns
+        self.random = random.Random(seed)
+        self.governor = governor
+        self.spawning = True
+        self.recolor = False
+        self.count = self.cycle = 0  # used for cycle through colors mode
+        self.cycle_delay = 500
+        self.credit = 0.0  # lines due to start, for a tile of the columns
+        self.lines = []
+        self.glyphs = None
+        self.shown = {}
+        self.pairs = {}
+        self.palette = None
+        self.update_colors()
+        self.update_characters()
+        self.resize(size)
+
+    def resize(self, size: Tuple[int, int]) -> None:
+        """ Starts again on a screen of size, height and width. """
+        height, width = size
+        if height < MIN_SCREEN_SIZE_Y:
+            raise PyMatrixError("Error screen height is to short.")
+        if width < MIN_SCREEN_SIZE_X:
+            raise PyMatrixError("Error screen width is to narrow.")
+        self.height = height
+        self.width = width
+        self.clear()
+
+    def clear(self) -> None:
+        """ Removes every line, for when the screen has been cleared. """
+        self.lines.clear()
+        self.shown.clear()
+        self.glyphs = None
+        self.reset_columns()
+
+    def reset_columns(self) -> None:
+        """ Makes every column not used by a line, and every row, free. """
+        spacer = 2 if self.settings.double_space else 1
+        used = {line.x for line in self.lines
+                if line.direction not in ["right", "left"]}
+        first, last = self.columns or (0, self.width)
+        self.x_list = [x for x in range(first, last)
+                       if x % spacer == 0 and x not in used]
+        self.x_free = set(self.x_list)  # for looking up the free columns
+        self.y_list = [y for y in range(1, self.height)]
+
+    def free_column(self, line, gone: bool = False) -> None:
+        """
+        Gives the column of a line going up or down back for new lines.
+        A line in the current direction gives it back when its tail starts,
+        as a new line can follow it down. Other lines give it back when
+        they are gone, if no line is left in the column.
+        """
+        if line.direction in ["right", "left"] or line.x in self.x_free:
+            return
+        if self.settings.double_space and line.x % 2:
+            return
+        if not gone:
+            if line.direction != self.settings.direction:
+                return
+        elif any(other.x == line.x for other in self.lines
+                 if other.direction not in ["right", "left"]):
+            return
+        self.x_list.append(line.x)
+        self.x_free.add(line.x)
+
+    def update_colors(self) -> bool:
+        """
+        Makes the color pairs of the settings. Returns True when they
+        changed, then palette is a new Palette of them.
+        """
+        pairs = settings_pairs(self.settings)
+        if pairs == self.pairs:
+            return False
+        self.pairs = pairs
+        self.palette = Palette(pairs)
+        return True
+
+    def update_characters(self) -> None:
+        self.char_set = character_set(self.settings)
+        self.glyphs = None
+
+    def make_glyphs(self) -> List[List[str]]:
+        """ Gives every cell a character, as glyphs[y][x]. """
+        rng = self.random
+        char_set = self.char_set
+        self.glyphs = [[rng.choice(char_set) for _ in range(self.width)]
+                       for _ in range(self.height)]
+        return self.glyphs
+
+    def spawn(self) -> None:
+        direction = self.settings.direction
+        governor = self.governor
+        if direction == "right" or direction == "left":
+            if governor is None or governor.spawn():
+                y = self.random.choice(self.y_list)
+                self.lines.append(SingleLine(y, 0, self.width, self.height,
+                                             direction, self.random))
+        else:
+            first, last = self.columns or (0, self.width)
+            if len(self.lines) >= last - first - 1 or len(self.x_list) <= 3:
+                return
+            # Two lines a frame on the whole screen.
+            self.credit += 2 * (last - first) / self.width
+            while self.credit >= 1:
+                self.credit -= 1
+                if governor is not None and not governor.spawn():
+                    continue
+                x = self.random.choice(self.x_list)
+                self.x_list.pop(self.x_list.index(x))
+                self.x_free.discard(x)
+                if direction == "old scrolling":
+                    self.lines.append(OldScrollingLine(
+                        x, self.width, self.height, self.char_set,
+                        self.random))
+                else:
+                    self.lines.append(SingleLine(0, x, self.width,
+                                                 self.height, direction,
+                                                 self.random))
+
+    def step(self, seconds: Optional[float] = None
+             ) -> Dict[Tuple[int, int], Tuple[str, int]]:
+        """
+        Runs one frame. Returns the cells it changed. In async scroll each
+        line moves at its own speed for the seconds since the last step,
+        one frame at settings.delay by default, so the speeds do not change
+        with the frame rate. Other lines move one cell a frame.
+        """
+        settings = self.settings
+        ticks = SPEED_ONE
+        if seconds is not None:
+            ticks = round(SPEED_ONE * seconds / DELAY_SPEED[settings.delay])
+        rng = self.random
+        char_set = self.char_set
+        glyphs = None
+        if settings.static_glyphs:
+            glyphs = self.glyphs or self.make_glyphs()
+        cells = {}
+        remove_list = []
+        if self.spawning:
+            self.spawn()
+        if settings.color_mode == "cycle":
+            if self.count <= 0:
+                settings.color = list(CURSES_COLOR.keys())[self.cycle]
+                settings.color_number = None
+                self.update_colors()
+                self.recolor = True
+                self.count = self.cycle_delay
+                self.cycle = 0 if self.cycle == 6 else self.cycle + 1
             else:
-                count -= 1
-        if direction == "old scrolling":
-            for line in line_list:
-                if args.bold_all:
+                self.count -= 1
+        italic = curses.A_ITALIC if settings.italic else curses.A_NORMAL
+        lead_color = Colors.color_pair(10)
+        for line in self.lines:
+            if line.direction == "old scrolling":
+                if settings.bold_all:
                     bold = curses.A_BOLD
-                elif args.bold_on and line.bold:
+                elif settings.bold_on and line.bold:
                     bold = curses.A_BOLD
                 else:
                     bold = curses.A_NORMAL
-
-                italic = curses.A_ITALIC if args.italic else curses.A_NORMAL
-
-                color = curses.color_pair(line.line_color_number)
+                color = Colors.color_pair(line.line_color_number)
                 remove = line.delete_last()
                 lead = line.get_lead()
                 if lead is not None:
-                    screen.addstr(lead[0], lead[1], lead[2],
-                                  curses.color_pair(10) + bold + italic)
+                    y, x, char = lead
+                    if glyphs is not None:
+                        char = glyphs[y][x]
+                    cells[y, x] = (char, lead_color + bold + italic)
                 if remove is not None:
-                    screen.addstr(remove[0], remove[1], " ")
-                    if line.x not in x_list:
-                        x_list.append(line.x)
-                location_char_list = line.get_next()
-                for cell in location_char_list:
-                    screen.addstr(*cell, color + bold + italic)
-                okay_to_delete = line.okay_to_delete()
-                if okay_to_delete:
+                    cells[remove[0], remove[1]] = (" ", 0)
+                    self.free_column(line)
+                for y, x, char in line.get_next():
+                    if glyphs is not None:
+                        char = glyphs[y][x]
+                    cells[y, x] = (char, color + bold + italic)
+                if line.okay_to_delete():
                     remove_list.append(line)
-        else:
-            for line in line_list:
-                if args.async_scroll and not line.async_scroll_turn():
-                    # Not the line's turn in async scroll mode then
-                    # continue to the next line.
-                    continue
-                remove_line = line.delete_last()
-                if remove_line is not None:
-                    if args.do_not_clear is False:
-                        screen.addstr(remove_line[0], remove_line[1], " ")
-                    if line.x not in x_list:
-                        x_list.append(line.x)
-
-                if args.bold_all:
-                    bold = curses.A_BOLD
-                elif args.bold_on:
-                    if random.randint(1, 3) <= 1:
+            else:
+                # In async scroll a line can move any number of cells.
+                moves = line.moves(ticks) if settings.async_scroll else 1
+                for _ in range(moves):
+                    remove_line = line.delete_last()
+                    if remove_line is not None:
+                        if settings.do_not_clear is False:
+                            cells[remove_line] = (" ", 0)
+                        self.free_column(line)
+
+                    if settings.bold_all:
                         bold = curses.A_BOLD
+                    elif settings.bold_on:
+                        if rng.randint(1, 3) <= 1:
+                            bold = curses.A_BOLD
+                        else:
+                            bold = curses.A_NORMAL
                     else:
                         bold = curses.A_NORMAL
-                else:
-                    bold = curses.A_NORMAL
 
-                italic = curses.A_ITALIC if args.italic else curses.A_NORMAL
+                    if settings.color_mode == "random":
+                        color = Colors.color_pair(rng.randint(1, 7))
+                    else:
+                        color = Colors.color_pair(line.line_color_number)
+                    new_char = line.get_next()
+                    if new_char is not None:
+                        if glyphs is None:
+                            char = rng.choice(char_set)
+                        else:
+                            char = glyphs[new_char[0]][new_char[1]]
+                        cells[new_char] = (char, color + bold + italic)
+                    lead_char = line.get_lead()
+                    if lead_char is not None:
+                        if glyphs is None:
+                            char = rng.choice(char_set)
+                        else:
+                            char = glyphs[lead_char[0]][lead_char[1]]
+                        cells[lead_char] = (char, lead_color + bold + italic)
+                    if line.okay_to_delete():
+                        remove_list.append(line)
+                        break
+        for line in remove_list:
+            self.lines.remove(line)
+            self.free_column(line, gone=True)
+        if glyphs is not None and settings.glyph_mutations:
+            self.mutate(cells)
+        return cells
+
+    def mutate(self, cells: Dict[Tuple[int, int], Tuple[str, int]]) -> None:
+        """
+        Gives settings.glyph_mutations random cells a new character, and
+        adds the lit ones to the cells changed by the frame.
+        """
+        shown = self.shown
+        for cell, (char, attr) in cells.items():
+            if char == " ":
+                shown.pop(cell, None)
+            else:
+                shown[cell] = attr
+        rng = self.random
+        glyphs = self.glyphs
+        for _ in range(self.settings.glyph_mutations):
+            y = rng.randrange(self.height)
+            x = rng.randrange(self.width)
+            glyphs[y][x] = rng.choice(self.char_set)
+            attr = shown.get((y, x))
+            if attr is not None:
+                cells[y, x] = (glyphs[y][x], attr)
+
+    def deltas(self) -> Iterator[Dict[Tuple[int, int], Tuple[str, int]]]:
+        """ Yields the cells changed by each frame, forever. """
+        while True:
+            yield self.step()
+
+
+def run_frame(screen,
+              frame: FrameBuffer,
+              engine: MatrixEngine,
+              clock: FrameClock,
+              args: argparse.Namespace,
+              status: bool = False,
+              governor: Optional["CpuGovernor"] = None,
+              seconds: Optional[float] = None,
+              next_render: float = 0.0) -> Tuple[float, float]:
+    """
+    Runs one frame of the engine the way render_loop does. The cells the
+    engine changed are drawn to frame, the colors are set up again when the
+    engine changed them, the status line is drawn when status is set and
+    the frame is written to screen once the clock reaches next_render, at
+    most args.max_fps times a second. Then the clock advances by the frame
+    delay. frame is a FrameBuffer or anything that takes the cells the same
+    way, such as an ExportRun. Returns the frame delay and the time the
+    next frame is written at.
+    """
+    for (y, x), (char, attr) in engine.step(seconds).items():
+        frame.draw(y, x, char, attr)
+    if engine.recolor:
+        engine.recolor = False
+        frame.sync()
+        if not args.headless:
+            Colors.init_pairs(engine.pairs)
+        frame.recolor(engine.palette)
+        frame.touch()
+    delay = DELAY_SPEED[engine.settings.delay]
+    if governor is not None:
+        governor.update()
+        delay = governor.delay(delay)
+    if status:
+        text = f"dropped {frame.dropped}"
+        if governor is not None:
+            text = f"{governor.status()} {text}"
+        draw_status(frame, engine.height - 1, engine.width, text)
+    if clock() >= next_render:
+        frame.flush(screen, None if args.headless else delay)
+        if args.max_fps:
+            next_render = clock() + 1 / args.max_fps
+    clock.tick(delay)
+    return delay, next_render
+
+
+async def render_loop(screen,
+                      args: argparse.Namespace,
+                      keys: asyncio.Queue,
+                      cutscenes: asyncio.Queue,
+                      stop: asyncio.Event,
+                      writer: Optional[FrameWriter] = None,
+                      recorders: Sequence = (),
+                      clock: Optional[FrameClock] = None,
+                      spawn_until: Optional[float] = None,
+                      control: Optional[asyncio.Queue] = None,
+                      settings: Optional["MatrixSettings"] = None) -> int:
+    """
+    Shows a MatrixEngine on the screen and handles the keys between
+    frames. The keys change the engine's settings, made from args unless
+    they are given, and args is left as it is.
+    The key codes put in control, by a ControlServer, are handled the same
+    way. All of the keys and commands that arrived during a frame are
+    applied together, so keys that cancel out change nothing. Changing modes
+    never clears the screen or sleeps, the lines on the screen run off in
+    their old direction as new ones start. When the colors changed the
+    screen is redrawn, at most REPAINTS_PER_SECOND times a second.
+    With --max_fps the engine still steps every frame delay but the screen
+    is only written max_fps times a second, the frames in between are
+    merged into the next one written.
+    With a writer the frames are written on the writer thread while the
+    next one is simulated, and the frame buffer is synced before using the
+    screen. The frames are also handed to the recorders as they are
+    written.
+
+    The clock advances by the frame delay after each frame. Headless the
+    loop stops when the clock reaches the run timer or after args.frames
+    frames, and only sleeps for live outputs. With spawn_until no lines
+    are started once the clock reaches it, and the loop stops when the
+    last line is gone. Returns the number of frames drawn.
+    """
+    clock = clock or FrameClock()
+    if not args.headless:
+        curses.curs_set(0)  # Set the cursor to off.
+    screen.timeout(0)  # Turn blocking off for screen.getch().
+    settings = settings or MatrixSettings.from_args(args)
+    frame = FrameBuffer(writer, recorders)
+    governor = CpuGovernor(args.cpu_budget) if args.cpu_budget else None
+    engine = MatrixEngine(screen.getmaxyx(), settings, args.seed, governor)
+    if not args.headless:
+        Colors.init_pairs(engine.pairs)
+    frame.recolor(engine.palette)
+    screen.bkgd(" ", Colors.color_pair(1))
+    status_line = args.status
+    keys_pressed = 0
+    frames = 0
+    blank_for = restart_at = None  # for w, no new lines until restart_at
+    repaint = False  # the colors changed and the screen needs redrawing
+    next_repaint = 0.0
+    next_render = 0.0  # with --max_fps, frames until then are merged
+    stepped = None  # when the last frame shown live was run, for async
 
-                if color_mode == "random":
-                    color = curses.color_pair(random.randint(1, 7))
-                else:
-                    color = curses.color_pair(line.line_color_number)
-                new_char = line.get_next()
-                if new_char is not None:
-                    screen.addstr(new_char[0],
-                                  new_char[1],
-                                  random.choice(char_set),
-                                  color + bold + italic)
-                lead_char = line.get_lead()
-                if lead_char is not None:
-                    screen.addstr(lead_char[0], lead_char[1],
-                                  random.choice(char_set),
-                                  curses.color_pair(10) + bold + italic)
-                if line.okay_to_delete():
-                    remove_list.append(line)
-            screen.refresh()
+    while True:
+        if blank_for is not None and not engine.lines:
+            restart_at = clock() + blank_for
+            blank_for = None
+        if restart_at is not None and clock() >= restart_at:
+            engine.spawning = True
+            restart_at = None
+        if spawn_until is not None and clock() >= spawn_until:
+            engine.spawning = False
+            if not engine.lines:
+                break
 
-        for rem in remove_list:
-            line_list.pop(line_list.index(rem))
+        if not args.headless and curses.is_term_resized(engine.height,
+                                                        engine.width):
+            engine.resize(screen.getmaxyx())
+            frame.clear(screen)
+            continue
 
-        if args.wakeup:
-            if wake_up_time <= 0:
-                wake_up_neo(screen, args.test_mode)
-                wake_up_time = random.randint(2000, 3000)
-                while screen.getch() != -1:  # clears out the buffer
-                    ...
-                screen.bkgd(" ", curses.color_pair(1))
-                continue
+        seconds = None  # offline frames are one delay apart
+        if not args.headless or live_output(args):
+            now = time.monotonic()
+            if stepped is not None:
+                seconds = now - stepped
+            stepped = now
+        if repaint and clock() >= next_repaint:
+            frame.touch()
+            repaint = False
+            next_repaint = clock() + 1 / REPAINTS_PER_SECOND
+        delay, next_render = run_frame(screen, frame, engine, clock, args,
+                                       status_line, governor, seconds,
+                                       next_render)
+        frames += 1
+
+        if not cutscenes.empty():
+            # The rain waits while the cutscene plays on a blank screen.
+            cutscene = cutscenes.get_nowait()
+            seconds = 0.0
+            frame.sync()
+            screen.bkgd(" ", Colors.color_pair(WAKE_UP_PAIR))
+            frame.clear(screen)
+            while cutscene.play(frame, seconds, engine.width):
+                frame.flush(screen)
+                wait = cutscene.next_time() - seconds
+                seconds = cutscene.next_time()
+                if not args.headless or live_output(args):
+                    # Sleeps until the next event, only quit keys are read.
+                    if await wait_for_key(keys, stop, [81, 113],
+                                          wait) is not None:
+                        break
+                clock.advance(wait)
+                if stop.is_set() or (args.headless and args.run_timer
+                                     and clock() >= args.run_timer):
+                    break
             else:
-                wake_up_time -= 1
+                frame.sync()
+                screen.bkgd(" ", Colors.color_pair(1))
+                frame.clear(screen)
+                engine.shown.clear()
+                cutscenes.task_done()
+                stepped = None
+                continue
+            cutscenes.task_done()
+            break  # quit
 
-        if args.run_timer and datetime.datetime.now() >= end_time:
+        if stop.is_set():
             break
-        time.sleep(DELAY_SPEED[args.delay])
-        ch = screen.getch()
-        if ch == -1:
-            continue
-        elif args.screen_saver:
-            break
-        elif ch in [81, 113]:  # q, Q
+        if args.headless:
+            if args.run_timer and clock() >= args.run_timer:
+                break
+            if args.frames and frames >= args.frames:
+                break
+            # Live outputs are shown in real time, the others are rendered
+            # as fast as possible. Sleeping 0 lets signal handlers run.
+            await asyncio.sleep(delay if live_output(args) else 0)
+        else:
+            await asyncio.sleep(delay)
+        # Every key pressed and command sent since the last frame is applied
+        # at once, so held down keys can not fall behind.
+        commands = []
+        while not keys.empty():
+            commands.append(keys.get_nowait())
+        if args.screen_saver and commands:
             break
-        elif args.disable_keys:
+        if args.disable_keys:
+            commands = [ch for ch in commands if ch in [81, 113]]  # q, Q
+        while control is not None and not control.empty():
+            commands += control.get_nowait()
+        if not commands:
             continue
-        # Commands:
-        elif ch == 119 and keys_pressed == 0:  # w
-            keys_pressed = 1
-        elif ch == 65 and keys_pressed == 1:  # A
-            keys_pressed = 2
-        elif ch == 107 and keys_pressed == 2:  # k
-            keys_pressed = 3
+        frame.sync()
+        columns = characters = False
+        for ch in commands:
+            if ch in [81, 113]:  # q, Q
+                break
+            # Commands:
+            elif ch == 119 and keys_pressed == 0:  # w
+                keys_pressed = 1
+            elif ch == 65 and keys_pressed == 1:  # A
+                keys_pressed = 2
+            elif ch == 107 and keys_pressed == 2:  # k
+                keys_pressed = 3
+                continue
+            elif ch == 101 and keys_pressed == 3:  # e
+                cutscenes.put_nowait(wake_up_neo(settings.test_mode))
+                keys_pressed = 0
+                continue
+            else:
+                keys_pressed = 0
+            if ch == 98:  # b
+                settings.bold_on = True
+                settings.bold_all = False
+            elif ch == 66:  # B
+                settings.bold_all = True
+                settings.bold_on = False
+            elif ch in [78, 110]:  # n or N
+                settings.bold_on = False
+                settings.bold_all = False
+            elif ch in [114, 116, 121, 117, 105, 111, 112, 91]:
+                # r, t, y, u, i, o, p, [
+                settings.color = CURSES_CH_CODES_COLOR[ch]
+                settings.color_number = None
+                settings.color_mode = "normal"
+            elif ch in [82, 84, 89, 85, 73, 79, 80, 123]:
+                # R, T, Y, U, I, O, P, {
+                settings.lead_color = CURSES_CH_CODES_COLOR[ch]
+            elif ch in [18, 20, 25, 21, 9, 15, 16, 27]:
+                # ctrl R, T, Y, U, I, O, P, [
+                settings.background = CURSES_CH_CODES_COLOR[ch]
+            elif ch == 97:  # a
+                settings.async_scroll = not settings.async_scroll
+            elif ch == 109:  # m
+                if settings.color_mode in ["random", "normal", "cycle"]:
+                    settings.color_mode = "multiple"
+                else:
+                    settings.color_mode = "normal"
+                    settings.color = "green"
+                    settings.color_number = None
+            elif ch == 77:  # M
+                if settings.color_mode in ["multiple", "normal", "cycle"]:
+                    settings.color_mode = "random"
+                else:
+                    settings.color_mode = "normal"
+                    settings.color = "green"
+                    settings.color_number = None
+            elif ch == 99:  # c
+                if settings.color_mode in ["random", "multiple", "normal"]:
+                    settings.color_mode = "cycle"
+                else:
+                    settings.color_mode = "normal"
+            elif ch == 108:  # l
+                if settings.direction in ["right", "left"]:
+                    continue
+                settings.double_space = not settings.double_space
+                columns = True
+            elif ch == 101:  # e
+                settings.zero_one = False
+                if settings.ext or settings.ext_only:
+                    settings.ext = False
+                else:
+                    settings.ext = True
+                characters = True
+            elif ch == 69:  # E
+                settings.zero_one = False
+                settings.ext_only = not settings.ext_only
+                characters = True
+            elif ch == 122 and not settings.zero_one:  # z
+                settings.zero_one = True
+                characters = True
+            elif ch == 90 and settings.zero_one:  # Z
+                settings.zero_one = False
+                characters = True
+            elif ch == 23:  # ctrl-w
+                settings.wakeup = not settings.wakeup
+            elif ch == 118:  # v
+                if settings.direction == "down":
+                    settings.direction = "up"
+                elif settings.direction == "up":
+                    settings.direction = "down"
+                else:
+                    settings.direction = "up"
+            elif ch == 115:  # s
+                if settings.direction == "old scrolling":
+                    settings.direction = "down"
+                else:
+                    settings.direction = "old scrolling"
+            elif ch in DIRECTION_KEYS:  # arrow keys
+                settings.direction = DIRECTION_KEYS[ch]
+            elif ch in [100, 68]:  # d, D
+                settings.reset()
+                columns = True
+                characters = True
+            elif (settings.color_mode == "cycle"
+                  and ch in CURSES_CH_CODES_CYCLE_DELAY.keys()):
+                engine.cycle_delay = 100 * CURSES_CH_CODES_CYCLE_DELAY[ch]
+                engine.count = engine.cycle_delay
+            elif 48 <= ch <= 57:  # number keys 0 to 9
+                settings.delay = int(chr(ch))
+            elif ch == 87:  # W
+                settings.do_not_clear = not settings.do_not_clear
+            elif ch == 119:  # w
+                # New lines start again 2 seconds after the screen empties.
+                engine.spawning = False
+                blank_for = 2
+                restart_at = None
+            elif ch == 106:  # j
+                settings.italic = not settings.italic
+            elif ch == 102:  # f
+                # Freeze the Matrix. q will still quit.
+                frame.flush(screen)  # show any frames dropped for backpressure
+                if await wait_for_key(keys, stop, [102, 81, 113]) != 102:
+                    break
+                stepped = None
+            elif ch == 83:  # S
+                status_line = not status_line
+                if not status_line:
+                    draw_status(frame, engine.height - 1, engine.width, "")
+            elif ch == 75:  # K
+                settings.zero_one = False
+                settings.Katakana_only = not settings.Katakana_only
+                characters = True
+            elif ch == 107:  # k
+                settings.zero_one = False
+                settings.Katakana_only = False
+                settings.katakana = not settings.katakana
+                characters = True
+        else:
+            if columns:
+                engine.reset_columns()
+            if characters:
+                engine.update_characters()
+            if engine.update_colors():
+                # New cells use the new colors straight away, the cells
+                # already shown are redrawn at most REPAINTS_PER_SECOND.
+                if not args.headless:
+                    Colors.init_pairs(engine.pairs)
+                screen.bkgd(" ", Colors.color_pair(1))
+                frame.recolor(engine.palette)
+                repaint = True
             continue
-        elif ch == 101 and keys_pressed == 3:  # e
-            wake_up_neo(screen, args.test_mode)
-            while screen.getch() != -1:  # clears out the buffer
+        break  # quit
+    frame.sync()
+    screen.erase()
+    screen.refresh()
+    return frames
+
+
+class TileOutput:
+    """
+    Keeps the last frame of one tile of a --workers run, packed to be sent
+    to the main process: a TILE_HEADER, the ANSI escape sequences of the
+    cells as UTF-8, with cells set the cells as TILE_RECORDs and, when the
+    frame has a new palette, its color pairs as TILE_PAIRs. The ANSI of a
+    redraw leaves out clearing the screen, as the tiles share it.
+    """
+    def __init__(self, cells: bool):
+        self.cells = cells
+        self.palette = None
+        self.clear()
+
+    def clear(self) -> None:
+        self.packed = TILE_HEADER.pack(False, 0, 0, 0)
+
+    def record(self, delta: FrameDelta) -> None:
+        text = ansi_cells(delta.cells, delta.palette.escape).encode()
+        records = b""
+        if self.cells:
+            pack = TILE_RECORD.pack
+            records = b"".join(pack(y, x, ord(char), attr)
+                               for (y, x), (char, attr)
+                               in delta.cells.items())
+        pairs = b""
+        if delta.palette is not self.palette:
+            self.palette = delta.palette
+            pairs = b"".join(TILE_PAIR.pack(pair, fg, bg) for pair, (fg, bg)
+                             in delta.palette.pairs.items())
+        self.packed = (TILE_HEADER.pack(delta.redraw, len(text),
+                                        len(records) // TILE_RECORD.size,
+                                        len(pairs) // TILE_PAIR.size)
+                       + text + records + pairs)
+
+    def close(self) -> None:
+        pass
+
+
+def tile_worker(connection, size: Tuple[int, int], columns: Tuple[int, int],
+                settings: "MatrixSettings", seed: Union[int, str],
+                cells: bool) -> None:
+    """
+    Runs one tile of a --workers run in a worker process, a MatrixEngine of
+    the columns with a FrameBuffer of its own. For every request received,
+    render, the next frame is simulated and, when render is set, its
+    changes since the last frame rendered are sent back packed by
+    TileOutput. Otherwise an empty frame is sent. When the engine changes
+    the colors the tile is redrawn. None ends the worker.
+    """
+    engine = MatrixEngine(size, settings, seed, columns=columns)
+    output = TileOutput(cells)
+    frame = FrameBuffer(None, [output])
+    frame.recolor(engine.palette)
+    screen = VirtualScreen(*size)
+    while True:
+        render = connection.recv()
+        if render is None:
+            break
+        for (y, x), (char, attr) in engine.step().items():
+            frame.draw(y, x, char, attr)
+        if engine.recolor:
+            engine.recolor = False
+            frame.recolor(engine.palette)
+            frame.touch()
+        output.clear()
+        if render:
+            frame.flush(screen)
+        connection.send_bytes(output.packed)
+
+
+class TileDelta(FrameDelta):
+    """
+    A frame of a --workers run made of the frames of the tiles, as packed
+    by TileOutput. The ANSI of the tiles comes ready made and is only
+    joined, and the cells are only unpacked when an output reads them.
+    The frame has the palette of the frame before it, or a new one when
+    the tiles sent new color pairs.
+    """
+    def __init__(self, size: Tuple[int, int], parts: List[bytes],
+                 palette: Optional[Palette], shown: Optional[dict] = None):
+        self.size = size
+        self.parts = parts
+        self.headers = [TILE_HEADER.unpack_from(part) for part in parts]
+        self.redraw = any(redraw for redraw, _, _, _ in self.headers)
+        self.palette = palette
+        for part, (_, length, count, pairs) in zip(parts, self.headers):
+            if pairs:
+                start = (TILE_HEADER.size + length
+                         + count * TILE_RECORD.size)
+                self.palette = Palette({
+                    pair: (fg, bg) for pair, fg, bg in TILE_PAIR.iter_unpack(
+                        part[start:start + pairs * TILE_PAIR.size])})
+                break
+        self.shown = shown
+        self.encoded = None
+        self.unpacked = None
+
+    def empty(self) -> bool:
+        """ Returns True when no tile changed anything. """
+        return not self.redraw and not any(length for _, length, _, _
+                                           in self.headers)
+
+    @property
+    def cells(self) -> dict:
+        if self.unpacked is None:
+            self.unpacked = {}
+            for part, (_, length, count, _) in zip(self.parts,
+                                                   self.headers):
+                start = TILE_HEADER.size + length
+                self.unpacked.update(
+                    ((y, x), (chr(code), attr)) for y, x, code, attr
+                    in TILE_RECORD.iter_unpack(
+                        part[start:start + count * TILE_RECORD.size]))
+        return self.unpacked
+
+    def ansi(self) -> str:
+        if self.encoded is None:
+            text = b"".join(
+                part[TILE_HEADER.size:TILE_HEADER.size + length]
+                for part, (_, length, _, _) in zip(self.parts, self.headers)
+            ).decode()
+            if self.redraw:
+                text = self.palette.escape(0) + "\x1b[2J" + text
+            self.encoded = text
+        return self.encoded
+
+
+class TileWorkers:
+    """
+    Runs the screen of a --workers run in worker processes. The columns are
+    split into one tile per worker, each one simulated and encoded by a
+    tile_worker, so the main process only joins the frames of the tiles.
+    The workers run one frame ahead: frame() returns a frame and asks for
+    the next one, which the workers make while the main process writes
+    out the last one. Each tile is seeded with the seed and its number, so
+    a run with the same seed and workers is the same. One worker is seeded
+    with the seed alone and makes the same frames as render_loop.
+
+    With cells the tiles also send their cells, for outputs that read
+    them. A worker that stops ends the run with a PyMatrixError.
+    """
+    def __init__(self, workers: int, size: Tuple[int, int],
+                 settings: "MatrixSettings", seed: int, cells: bool):
+        width = size[1]
+        workers = min(workers, width)
+        bounds = [width * i // workers for i in range(workers + 1)]
+        context = multiprocessing.get_context("spawn")
+        self.workers = []
+        for number, columns in enumerate(zip(bounds, bounds[1:])):
+            connection, child = context.Pipe()
+            process = context.Process(
+                target=tile_worker, daemon=True,
+                args=(child, size, columns, settings,
+                      seed if workers == 1 else f"{seed}/{number}",
+                      cells))
+            process.start()
+            child.close()
+            self.workers.append((process, connection))
+        self.request(True)
+
+    def request(self, render: bool) -> None:
+        try:
+            for _, connection in self.workers:
+                connection.send(render)
+        except OSError:
+            raise PyMatrixError("Error a --workers process stopped.")
+
+    def frame(self, render: bool) -> List[bytes]:
+        """
+        Returns the packed frames of the tiles, and asks for the next frame,
+        rendered when render is set.
+        """
+        parts = []
+        try:
+            for _, connection in self.workers:
+                parts.append(connection.recv_bytes())
+        except (EOFError, OSError):
+            raise PyMatrixError("Error a --workers process stopped.")
+        self.request(render)
+        return parts
+
+    def close(self) -> None:
+        for process, connection in self.workers:
+            try:
+                connection.send(None)
+            except OSError:
                 pass
-            keys_pressed = 0
-            screen.bkgd(" ", curses.color_pair(1))
+        for process, connection in self.workers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            connection.close()
+
+
+async def tiled_render_loop(screen,
+                            args: argparse.Namespace,
+                            stop: asyncio.Event,
+                            recorders: Sequence = (),
+                            clock: Optional[FrameClock] = None) -> int:
+    """
+    The headless render loop of a --workers run. The lines are simulated
+    and encoded by TileWorkers and this loop only hands their frames to
+    the recorders. The ANSI outputs only write out the ready made ANSI of
+    the tiles, the cells are sent as well for the other outputs. Lines
+    scroll down, or up with --reverse, or old style. The colors are those
+    of the engines of the tiles, which send their color pairs whenever
+    they change, in cycle mode too. Returns the number of frames drawn.
+    """
+    clock = clock or FrameClock()
+    size = screen.getmaxyx()
+    frames = 0
+    settings = MatrixSettings.from_args(args)
+    seed = random.randrange(1 << 32) if args.seed is None else args.seed
+    palette = None  # sent by the tiles with the first frame
+    # The ANSI outputs only read the ANSI of the frames.
+    ansi_only = all(isinstance(recorder, (AnsiWriter, AsciicastWriter))
+                    for recorder in recorders)
+    shown = None if ansi_only else {}
+    render = True  # the frame the workers are making is written
+    next_render = 0.0
+    workers = TileWorkers(args.workers, size, settings, seed, not ansi_only)
+    try:
+        while True:
+            delay = DELAY_SPEED[args.delay]
+            if render and args.max_fps:
+                next_render = clock() + 1 / args.max_fps
+            # The next frame is asked for now, the workers make it while
+            # this one is written.
+            rendered = render
+            render = clock() + delay >= next_render
+            parts = workers.frame(render)
+            if rendered:
+                delta = TileDelta(size, parts, palette, shown)
+                palette = delta.palette
+                if not delta.empty():
+                    if shown is not None:
+                        if delta.redraw:
+                            shown.clear()
+                        shown.update(delta.cells)
+                    for recorder in recorders:
+                        recorder.record(delta)
+            clock.tick(delay)
+            frames += 1
+            if stop.is_set():
+                break
+            if args.run_timer and clock() >= args.run_timer:
+                break
+            if args.frames and frames >= args.frames:
+                break
+            await asyncio.sleep(delay if live_output(args) else 0)
+    finally:
+        workers.close()
+    return frames
+
+
+def live_output(args: argparse.Namespace) -> bool:
+    """ Returns True when frames are watched as they are made. """
+    return bool(args.framebuffer or args.shared_memory or args.serve
+                or args.wall)
+
+
+def headless_loop(args: argparse.Namespace) -> None:
+    """
+    Runs without a terminal as fast as possible. Frames are only written to
+    the outputs, timed by the frame clock, until it reaches the run timer
+    or args.frames frames are drawn. Without any other output they are
+    written to stdout as ANSI. The frame rate and the rate of the ANSI
+    output are reported on stderr at the end. With a live output, a
+    framebuffer, shared memory, the broadcast server or a video wall, it
+    runs in real time and the run timer is optional.
+    """
+    if not live_output(args):
+        if not args.run_timer and not args.frames:
+            raise PyMatrixError("Error --headless needs a run timer (-R) or "
+                                "--frames.")
+        if not (args.record or args.asciicast or args.ansi or args.video):
+            args.ansi = "-"
+    width, height = args.size
+    if args.video or args.framebuffer:
+        atlas = GlyphAtlas.load(args.font)
+        pixels = args.fb_size if args.framebuffer else args.video_size
+        width = pixels[0] // atlas.width
+        height = pixels[1] // atlas.height
+    if args.wall:
+        width = args.wall_tile[0] * args.wall_columns
+        height = args.wall_tile[1] * (len(args.wall) // args.wall_columns)
+    start = time.perf_counter()
+    if args.jobs > 1:
+        frames, written = export_parts(args, (height, width))
+    else:
+        recorders = []
+        frames = asyncio.run(async_matrix_loop(
+            VirtualScreen(height, width), args, recorders))
+        written = [recorder.written for recorder in recorders
+                   if isinstance(recorder, AnsiWriter)]
+    if live_output(args):
+        return
+    seconds = max(time.perf_counter() - start, 1e-9)
+    report = (f"{frames} frames in {seconds:.2f} seconds, "
+              f"{frames / seconds:.0f} frames/s")
+    if written:
+        report += f", {sum(written) / seconds / 1e6:.1f} MB/s of ANSI"
+    print(report, file=sys.stderr)
+
+
+class ExportRun:
+    """
+    A --jobs export at the start of a frame: the engine, with its random
+    numbers, the frame clock and the cells last written and drawn since.
+    step() runs a frame with run_frame, the way render_loop does headless.
+    Without a frame buffer the run takes the cells itself and only keeps
+    them, so a part of the export runs the engine up to its first frame
+    cheaply before carrying on with the outputs.
+    """
+    dropped = 0  # exports never drop frames
+
+    def __init__(self, args: argparse.Namespace, size: Tuple[int, int],
+                 seed: Union[int, str]):
+        self.args = args
+        settings = MatrixSettings.from_args(args)
+        self.engine = MatrixEngine(size, settings, seed)
+        self.clock = FrameClock()
+        self.palette = self.shown_palette = self.engine.palette
+        self.next_render = 0.0
+        self.shown = {}
+        self.changes = {}
+        self.touched = False
+        self.redraw = True
+
+    def draw(self, y: int, x: int, char: str, attr: int = 0) -> None:
+        self.changes[(y, x)] = (char, attr)
+
+    def sync(self) -> None:
+        pass
+
+    def touch(self) -> None:
+        self.touched = self.redraw = True
+
+    def recolor(self, palette: Palette) -> None:
+        self.palette = palette
+
+    def flush(self, screen, budget: Optional[float] = None) -> bool:
+        if not self.changes and not self.touched:
+            return False
+        self.shown.update(self.changes)
+        self.changes = {}
+        self.touched = self.redraw = False
+        self.shown_palette = self.palette  # the colors of the cells shown
+        return True
+
+    def frame_buffer(self, recorders: Sequence) -> FrameBuffer:
+        """ Returns a FrameBuffer for the recorders that carries on. """
+        frame = FrameBuffer(None, recorders)
+        frame.shown = self.shown
+        frame.touched = self.touched
+        frame.redraw = self.redraw
+        frame.recolor(self.palette)
+        for (y, x), (char, attr) in self.changes.items():
+            frame.draw(y, x, char, attr)
+        return frame
+
+    def step(self, frame: Optional[FrameBuffer] = None,
+             screen: Optional[VirtualScreen] = None) -> None:
+        """ Runs a frame, written to screen through frame when given. """
+        _, self.next_render = run_frame(
+            screen, frame or self, self.engine, self.clock, self.args,
+            self.args.status, next_render=self.next_render)
+
+
+def export_frames(args: argparse.Namespace) -> int:
+    """
+    Returns the number of frames of a --frames export, fewer when the
+    frame clock reaches the run timer first.
+    """
+    if not args.run_timer:
+        return args.frames
+    clock = FrameClock()
+    delay = DELAY_SPEED[args.delay]
+    while clock.frames < args.frames:
+        clock.tick(delay)
+        if clock() >= args.run_timer:
+            break
+    return clock.frames
+
+
+def export_part(args: argparse.Namespace, size: Tuple[int, int],
+                paths: dict, seed: int, start: int, end: int, head: bool,
+                tail: bool) -> Tuple[int, List[int]]:
+    """
+    Renders the frames start to end of a --jobs export to the files in
+    paths, by output option. Runs in a worker process. The ExportRun of
+    the seed is run up to frame start without the outputs, so the part
+    carries on exactly where the part before it stopped. Returns the number
+    of frames recorded and the bytes of ANSI written.
+    """
+    run = ExportRun(args, size, seed)
+    while run.clock.frames < start:
+        run.step()
+    # The outputs are timed from the start of the export.
+    clock = FrameClock()
+    recorders = []
+    if "asciicast" in paths:
+        recorders.append(AsciicastWriter(paths["asciicast"], size, clock,
+                                         True, head, tail))
+    if "ansi" in paths:
+        recorders.append(AnsiWriter(paths["ansi"], True, head, tail))
+    if "video" in paths:
+        recorders.append(VideoWriter(
+            paths["video"], args.video_format, args.video_size,
+            GlyphAtlas.load(args.font), clock, args.video_fps, True, head,
+            tail))
+    clock.time, clock.frames = run.clock.time, run.clock.frames
+    run.clock = clock
+    if start:
+        screen = None
+        if run.shown:
+            screen = FrameDelta(size, dict(run.shown), True,
+                                run.shown_palette)
+        for recorder in recorders:
+            if hasattr(recorder, "seek"):
+                recorder.seek(clock(), screen)
+    frame = run.frame_buffer(recorders)
+    screen = VirtualScreen(*size)
+    try:
+        while clock.frames < end:
+            run.step(frame, screen)
+    finally:
+        for recorder in recorders:
+            recorder.close()
+    return end - start, [recorder.written for recorder in recorders
+                         if isinstance(recorder, AnsiWriter)]
+
+
+def export_parts(args: argparse.Namespace,
+                 size: Tuple[int, int]) -> Tuple[int, List[int]]:
+    """
+    Renders a --frames export in args.jobs worker processes. The frames are
+    split into one range per job, each rendered by export_part to files in
+    a temporary directory, and the files of the ranges are joined in order
+    into the outputs. Each part runs the engine from the same seed up to
+    its first frame, so the outputs are the same as those of one process.
+    That run up to the first frame is not split, so the last parts take
+    the longest and more jobs gain less and less. Returns the number of
+    frames and the bytes of ANSI written.
+    """
+    seed = random.randrange(1 << 32) if args.seed is None else args.seed
+    outputs = {name: getattr(args, name)
+               for name in ("asciicast", "ansi", "video")
+               if getattr(args, name)}
+    frames = export_frames(args)
+    jobs = min(args.jobs, frames)
+    bounds = [frames * i // jobs for i in range(jobs + 1)]
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        with context.Pool(jobs) as pool:
+            results = []
+            for number, (first, last) in enumerate(zip(bounds, bounds[1:])):
+                paths = {name: os.path.join(directory, f"{number}.{name}")
+                         for name in outputs}
+                results.append(pool.apply_async(
+                    export_part, (args, size, paths, seed, first, last,
+                                  number == 0, number == jobs - 1)))
+            results = [result.get() for result in results]
+        for name, path in outputs.items():
+            try:
+                if path == "-":
+                    output = open(sys.stdout.fileno(), "wb", closefd=False)
+                else:
+                    output = open(path, "wb")
+            except OSError as e:
+                raise PyMatrixError(f"Error writing to {path}: {e.strerror}")
+            with output:
+                for number in range(jobs):
+                    with open(os.path.join(directory, f"{number}.{name}"),
+                              "rb") as part:
+                        shutil.copyfileobj(part, output, RECORD_BUFFER)
+    frames = sum(result[0] for result in results)
+    written = [sum(sizes) for sizes in zip(*(result[1]
+                                             for result in results))]
+    return frames, written
+
+
+def setup_curses_recording_colors(
+        attrs: Sequence[Tuple[int, int, int]]) -> List[int]:
+    """
+    Sets up a color pair for every foreground and background used in a
+    recording. Returns the curses attribute for each recorded attribute.
+    """
+    pairs = {}
+    result = []
+    for fg, bg, flags in attrs:
+        if (fg, bg) not in pairs:
+            pair = len(pairs) + 1
+            try:
+                curses.init_pair(pair, fg, bg)
+            except (curses.error, ValueError):
+                pair = 0  # colors or pairs not supported by the terminal
+            pairs[(fg, bg)] = pair
+        attr = curses.color_pair(pairs[(fg, bg)])
+        if flags & 1:
+            attr += curses.A_BOLD
+        if flags & 2:
+            attr += curses.A_ITALIC
+        result.append(attr)
+    return result
+
+
+def play_frame(screen,
+               frame: FrameBuffer,
+               recording: Recording,
+               attrs: Sequence[int],
+               header: Optional[Tuple[int, int, int]],
+               cells: array.array) -> None:
+    """
+    Draws a recorded frame. A keyframe replaces every cell on the screen.
+    Cells outside of the screen are skipped.
+    """
+    size_y, size_x = screen.getmaxyx()
+    if header is not None:
+        for y, x in list(frame.shown) + list(frame.changes):
+            frame.draw(y, x, " ")
+    glyphs = recording.glyphs
+    for i in range(0, len(cells), 4):
+        y, x = cells[i], cells[i + 1]
+        if y >= size_y or x >= size_x or (y, x) == (size_y - 1, size_x - 1):
             continue
-        else:
-            keys_pressed = 0
-        if ch == 98:  # b
-            args.bold_on = True
-            args.bold_all = False
-        elif ch == 66:  # B
-            args.bold_all = True
-            args.bold_on = False
-        elif ch in [78, 110]:  # n or N
-            args.bold_on = False
-            args.bold_all = False
-        elif ch in [114, 116, 121, 117, 105, 111, 112, 91]:
-            # r, t, y, u, i, o, p, [
-            args.color = CURSES_CH_CODES_COLOR[ch]
-            setup_curses_colors(args.color, args.background, args.over_ride)
-            color_mode = "normal"
-        elif ch in [82, 84, 89, 85, 73, 79, 80, 123]:
-            # R, T, Y, U, I, O, P, {
-            args.lead_color = CURSES_CH_CODES_COLOR[ch]
-            curses_lead_color(args.lead_color, args.background, args.over_ride)
-        elif ch in [18, 20, 25, 21, 9, 15, 16, 27]:
-            # ctrl R, T, Y, U, I, O, P, [
-            args.background = CURSES_CH_CODES_COLOR[ch]
-            setup_curses_colors(args.color, args.background, args.over_ride)
-            curses_lead_color(args.lead_color, args.background, args.over_ride)
-            screen.bkgd(" ", curses.color_pair(1))
-        elif ch == 97:  # a
-            args.async_scroll = not args.async_scroll
-        elif ch == 109:  # m
-            if color_mode in ["random", "normal", "cycle"]:
-                color_mode = "multiple"
-                setup_curses_colors("random", args.background, args.over_ride)
-            else:
-                color_mode = "normal"
-                setup_curses_colors("green", args.background, args.over_ride)
-        elif ch == 77:  # M
-            if color_mode in ["multiple", "normal", "cycle"]:
-                color_mode = "random"
-                setup_curses_colors("random", args.background, args.over_ride)
+        frame.draw(y, x, glyphs[cells[i + 2]], attrs[cells[i + 3]])
+
+
+async def play_loop(screen,
+                    args: argparse.Namespace,
+                    keys: asyncio.Queue,
+                    stop: asyncio.Event,
+                    writer: Optional[FrameWriter] = None) -> None:
+    """
+    Plays a recording made with --record through the frame buffer at
+    --play_speed. f pauses, the arrow keys seek and q quits. Seeking jumps
+    to the keyframe before the wanted time and draws the frames from there
+    without waiting.
+    """
+    curses.curs_set(0)
+    screen.timeout(0)
+    recording = Recording(args.play)
+    try:
+        attrs = setup_curses_recording_colors(recording.attrs)
+        frame = FrameBuffer(writer)
+        background = None
+        speed = args.play_speed
+        position = 0
+
+        def show(record) -> None:
+            nonlocal background
+            header = record[2]
+            if header is not None and attrs[header[2]] != background:
+                background = attrs[header[2]]
+                frame.sync()
+                screen.bkgd(" ", background)
+                frame.touch()
+            play_frame(screen, frame, recording, attrs, *record[2:])
+
+        def seek(ms: int):
+            frames = recording.frames(recording.seek(ms))
+            for record in frames:
+                if record[1] > ms:
+                    break
+                show(record)
             else:
-                color_mode = "normal"
-                setup_curses_colors("green", args.background, args.over_ride)
-        elif ch == 99:  # c
-            if color_mode in ["random", "multiple", "normal"]:
-                color_mode = "cycle"
+                record = None
+            frame.flush(screen)
+            return frames, record, time.monotonic() - ms / 1000 / speed
+
+        frames, record, start = seek(position)
+        while True:
+            if record is None:
+                due = recording.duration
             else:
-                color_mode = "normal"
-        elif ch == 108:  # l
-            if direction == "right" or direction == "left":
+                due = record[1]
+            delay = start + due / 1000 / speed - time.monotonic()
+            ch = await wait_for_key(keys, stop, timeout=max(0.0, delay))
+            if stop.is_set():
+                break
+            if ch is None:
+                if record is None:
+                    break
+                show(record)
+                frame.flush(screen)
+                record = next(frames, None)
                 continue
-            if spacer == 1:
-                spacer = 2
-                x_list = [x for x in range(0, size_x, spacer)]
-                line_list.clear()
-                screen.clear()
-                screen.refresh()
-            else:
-                spacer = 1
-                x_list = [x for x in range(0, size_x, spacer)]
-        elif ch == 101:  # e
-            args.zero_one = False
-            if args.ext or args.ext_only:
-                args.ext = False
-            else:
-                args.ext = True
-            char_set = build_character_set2(args)
-        elif ch == 69:  # E
-            args.zero_one = False
-            args.ext_only = not args.ext_only
-            char_set = build_character_set2(args)
-        elif ch == 122 and not args.zero_one:  # z
-            args.zero_one = True
-            char_set = build_character_set2(args)
-        elif ch == 90 and args.zero_one:  # Z
-            args.zero_one = False
-            char_set = build_character_set2(args)
-        elif ch == 23:  # ctrl-w
-            args.wakeup = not args.wakeup
-        elif ch == 118:  # v
-            args.reverse = not args.reverse
-            x_list = [x for x in range(0, size_x, spacer)]
-            args.scroll_right = False
-            if direction == "down":
-                direction = "up"
-            elif direction == "up":
-                direction = "down"
-            else:
-                direction = "up"
-            line_list.clear()
-            screen.clear()
-            screen.refresh()
-        elif ch == 115:  # s
-            args.old_school_scrolling = not args.old_school_scrolling
-            if direction == "old scrolling":
-                direction = "down"
-            else:
-                direction = "old scrolling"
-            args.scroll_left = False
-            args.scroll_right = False
-            x_list = [x for x in range(0, size_x, spacer)]
-            screen.clear()
-            screen.refresh()
-            line_list.clear()
-            time.sleep(0.2)
-
-        elif ch == 261:  # right arrow
-            if not args.scroll_right:
-                args.scroll_right = True
-                args.scroll_left = False
-                args.reverse = False
-                args.old_school_scrolling = False
-                direction = "right"
-                line_list.clear()
-                screen.clear()
-                screen.refresh()
-                time.sleep(0.4)
-                y_list = [y for y in range(1, size_y)]
-        elif ch == 260:  # left arrow
-            if not args.scroll_left:
-                args.scroll_left = True
-                args.scroll_right = False
-                args.reverse = False
-                args.old_school_scrolling = False
-                direction = "left"
-                line_list.clear()
-                screen.clear()
-                screen.refresh()
-                time.sleep(0.4)
-                y_list = [y for y in range(1, size_y)]
-        elif ch == 259:  # up arrow
-            if not args.reverse:
-                args.reverse = True
-                args.scroll_right = False
-                args.old_school_scrolling = False
-                direction = "up"
-                line_list.clear()
-                screen.clear()
-                screen.refresh()
-                time.sleep(0.4)
-                x_list = [x for x in range(0, size_x, spacer)]
-        elif ch == 258:  # down arrow
-            if direction != "down":
-                args.reverse = False
-                args.scroll_right = False
-                args.old_school_scrolling = False
-                direction = "down"
-                line_list.clear()
-                screen.clear()
-                screen.refresh()
-                time.sleep(0.3)
-                x_list = [x for x in range(0, size_x, spacer)]
-        elif ch in [100, 68]:  # d, D
-            args.zero_one = False
-            args.bold_on = False
-            args.bold_all = False
-            args.background = "black"
-            args.color = "green"
-            args.lead_color = "white"
-            args.ext = False
-            args.ext_only = False
-            setup_curses_colors(args.color, args.background, args.over_ride)
-            curses_lead_color(args.lead_color, args.background, args.over_ride)
-            color_mode = "normal"
-            args.async_scroll = False
-            args.delay = 4
-            args.Katakana_only = False
-            args.katakana = False
-            if direction == "old scrolling":
-                args.old_school_scrolling = False
-                x_list = [x for x in range(0, size_x, spacer)]
-                screen.clear()
-                screen.refresh()
-                line_list.clear()
-                time.sleep(0.2)
-            if direction == "right" or direction == "left":
-                args.scroll_right = False
-                args.scroll_left = False
-                x_list = [x for x in range(0, size_x, spacer)]
-                screen.clear()
-                screen.refresh()
-                line_list.clear()
-                time.sleep(0.2)
-            direction = "down"
-            args.do_not_clear = False
-            args.italic = False
-            if spacer == 2:
-                spacer = 1
-                x_list = [x for x in range(0, size_x, spacer)]
-            if args.reverse:
-                args.reverse = False
-                line_list.clear()
+            position = int((time.monotonic() - start) * 1000 * speed)
+            if args.screen_saver or ch in [81, 113]:  # q, Q
+                break
+            elif ch == 102:  # f
+                frame.flush(screen)
+                if await wait_for_key(keys, stop, [102, 81, 113]) != 102:
+                    break
+                frames, record, start = seek(position)
+            elif ch == 261:  # right arrow
+                position = min(position + SEEK_STEP, recording.duration)
+                frames, record, start = seek(position)
+            elif ch == 260:  # left arrow
+                position = max(position - SEEK_STEP, 0)
+                frames, record, start = seek(position)
+            elif ch == curses.KEY_RESIZE:
+                frame.clear(screen)
+                frames, record, start = seek(position)
+    finally:
+        recording.close()
+    frame.sync()
+    screen.erase()
+    screen.refresh()
+
+
+def loop_cache_path(args: argparse.Namespace, size: Tuple[int, int]) -> str:
+    """
+    Returns the cache file of a --loop. The name is a hash of the options
+    that change the picture, the screen size and the version, so changing
+    any of them makes a new loop.
+    """
+    options = {key: value for key, value in vars(args).items()
+               if key not in LOOP_IGNORED}
+    key = json.dumps([version, LOOP_VERSION, list(size), options],
+                     sort_keys=True, default=str)
+    directory = args.loop_cache or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+        "pymatrix")
+    digest = hashlib.sha256(key.encode()).hexdigest()[:20]
+    return os.path.join(directory, f"loop-{digest}.pyml")
+
+
+def prune_loop_cache(directory: str, keep: int = LOOP_CACHE_FILES) -> None:
+    """
+    Deletes all but the keep most recently used loops in directory. Loops
+    are touched when they are played, so the loop with the oldest
+    modification time is the one used the longest time ago.
+    """
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    loops = []
+    for name in names:
+        if name.startswith("loop-") and name.endswith(".pyml"):
+            path = os.path.join(directory, name)
+            try:
+                loops.append((os.stat(path).st_mtime, path))
+            except OSError:
+                pass
+    loops.sort(reverse=True)
+    for _, path in loops[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+async def build_loop(args: argparse.Namespace,
+                     size: Tuple[int, int],
+                     path: str,
+                     stop: asyncio.Event,
+                     keys: Optional[asyncio.Queue] = None) -> bool:
+    """
+    Renders a --loop of args.loop minutes to path. Lines stop starting at
+    the end of the loop and the run goes on until the last one is gone.
+    Those extra frames are laid over the start of the loop, under the new
+    lines, so lines running off the end carry on at the start and the last
+    frame leads into the first. Every frame is encoded once as the ANSI
+    changes from the frame before. Once written only the LOOP_CACHE_FILES
+    most recently used loops are kept in the cache directory.
+
+    The keys are read while building, q quits, or any key in screen saver
+    mode. Returns False when stopped or quit before the loop was done.
+    """
+    delay = DELAY_SPEED[args.delay]
+    length = max(1, round(args.loop * 60 / delay))
+    build_args = argparse.Namespace(**vars(args))
+    build_args.headless = True
+    build_args.status = False
+    build_args.cpu_budget = 0
+    build_args.run_timer = 0
+    build_args.framebuffer = build_args.shared_memory = build_args.serve = None
+    build_args.wall = None
+    clock = FrameClock()
+    recorder = LoopRecorder(clock, delay)
+    quit_build = asyncio.Event()
+    watch = asyncio.ensure_future(wait_for_key(
+        asyncio.Queue() if keys is None else keys, stop,
+        None if args.screen_saver else [81, 113]))  # q, Q
+    watch.add_done_callback(lambda _: quit_build.set())
+    try:
+        await render_loop(VirtualScreen(*size), build_args, asyncio.Queue(),
+                          asyncio.Queue(), quit_build, recorders=[recorder],
+                          clock=clock, spawn_until=(length - 0.5) * delay)
+        if quit_build.is_set():
+            return False
+    finally:
+        watch.cancel()
+    # The screen at the start of each lap of the run.
+    states = [{}]
+    screen = {}
+    for number in range(round(clock() / delay) + 1):
+        if number and number % length == 0:
+            states.append(dict(screen))
+        frame = recorder.frames.get(number)
+        if frame is not None:
+            if frame[0]:
                 screen.clear()
-                screen.refresh()
-            char_set = build_character_set2(args)
-        elif color_mode == "cycle" and ch in CURSES_CH_CODES_CYCLE_DELAY.keys():
-            cycle_delay = 100 * CURSES_CH_CODES_CYCLE_DELAY[ch]
-            count = cycle_delay
-        elif 48 <= ch <= 57:  # number keys 0 to 9
-            args.delay = int(chr(ch))
-        elif ch == 87:  # W
-            args.do_not_clear = not args.do_not_clear
-        elif ch == 119:  # w
+            screen.update(frame[1])
+    blank = (" ", recorder.escape(0))
+    shown = {}
+    first = {}
+    blobs = []
+    for number in range(length):
+        changed = set().union(*states) if number == 0 else set()
+        for lap, state in enumerate(states):
+            frame = recorder.frames.get(number + lap * length)
+            if frame is not None:
+                if frame[0]:
+                    changed.update(state)
+                    state.clear()
+                changed.update(frame[1])
+                state.update(frame[1])
+        changes = {}
+        for position in changed:
+            cell = blank
+            for state in [states[0]] + states[:0:-1]:
+                value = state.get(position)
+                if value is not None and value[0] != " ":
+                    cell = value
+                    break
+            if shown.get(position, blank) != cell:
+                changes[position] = cell
+        shown.update(changes)
+        if number == 0:
+            first = dict(shown)
+            cells = {position: cell for position, cell in shown.items()
+                     if cell != blank}
+            blobs.append("\x1b[?25l" + blank[1] + "\x1b[2J"
+                         + ansi_cells(cells, str))
+        else:
+            blobs.append(ansi_cells(changes, str))
+    changes = {position: first.get(position, blank)
+               for position in set(shown) | set(first)
+               if shown.get(position, blank) != first.get(position, blank)}
+    blobs.append(ansi_cells(changes, str))
+    temp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp, "wb") as f:
+            data = [blob.encode() for blob in blobs]
+            offsets = [LOOP_HEADER.size + 8 * (len(data) + 1)]
+            for blob in data:
+                offsets.append(offsets[-1] + len(blob))
+            f.write(LOOP_HEADER.pack(LOOP_MAGIC, LOOP_VERSION, size[0],
+                                     size[1], length, delay))
+            f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+            for blob in data:
+                f.write(blob)
+        os.replace(temp, path)
+    except OSError as e:
+        raise PyMatrixError(f"Error writing {path}: {e.strerror}")
+    prune_loop_cache(os.path.dirname(path))
+    return True
+
+
+def write_all(fd: int, data) -> None:
+    while data:
+        data = data[os.write(fd, data):]
+
+
+async def loop_play(screen,
+                    args: argparse.Namespace,
+                    keys: asyncio.Queue,
+                    stop: asyncio.Event) -> None:
+    """
+    Plays a --loop from its cache, building it first when there is none
+    for the options and screen size. Frames are written to the terminal
+    straight from the memory mapped cache, so playing costs one write per
+    frame. q quits, also while building, and a resize builds or loads the
+    loop for the new size.
+    """
+    curses.curs_set(0)
+    screen.timeout(0)
+    out = sys.stdout.fileno()
+    while True:
+        size = screen.getmaxyx()
+        path = loop_cache_path(args, size)
+        if not os.path.exists(path):
             screen.clear()
+            screen.addstr(0, 0, f"Building a {args.loop:g} minute loop"
+                          [:size[1] - 1])
             screen.refresh()
-            line_list.clear()
-            time.sleep(2)
-            continue
-        elif ch == 106:  # j
-            args.italic = not args.italic
-        elif ch == 102:  # f
-            # Freeze the Matrix
-            quit_matrix = False
+            if not await build_loop(args, size, path, stop, keys):
+                return
+        cache = LoopCache(path)
+        try:
+            os.utime(path)  # used most recently, kept longest in the cache
+        except OSError:
+            pass
+        screen.clear()
+        screen.refresh()
+        try:
+            write_all(out, cache.blob(0))
+            start = time.monotonic()
+            number = 1
             while True:
-                ch = screen.getch()
-                if ch == 102:
-                    break
-                elif ch in [81, 113]:  # q, Q
-                    quit_matrix = True
+                due = start + number * cache.delay
+                ch = await wait_for_key(keys, stop, timeout=max(
+                    0.0, due - time.monotonic()))
+                if stop.is_set():
+                    return
+                if ch is None:
+                    write_all(out, cache.blob((number - 1) % cache.frames
+                                              + 1))
+                    number += 1
+                elif args.screen_saver or ch in [81, 113]:  # q, Q
+                    return
+                elif ch == curses.KEY_RESIZE:
                     break
-            if quit_matrix:
-                break
-        elif ch == 75:  # K
-            args.zero_one = False
-            args.Katakana_only = not args.Katakana_only
-            char_set = build_character_set2(args)
-        elif ch == 107:  # k
-            args.zero_one = False
-            args.Katakana_only = False
-            args.katakana = not args.katakana
-            char_set = build_character_set2(args)
-
-    screen.erase()
-    screen.refresh()
+        finally:
+            cache.close()
+            write_all(out, b"\x1b[0m")
 
 
-def curses_lead_color(color: str, bg_color: str, over_ride: bool) -> None:
+def curses_color(color: str, over_ride: bool) -> int:
+    """ Returns the curses color number of a color name. """
     if over_ride:
-        curses.init_pair(10, CURSES_OVER_RIDE_COLORS[color],
-                         CURSES_OVER_RIDE_COLORS[bg_color])
+        return CURSES_OVER_RIDE_COLORS[color]
+    return CURSES_COLOR[color]
+
+
+def line_color_pairs(color: str, bg_color: str, over_ride: bool) -> dict:
+    """ Returns the color pairs of the lines, from pair 1. """
+    if color == "random":
+        color_list = list(CURSES_COLOR.keys())
+    else:
+        color_list = [color for _ in range(7)]
+    bg = curses_color(bg_color, over_ride)
+    return {x + 1: (curses_color(c, over_ride), bg)
+            for x, c in enumerate(color_list)}
+
+
+def color_number_pairs(color_num: int, bg_color: str,
+                       override: bool) -> dict:
+    """ Returns the color pairs of the lines for a color number. """
+    bg = curses_color(bg_color, override)
+    return {x + 1: (color_num, bg) for x in range(7)}
+
+
+def settings_pairs(settings: "MatrixSettings") -> dict:
+    """
+    Returns the color pairs of settings, {pair: (fg, bg)}, the pairs the
+    attributes of a MatrixEngine refer to.
+    """
+    over_ride = settings.over_ride
+    pairs = {WAKE_UP_PAIR: (curses_color("green", over_ride),
+                            curses_color("black", over_ride))}
+    if settings.color_mode in ["multiple", "random"]:
+        pairs.update(line_color_pairs("random", settings.background,
+                                      over_ride))
+    elif settings.color_number is not None:
+        pairs.update(color_number_pairs(settings.color_number,
+                                        settings.background, over_ride))
     else:
-        curses.init_pair(10, CURSES_COLOR[color], CURSES_COLOR[bg_color])
+        pairs.update(line_color_pairs(settings.color, settings.background,
+                                      over_ride))
+    pairs[10] = (curses_color(settings.lead_color, over_ride),
+                 curses_color(settings.background, over_ride))
+    return pairs
+
+
+def curses_lead_color(color: str, bg_color: str, over_ride: bool) -> None:
+    Colors.init_pair(10, curses_color(color, over_ride),
+                     curses_color(bg_color, over_ride))
 
 
 def setup_curses_color_number(
         color_num: int,
         bg_color: str,
         override: bool) -> None:
-
-    if override:
-        bg = CURSES_OVER_RIDE_COLORS[bg_color]
-    else:
-        bg = CURSES_COLOR[bg_color]
-
-    color_list = [color_num for _ in range(7)]
-    for x, c in enumerate(color_list):
-        curses.init_pair(x + 1, c, bg)
+    Colors.init_pairs(color_number_pairs(color_num, bg_color, override))
 
 
 def setup_curses_colors(color: str, bg_color: str, over_ride: bool) -> None:
     """ Init colors pairs in the curses. """
-    if over_ride:
-        if color == "random":
-            color_list = list(CURSES_OVER_RIDE_COLORS.keys())
-        else:
-            color_list = [color for _ in range(7)]
-
-        for x, c in enumerate(color_list):
-            curses.init_pair(x + 1, CURSES_OVER_RIDE_COLORS[c],
-                             CURSES_OVER_RIDE_COLORS[bg_color])
-    else:
-        if color == "random":
-            color_list = list(CURSES_COLOR.keys())
-        else:
-            color_list = [color for _ in range(7)]
-
-        for x, c in enumerate(color_list):
-            curses.init_pair(x + 1, CURSES_COLOR[c], CURSES_COLOR[bg_color])
+    Colors.init_pairs(line_color_pairs(color, bg_color, over_ride))
 
 
 def setup_curses_wake_up_colors(override: bool) -> None:
-    if override:
-        curses.init_pair(WAKE_UP_PAIR,
-                         CURSES_OVER_RIDE_COLORS["green"],
-                         CURSES_OVER_RIDE_COLORS["black"])
-    else:
-        curses.init_pair(WAKE_UP_PAIR,
-                         CURSES_COLOR["green"],
-                         CURSES_COLOR["black"])
+    Colors.init_pair(WAKE_UP_PAIR, curses_color("green", override),
+                     curses_color("black", override))
 
 
-def wake_up_neo(screen, test_mode: bool) -> None:
+def wake_up_neo(test_mode: bool) -> "Cutscene":
     z = 0.06 if test_mode else 1  # For test mode - shorter test time
-    screen.erase()
-    screen.bkgd(" ", curses.color_pair(WAKE_UP_PAIR))
-    screen.refresh()
-    time.sleep(3 * z)
-    display_text(screen, "Wake up, Neo...", 0.08 * z, 7.0 * z)
-    display_text(screen, "The Matrix has you...", 0.25 * z, 7.0 * z)
-    display_text(screen, "Follow the white rabbit.", 0.1 * z, 7.0 * z)
-    display_text(screen, "Knock, knock, Neo.", 0.01 * z, 3.0 * z)
-    time.sleep(2 * z)
-
-
-def display_text(screen, text: str, type_time: float, hold_time: float) -> None:
-    for i, letter in enumerate(text, start=1):
-        screen.addstr(1, i, letter,
-                      curses.color_pair(WAKE_UP_PAIR) + curses.A_BOLD)
-        screen.refresh()
-        time.sleep(type_time)
-    time.sleep(hold_time)
-    screen.erase()
-    screen.refresh()
+    return Cutscene([("Wake up, Neo...", 0.08 * z, 7.0 * z),
+                     ("The Matrix has you...", 0.25 * z, 7.0 * z),
+                     ("Follow the white rabbit.", 0.1 * z, 7.0 * z),
+                     ("Knock, knock, Neo.", 0.01 * z, 3.0 * z)],
+                    start=3 * z, end=2 * z)
 
 
 def positive_int_zero_to_nine(value: str) -> int:
@@ -894,6 +3295,38 @@ def positive_int(value: str) -> int:
     return int_value
 
 
+def positive_float(value: str) -> float:
+    """
+    Used by argparse.
+    Checks to see if the value is a positive number.
+    """
+    msg = f"{value} is an invalid positive number"
+    try:
+        float_value = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(msg)
+    else:
+        if not float_value > 0 or float_value == float("inf"):
+            raise argparse.ArgumentTypeError(msg)
+    return float_value
+
+
+def screen_size(value: str) -> Tuple[int, int]:
+    """
+    Used by argparse.
+    Checks to see if the value is a screen size like 80x24 and returns the
+    width and height.
+    """
+    msg = f"{value} is an invalid screen size. Use WIDTHxHEIGHT like 80x24"
+    try:
+        width, height = (int(v) for v in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(msg)
+    if width < MIN_SCREEN_SIZE_X or height < MIN_SCREEN_SIZE_Y:
+        raise argparse.ArgumentTypeError(msg)
+    return width, height
+
+
 def int_between_1_and_255(value: str) -> int:
     """
     Used by argparse. Checks to see if the value is between 1 and 255
@@ -908,6 +3341,20 @@ def int_between_1_and_255(value: str) -> int:
         raise argparse.ArgumentTypeError(msg)
 
 
+def port_number(value: str) -> int:
+    """
+    Used by argparse. Checks to see if the value is between 1 and 65535
+    """
+    msg = f"{value} is an invalid port number"
+    try:
+        int_value = int(value)
+        if int_value < 1 or int_value > 65535:
+            raise argparse.ArgumentTypeError(msg)
+        return int_value
+    except ValueError:
+        raise argparse.ArgumentTypeError(msg)
+
+
 def display_commands() -> None:
     print("Commands available during run")
     print("0 - 9  Delay time (0-Fast, 4-Default, 9-Slow)")
@@ -933,6 +3380,7 @@ def display_commands() -> None:
     print("w      Clear the screen, wait 2 seconds and restart")
     print("j      Toggle italic text")
     print("s      Toggle old school scrolling down only")
+    print("S      Toggle status line (cpu budget and dropped frames)")
     print("up arrow    Matrix scrolls down to up")
     print("down arrow  Matrix scrolls up to down (default)")
     print("right arrow Matrix scrolls from left to right")
@@ -941,6 +3389,7 @@ def display_commands() -> None:
     print("R,T,Y,U,I,O,P,{   Set lead character color")
     print("ctrl + r,t,y,u,i,o,p,[  Set background color")
     print("shift 0 - 9 Cycle color delay (0-Fast, 4-Default, 9-Slow)")
+    print("During --play: f pause, left and right arrow seek 10 seconds")
 
 
 def argument_parsing(
@@ -1022,6 +3471,135 @@ def argument_parsing(
     parser.add_argument("--disable_keys", action="store_true",
                         help="Disable keys except for Q to quit. Screensaver "
                              "mode will not be affected")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Write frames to the terminal on a separate "
+                             "thread while the next frame is simulated. "
+                             "Helps on slow terminals and ssh sessions")
+    parser.add_argument("--static_glyphs", action="store_true",
+                        help="Give every cell a fixed character that the "
+                             "rain lights up as it passes")
+    parser.add_argument("--glyph_mutations", type=positive_int, default=0,
+                        metavar="N",
+                        help="Change the character of N random cells each "
+                             "frame. Implies --static_glyphs")
+    parser.add_argument("--max_fps", type=positive_int, default=0,
+                        metavar="FPS",
+                        help="Write at most FPS frames a second. The rain "
+                             "moves at the same speed, the frames in "
+                             "between are merged")
+    parser.add_argument("--cpu_budget", "--cpu-budget", type=positive_int,
+                        default=0, metavar="PERCENT",
+                        help="Keep CPU use under PERCENT of one core by "
+                             "lowering the frame rate and the number of "
+                             "lines")
+    parser.add_argument("--status", action="store_true",
+                        help="Show a status line with the cpu budget and "
+                             "dropped frames")
+    parser.add_argument("--record", metavar="FILE",
+                        help="Record the run to FILE to be played back with "
+                             "--play")
+    parser.add_argument("--play", metavar="FILE",
+                        help="Play a recording made with --record. f pauses, "
+                             "the left and right arrow keys seek 10 seconds")
+    parser.add_argument("--play_speed", type=positive_float, default=1.0,
+                        metavar="SPEED",
+                        help="Playback speed. 2 plays twice as fast")
+    parser.add_argument("--asciicast", metavar="FILE",
+                        help="Record the run to FILE in asciicast v2 format "
+                             "to be played with asciinema")
+    parser.add_argument("--ansi", metavar="FILE",
+                        help="Also write the frames as ANSI escape sequences "
+                             "to FILE, such as another terminal. - for "
+                             "stdout with --headless")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run without a terminal as fast as possible, "
+                             "writing only to --asciicast, --ansi, --record "
+                             "or --video, ANSI to stdout without any of "
+                             "them. Used when stdout is not a terminal. -R "
+                             "or --frames sets the length. With "
+                             "--framebuffer, --shared_memory, --serve or "
+                             "--wall it runs in real time")
+    parser.add_argument("--frames", type=positive_int, default=0,
+                        metavar="N",
+                        help="Render N frames without a terminal as fast as "
+                             "possible and report the speed. Implies "
+                             "--headless")
+    parser.add_argument("--workers", type=positive_int, default=0,
+                        metavar="N",
+                        help="Simulate the columns in N processes, for very "
+                             "large --headless screens. Lines can not "
+                             "scroll left or right")
+    parser.add_argument("--jobs", type=positive_int, default=1,
+                        metavar="N",
+                        help="Render --frames in N processes, each one a "
+                             "range of the frames. The output is the same")
+    parser.add_argument("--seed", type=int, default=None, metavar="N",
+                        help="Seed the random numbers so runs are the same")
+    parser.add_argument("--size", type=screen_size, default=(80, 24),
+                        metavar="WIDTHxHEIGHT",
+                        help="Screen size for --headless. Default is 80x24")
+    parser.add_argument("--video", metavar="FILE",
+                        help="Render the run to a raw video stream in FILE, "
+                             "- for stdout. Needs --font")
+    parser.add_argument("--video_format", choices=["y4m", "ppm"],
+                        default=None,
+                        help="Video format. Default is y4m for .y4m files, "
+                             "otherwise ppm")
+    parser.add_argument("--video_size", type=screen_size,
+                        default=(1280, 720), metavar="WIDTHxHEIGHT",
+                        help="Video size in pixels. With --headless the "
+                             "screen size is the cells that fit. Default is "
+                             "1280x720")
+    parser.add_argument("--video_fps", type=positive_int, default=30,
+                        metavar="FPS",
+                        help="Video frame rate. Default is 30")
+    parser.add_argument("--font", metavar="FILE",
+                        help="BDF or PSF font used to draw the video")
+    parser.add_argument("--framebuffer", metavar="FILE",
+                        help="Draw to a framebuffer device such as /dev/fb0 "
+                             "or any file big enough. Needs --font")
+    parser.add_argument("--fb_size", type=screen_size, default=None,
+                        metavar="WIDTHxHEIGHT",
+                        help="Framebuffer size in pixels. Read from sysfs "
+                             "for framebuffer devices")
+    parser.add_argument("--fb_bpp", type=int, choices=[16, 24, 32],
+                        default=None,
+                        help="Framebuffer bits per pixel. Default is read "
+                             "from sysfs or 32")
+    parser.add_argument("--fb_stride", type=positive_int, default=None,
+                        metavar="BYTES",
+                        help="Bytes per framebuffer row. Default is read "
+                             "from sysfs or the width times the bytes per "
+                             "pixel")
+    parser.add_argument("--shared_memory", metavar="NAME",
+                        help="Publish the screen in the shared memory "
+                             "segment NAME for other processes")
+    parser.add_argument("--serve", type=port_number, metavar="PORT",
+                        help="Stream the rain to telnet or nc clients "
+                             "connecting to PORT")
+    parser.add_argument("--serve_host", default="127.0.0.1", metavar="HOST",
+                        help="Address --serve listens on. Default is "
+                             "127.0.0.1, use 0.0.0.0 for every interface")
+    parser.add_argument("--wall", nargs="+", metavar="TTY",
+                        help="Show one screen across several terminals, "
+                             "such as /dev/tty1 /dev/tty2, as the tiles of a "
+                             "video wall. Runs without the current terminal")
+    parser.add_argument("--wall_columns", type=positive_int, metavar="N",
+                        help="Number of --wall tiles side by side. The tiles "
+                             "are filled row by row. Default is one row")
+    parser.add_argument("--wall_tile", type=screen_size,
+                        metavar="WIDTHxHEIGHT",
+                        help="Size of each --wall tile. Default is the "
+                             "largest size that fits every terminal")
+    parser.add_argument("--control", metavar="SOCKET",
+                        help="Take key commands, such as \"t 5 up\", one "
+                             "line at a time on a Unix domain socket")
+    parser.add_argument("--loop", type=positive_float, metavar="MINUTES",
+                        help="Play a seamless loop of MINUTES made once and "
+                             "kept in a cache file. Uses almost no CPU")
+    parser.add_argument("--loop_cache", metavar="DIR",
+                        help="Directory for --loop files. Default is "
+                             "~/.cache/pymatrix")
     parser.add_argument("--list_colors", action="store_true",
                         help="Show available colors and exit. ")
     parser.add_argument("--list_commands", action="store_true",
@@ -1046,9 +3624,71 @@ def main(argv: Optional[Sequence[str]] = None) -> None:
         display_commands()
         return
 
+    if args.video and not args.font:
+        print("Error --video needs a --font.")
+        return
+    if args.video and args.video_format is None:
+        args.video_format = "y4m" if args.video.endswith(".y4m") else "ppm"
+    if args.framebuffer:
+        if not args.font:
+            print("Error --framebuffer needs a --font.")
+            return
+        layout = framebuffer_layout(args.framebuffer)
+        args.fb_size = args.fb_size or layout.get("size")
+        if args.fb_size is None:
+            print("Error --framebuffer needs --fb_size.")
+            return
+        args.fb_bpp = args.fb_bpp or layout.get("bpp", 32)
+        if args.fb_bpp not in FRAMEBUFFER_FORMATS:
+            print(f"Error {args.fb_bpp} bits per pixel is not supported.")
+            return
+        args.fb_stride = (args.fb_stride or layout.get("stride")
+                          or args.fb_size[0] * args.fb_bpp // 8)
+
+    if args.wall:
+        args.wall_columns = args.wall_columns or len(args.wall)
+        if len(args.wall) % args.wall_columns:
+            print("Error --wall needs full rows of --wall_columns "
+                  "terminals.")
+            return
+        args.wall_tile = args.wall_tile or wall_tile_size(args.wall)
+        if args.wall_tile is None:
+            print("Error --wall needs --wall_tile.")
+            return
+    if (args.frames or args.wall
+            or not (args.play or args.loop or sys.stdout.isatty())):
+        args.headless = True
+    if args.loop and args.headless:
+        print("Error --loop can not be used with --headless.")
+        return
+    if args.jobs > 1:
+        if not args.frames:
+            print("Error --jobs needs --frames.")
+            return
+        if args.record or args.workers or live_output(args):
+            print("Error --jobs only renders to --ansi, --asciicast or "
+                  "--video.")
+            return
+        if args.cpu_budget:
+            print("Error --jobs can not be used with --cpu_budget.")
+            return
+    if args.workers:
+        if not args.headless:
+            print("Error --workers needs --headless.")
+            return
+        if args.scroll_right or args.scroll_left:
+            print("Error --workers can not scroll lines left or right.")
+            return
+        if args.static_glyphs or args.glyph_mutations:
+            print("Error --workers can not be used with --static_glyphs.")
+            return
+
     time.sleep(args.start_timer)
     try:
-        curses.wrapper(matrix_loop, args)
+        if args.headless:
+            headless_loop(args)
+        else:
+            curses.wrapper(matrix_loop, args)
     except KeyboardInterrupt:
         pass
     except PyMatrixError as e:
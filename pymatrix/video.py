@@ -0,0 +1,242 @@
+""" Pixel canvases and raw Y4M or PPM video of the rain. """
+import sys
+
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from pymatrix.common import FrameDelta
+from pymatrix.common import PyMatrixError
+from pymatrix.common import SinkWriter
+from pymatrix.fonts import GlyphAtlas
+
+BASIC_COLORS = [(0, 0, 0), (205, 0, 0), (0, 205, 0), (205, 205, 0),
+                (0, 0, 238), (205, 0, 205), (0, 205, 205), (229, 229, 229),
+                (127, 127, 127), (255, 0, 0), (0, 255, 0), (255, 255, 0),
+                (92, 92, 255), (255, 0, 255), (0, 255, 255), (255, 255, 255)]
+
+
+def color_rgb(color: int) -> Tuple[int, int, int]:
+    """ Returns the red, green and blue of an xterm 256 color number. """
+    if color < 16:
+        return BASIC_COLORS[color]
+    if color < 232:
+        levels = [0, 95, 135, 175, 215, 255]
+        color -= 16
+        return levels[color // 36], levels[color // 6 % 6], levels[color % 6]
+    gray = 8 + (color - 232) * 10
+    return gray, gray, gray
+
+
+def attr_rgb(colors: Tuple[int, int, int]) -> Tuple[Tuple[int, int, int],
+                                                    Tuple[int, int, int]]:
+    """
+    Returns the foreground and background red, green and blue for a
+    foreground, background and flags. Bold basic colors are shown bright.
+    """
+    fg, bg, flags = colors
+    if fg < 0:
+        fg = 7
+    if bg < 0:
+        bg = 0
+    if flags & 1 and fg < 8:
+        fg += 8
+    return color_rgb(fg), color_rgb(bg)
+
+
+def rgb_y(rgb: Tuple[int, int, int]) -> bytes:
+    r, g, b = rgb
+    return bytes([round(16 + (65.481 * r + 128.553 * g + 24.966 * b) / 255)])
+
+
+def rgb_cb(rgb: Tuple[int, int, int]) -> bytes:
+    r, g, b = rgb
+    return bytes([round(128 + (-37.797 * r - 74.203 * g + 112.0 * b) / 255)])
+
+
+def rgb_cr(rgb: Tuple[int, int, int]) -> bytes:
+    r, g, b = rgb
+    return bytes([round(128 + (112.0 * r - 93.786 * g - 18.214 * b) / 255)])
+
+
+class PixelPlane:
+    """
+    One plane of a pixel buffer. Packed RGB and framebuffers use a single
+    plane, planar YUV uses one plane per component. encode turns red,
+    green and blue into the bytes of one pixel.
+    """
+    def __init__(self, buffer, offset: int, stride: int, pixel_size: int,
+                 encode):
+        self.buffer = buffer
+        self.offset = offset
+        self.stride = stride
+        self.pixel_size = pixel_size
+        self.encode = encode
+
+
+class PixelCanvas:
+    """
+    Draws cells into pixel planes by copying rows of pixels, so drawing a
+    cell is one slice assignment per pixel row and plane. Glyphs are
+    colored and encoded once per character and attribute and cached until
+    the colors change. Cells outside of the canvas are skipped.
+    """
+    def __init__(self, atlas: GlyphAtlas, width: int, height: int,
+                 planes: Sequence[PixelPlane]):
+        self.atlas = atlas
+        self.width = width
+        self.height = height
+        self.columns = width // atlas.width
+        self.rows = height // atlas.height
+        self.planes = planes
+        self.cache = {}
+
+    def fill(self, rgb: Tuple[int, int, int]) -> None:
+        for plane in self.planes:
+            row = plane.encode(rgb) * self.width
+            for y in range(self.height):
+                start = plane.offset + y * plane.stride
+                plane.buffer[start:start + len(row)] = row
+
+    def glyph(self, char: str, fg: Tuple[int, int, int],
+              bg: Tuple[int, int, int]) -> List[List[bytes]]:
+        """ Returns the encoded pixel rows of a glyph for every plane. """
+        width = self.atlas.width
+        result = []
+        for plane in self.planes:
+            pixels = (plane.encode(bg), plane.encode(fg))
+            result.append([
+                b"".join(pixels[row >> (width - 1 - i) & 1]
+                         for i in range(width))
+                for row in self.atlas.rows(char)])
+        return result
+
+    def draw(self, cells: dict, colors) -> None:
+        """ Draws the cells. colors returns the fg and bg rgb of an attr. """
+        cache = self.cache
+        cell_width = self.atlas.width
+        cell_height = self.atlas.height
+        for (y, x), (char, attr) in cells.items():
+            if y >= self.rows or x >= self.columns:
+                continue
+            glyph = cache.get((char, attr))
+            if glyph is None:
+                glyph = cache[(char, attr)] = self.glyph(char, *colors(attr))
+            for plane, rows in zip(self.planes, glyph):
+                buffer = plane.buffer
+                stride = plane.stride
+                start = (plane.offset + y * cell_height * stride
+                         + x * cell_width * plane.pixel_size)
+                end = start + len(rows[0])
+                for row in rows:
+                    buffer[start:end] = row
+                    start += stride
+                    end += stride
+
+
+class VideoWriter:
+    """
+    Renders frames to a raw Y4M (4:4:4) or PPM video stream through a
+    glyph atlas. Video frames are written at a fixed frame rate by the
+    frame clock, so the video plays at the speed of the run. The picture is
+    kept between video frames. The cells changed by the frames in between
+    are merged and only those are drawn into it, so a fast run does not
+    draw frames that are never seen. The video frames up to the clock
+    time are written when closed. Without head the stream header is left
+    out and without tail no video frame is written for a run shorter than
+    one, for the parts of a --jobs export.
+    """
+    def __init__(self, path: str, video_format: str, size: Tuple[int, int],
+                 atlas: GlyphAtlas, clock, fps: int, block: bool = False,
+                 head: bool = True, tail: bool = True):
+        width, height = size
+        try:
+            if path == "-":
+                self.file = sys.stdout.buffer
+            else:
+                self.file = open(path, "wb")
+        except OSError as e:
+            raise PyMatrixError(f"Error recording to {path}: {e.strerror}")
+        if video_format == "y4m":
+            self.buffers = [bytearray(width * height) for _ in range(3)]
+            planes = [PixelPlane(buffer, 0, width, 1, encode) for buffer,
+                      encode in zip(self.buffers, [rgb_y, rgb_cb, rgb_cr])]
+            if head:
+                self.file.write(f"YUV4MPEG2 W{width} H{height} F{fps}:1 "
+                                f"Ip A1:1 C444\n".encode())
+            self.frame_header = b"FRAME\n"
+        else:
+            self.buffers = [bytearray(width * height * 3)]
+            planes = [PixelPlane(self.buffers[0], 0, width * 3, 3, bytes)]
+            self.frame_header = f"P6\n{width} {height}\n255\n".encode()
+        self.canvas = PixelCanvas(atlas, width, height, planes)
+        self.clock = clock
+        self.start = clock()
+        self.fps = fps
+        self.frames = 0
+        self.tail = tail
+        self.writer = SinkWriter(self.write, block=block)
+        # Used on the writer thread.
+        self.cache_palette = None
+        self.pending = {}
+        self.pending_clear = False
+        self.pending_palette = None
+
+    def record(self, delta: FrameDelta) -> None:
+        self.writer.put(self.clock() - self.start, delta)
+
+    def colors(self, attr: int):
+        return attr_rgb(self.cache_palette.colors(attr))
+
+    def write(self, seconds: float, delta: FrameDelta) -> None:
+        self.write_frames(seconds)
+        if delta.redraw:
+            self.pending = dict(delta.cells)
+            self.pending_clear = True
+            self.pending_palette = delta.palette
+        else:
+            self.pending.update(delta.cells)
+
+    def seek(self, seconds: float,
+             delta: Optional[FrameDelta] = None) -> None:
+        """
+        Starts at the clock time seconds, without writing the video frames
+        before it, from the screen of delta, a redraw, when given. Used
+        before the first frame is recorded.
+        """
+        while self.frames < (seconds - self.start) * self.fps - 1e-9:
+            self.frames += 1
+        if delta is not None:
+            self.pending = dict(delta.cells)
+            self.pending_clear = True
+            self.pending_palette = delta.palette
+
+    def draw_pending(self) -> None:
+        if self.pending_palette is not self.cache_palette:
+            self.canvas.cache.clear()
+            self.cache_palette = self.pending_palette
+        if self.pending_clear:
+            self.canvas.fill(self.colors(0)[1])
+        self.canvas.draw(self.pending, self.colors)
+        self.pending = {}
+        self.pending_clear = False
+
+    def write_frames(self, seconds: float) -> None:
+        """ Writes the picture for every video frame before seconds. """
+        while self.frames < seconds * self.fps - 1e-9:
+            self.draw_pending()
+            self.file.write(self.frame_header)
+            for buffer in self.buffers:
+                self.file.write(buffer)
+            self.frames += 1
+
+    def close(self) -> None:
+        self.writer.close()
+        seconds = self.clock() - self.start
+        self.write_frames(max(seconds, 1 / self.fps) if self.tail
+                          else seconds)
+        self.file.flush()
+        if self.file is not sys.stdout.buffer:
+            self.file.close()
+        self.writer.check()
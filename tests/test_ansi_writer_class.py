@@ -0,0 +1,42 @@
+from unittest import mock
+
+import pytest
+
+from pymatrix import pymatrix
+
+
+@pytest.fixture
+def palette():
+    with mock.patch.object(pymatrix.Colors, "pair_number",
+                           side_effect=lambda attr: attr & 0xff):
+        yield pymatrix.Palette({1: (2, 0)})
+
+
+def test_write(tmp_path, palette):
+    path = tmp_path / "out.ansi"
+    writer = pymatrix.AnsiWriter(str(path))
+    writer.record(pymatrix.FrameDelta((2, 3), {(0, 0): ("a", 1)}, True,
+                                      palette))
+    writer.record(pymatrix.FrameDelta((2, 3), {}, False, palette))
+    writer.record(pymatrix.FrameDelta((2, 3), {(1, 2): ("b", 1)}, False,
+                                      palette))
+    writer.close()
+    assert writer.written == 48
+    assert path.read_bytes() == (b"\x1b[?25l\x1b[0;32;40m\x1b[2J"
+                                 b"\x1b[1;1H\x1b[0;32;40ma"
+                                 b"\x1b[2;3H\x1b[0;32;40mb"
+                                 b"\x1b[0m\x1b[?25h")
+
+
+def test_part(tmp_path, palette):
+    path = tmp_path / "out.ansi"
+    writer = pymatrix.AnsiWriter(str(path), head=False, tail=False)
+    writer.record(pymatrix.FrameDelta((2, 3), {(1, 2): ("b", 1)}, False,
+                                      palette))
+    writer.close()
+    assert path.read_bytes() == b"\x1b[2;3H\x1b[0;32;40mb"
+
+
+def test_write_error(tmp_path):
+    with pytest.raises(pymatrix.PyMatrixError):
+        pymatrix.AnsiWriter(str(tmp_path / "missing" / "out.ansi"))
@@ -187,6 +187,316 @@ def test_argument_parsing_disable_keys(test_value, expected_result):
     assert result.disable_keys == expected_result
 
 
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], False), (["--pipeline"], True)
+])
+def test_argument_parsing_pipeline(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.pipeline == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], False), (["--static_glyphs"], True)
+])
+def test_argument_parsing_static_glyphs(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.static_glyphs == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], 0), (["--glyph_mutations", "10"], 10)
+])
+def test_argument_parsing_glyph_mutations(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.glyph_mutations == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], 0), (["--max_fps", "30"], 30)
+])
+def test_argument_parsing_max_fps(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.max_fps == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], 0), (["--cpu_budget", "25"], 25), (["--cpu-budget", "5"], 5)
+])
+def test_argument_parsing_cpu_budget(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.cpu_budget == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], False), (["--status"], True)
+])
+def test_argument_parsing_status(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.status == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--record", "run.pmx"], "run.pmx")
+])
+def test_argument_parsing_record(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.record == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--play", "run.pmx"], "run.pmx")
+])
+def test_argument_parsing_play(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.play == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], 1.0), (["--play_speed", "2"], 2.0), (["--play_speed", "0.5"], 0.5)
+])
+def test_argument_parsing_play_speed(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.play_speed == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--asciicast", "run.cast"], "run.cast")
+])
+def test_argument_parsing_asciicast(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.asciicast == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--ansi", "/dev/pts/3"], "/dev/pts/3")
+])
+def test_argument_parsing_ansi(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.ansi == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], 0), (["--frames", "500"], 500)
+])
+def test_argument_parsing_frames(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.frames == expected_result
+
+
+@pytest.mark.parametrize("test_value", ["0", "-5", "a"])
+def test_argument_parsing_frames_invalid(test_value):
+    with pytest.raises(SystemExit):
+        pymatrix.argument_parsing(["--frames", test_value])
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], 0), (["--workers", "4"], 4)
+])
+def test_argument_parsing_workers(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.workers == expected_result
+
+
+@pytest.mark.parametrize("test_value", ["0", "-2", "a"])
+def test_argument_parsing_workers_invalid(test_value):
+    with pytest.raises(SystemExit):
+        pymatrix.argument_parsing(["--workers", test_value])
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--seed", "42"], 42), (["--seed", "-1"], -1)
+])
+def test_argument_parsing_seed(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.seed == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--control", "/run/pymatrix"], "/run/pymatrix")
+])
+def test_argument_parsing_control(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.control == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], 1), (["--jobs", "8"], 8)
+])
+def test_argument_parsing_jobs(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.jobs == expected_result
+
+
+@pytest.mark.parametrize("test_value", ["0", "-1", "a"])
+def test_argument_parsing_jobs_invalid(test_value):
+    with pytest.raises(SystemExit):
+        pymatrix.argument_parsing(["--jobs", test_value])
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], False), (["--headless"], True)
+])
+def test_argument_parsing_headless(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.headless == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], (80, 24)), (["--size", "120x40"], (120, 40))
+])
+def test_argument_parsing_size(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.size == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--video", "run.y4m"], "run.y4m"), (["--video", "-"], "-")
+])
+def test_argument_parsing_video(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.video == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--video_format", "y4m"], "y4m"),
+    (["--video_format", "ppm"], "ppm")
+])
+def test_argument_parsing_video_format(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.video_format == expected_result
+
+
+def test_argument_parsing_video_format_error():
+    with pytest.raises(SystemExit):
+        pymatrix.argument_parsing(["--video_format", "mp4"])
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], (1280, 720)), (["--video_size", "1920x1080"], (1920, 1080))
+])
+def test_argument_parsing_video_size(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.video_size == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], 30), (["--video_fps", "60"], 60)
+])
+def test_argument_parsing_video_fps(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.video_fps == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--font", "font.bdf"], "font.bdf")
+])
+def test_argument_parsing_font(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.font == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--framebuffer", "/dev/fb0"], "/dev/fb0")
+])
+def test_argument_parsing_framebuffer(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.framebuffer == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--fb_size", "640x480"], (640, 480))
+])
+def test_argument_parsing_fb_size(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.fb_size == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--fb_bpp", "16"], 16), (["--fb_bpp", "24"], 24)
+])
+def test_argument_parsing_fb_bpp(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.fb_bpp == expected_result
+
+
+def test_argument_parsing_fb_bpp_invalid():
+    with pytest.raises(SystemExit):
+        pymatrix.argument_parsing(["--fb_bpp", "8"])
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--fb_stride", "2560"], 2560)
+])
+def test_argument_parsing_fb_stride(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.fb_stride == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--shared_memory", "matrix"], "matrix")
+])
+def test_argument_parsing_shared_memory(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.shared_memory == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--serve", "2323"], 2323)
+])
+def test_argument_parsing_serve(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.serve == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], "127.0.0.1"), (["--serve_host", "0.0.0.0"], "0.0.0.0")
+])
+def test_argument_parsing_serve_host(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.serve_host == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--wall", "/dev/tty1"], ["/dev/tty1"]),
+    (["--wall", "/dev/tty1", "/dev/tty2"], ["/dev/tty1", "/dev/tty2"])
+])
+def test_argument_parsing_wall(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.wall == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--wall_columns", "3"], 3)
+])
+def test_argument_parsing_wall_columns(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.wall_columns == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--wall_tile", "80x25"], (80, 25))
+])
+def test_argument_parsing_wall_tile(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.wall_tile == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--loop", "5"], 5.0), (["--loop", "0.5"], 0.5)
+])
+def test_argument_parsing_loop(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.loop == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], None), (["--loop_cache", "/tmp/loops"], "/tmp/loops")
+])
+def test_argument_parsing_loop_cache(test_value, expected_result):
+    result = pymatrix.argument_parsing(test_value)
+    assert result.loop_cache == expected_result
+
+
 @pytest.mark.parametrize("test_value, expected_result", [
     ([], "black",), (["--background", "blue"], "blue")
 ])
@@ -329,6 +639,38 @@ def test_positive_int_error(test_values):
         pymatrix.positive_int(test_values)
 
 
+@pytest.mark.parametrize("test_values, expected_results", [
+    ("1", 1.0), ("0.5", 0.5), ("2.5", 2.5), ("20", 20.0)
+])
+def test_positive_float_normal(test_values, expected_results):
+    result = pymatrix.positive_float(test_values)
+    assert result == expected_results
+
+
+@pytest.mark.parametrize("test_values", [
+    "0", "-3", "-0.4", "a", "", " ", "$", "nan", "inf"
+])
+def test_positive_float_error(test_values):
+    with pytest.raises(pymatrix.argparse.ArgumentTypeError):
+        pymatrix.positive_float(test_values)
+
+
+@pytest.mark.parametrize("test_values, expected_results", [
+    ("80x24", (80, 24)), ("200X60", (200, 60)), ("10x10", (10, 10))
+])
+def test_screen_size_normal(test_values, expected_results):
+    result = pymatrix.screen_size(test_values)
+    assert result == expected_results
+
+
+@pytest.mark.parametrize("test_values", [
+    "80", "80x", "x24", "9x24", "80x9", "-80x24", "axb", "80x24x2", ""
+])
+def test_screen_size_error(test_values):
+    with pytest.raises(pymatrix.argparse.ArgumentTypeError):
+        pymatrix.screen_size(test_values)
+
+
 @pytest.mark.parametrize("test_value, expected_result", [
     ("1", 1), ("30", 30), ("100", 100), ("167", 167), ("200", 200),
     ("250", 250), ("255", 255)
@@ -345,3 +687,18 @@ def test_int_between_1_and_255(test_value, expected_result):
 def test_int_between_1_and_255_error(test_values):
     with pytest.raises(pymatrix.argparse.ArgumentTypeError):
         pymatrix.int_between_1_and_255(test_values)
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ("1", 1), ("23", 23), ("2323", 2323), ("65535", 65535)
+])
+def test_port_number(test_value, expected_result):
+    assert pymatrix.port_number(test_value) == expected_result
+
+
+@pytest.mark.parametrize("test_values", [
+    "0", "65536", "-1", "23.5", "telnet", "",
+])
+def test_port_number_error(test_values):
+    with pytest.raises(pymatrix.argparse.ArgumentTypeError):
+        pymatrix.port_number(test_values)
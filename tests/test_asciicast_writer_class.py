@@ -0,0 +1,98 @@
+import json
+from unittest import mock
+
+import pytest
+
+from pymatrix import pymatrix
+
+PALETTE = {1: (2, 0), 10: (7, 0)}
+COLORS = pymatrix.Palette(PALETTE)
+
+
+@pytest.fixture
+def colors():
+    with mock.patch.object(pymatrix, "color_palette", return_value=PALETTE):
+        with mock.patch.object(pymatrix.Colors, "pair_number",
+                               side_effect=lambda attr: attr & 0xff):
+            yield
+
+
+def delta(cells, redraw=False, size=(24, 80)):
+    return pymatrix.FrameDelta(size, cells, redraw, COLORS)
+
+
+def read_cast(path):
+    with open(path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    return lines[0], lines[1:]
+
+
+def test_header(tmp_path, colors):
+    path = str(tmp_path / "run.cast")
+    pymatrix.AsciicastWriter(path, (24, 80), pymatrix.FrameClock()).close()
+    header, events = read_cast(path)
+    assert header["version"] == 2
+    assert header["width"] == 80
+    assert header["height"] == 24
+    assert events == [[0.0, "o", "\x1b[?25l"],
+                      [0.0, "o", "\x1b[0m\x1b[?25h"]]
+
+
+def test_record(tmp_path, colors):
+    path = str(tmp_path / "run.cast")
+    clock = pymatrix.FrameClock()
+    cast = pymatrix.AsciicastWriter(path, (24, 80), clock)
+    cast.record(delta({(0, 1): ("T", 10)}, True))
+    clock.tick(0.5)
+    cast.record(delta({(0, 1): ("x", 1), (0, 2): ("T", 10)}))
+    clock.tick(0.5)
+    cast.close()
+    header, events = read_cast(path)
+    assert events[1:] == [
+        [0.0, "o", "\x1b[0;32;40m\x1b[2J\x1b[1;2H\x1b[0;37;40mT"],
+        [0.5, "o", "\x1b[1;2H\x1b[0;32;40mx\x1b[0;37;40mT"],
+        [1.0, "o", "\x1b[0m\x1b[?25h"],
+    ]
+
+
+def test_part(tmp_path, colors):
+    path = tmp_path / "run.cast"
+    clock = pymatrix.FrameClock()
+    clock.tick(0.5)
+    cast = pymatrix.AsciicastWriter(str(path), (24, 80), clock, head=False,
+                                    tail=False)
+    cast.record(delta({(0, 1): ("x", 1)}))
+    clock.tick(0.5)
+    cast.close()
+    with open(path, encoding="utf-8") as f:
+        events = [json.loads(line) for line in f]
+    assert events == [[0.0, "o", "\x1b[1;2H\x1b[0;32;40mx"]]
+
+
+def test_redraw(tmp_path, colors):
+    path = str(tmp_path / "run.cast")
+    clock = pymatrix.FrameClock()
+    cast = pymatrix.AsciicastWriter(path, (24, 80), clock)
+    cast.record(delta({(0, 1): ("T", 10)}, True))
+    cast.record(delta({(0, 1): ("T", 10), (3, 3): ("x", 1)}, True))
+    cast.close()
+    header, events = read_cast(path)
+    assert events[2] == [0.0, "o", "\x1b[0;32;40m\x1b[2J\x1b[1;2H"
+                         "\x1b[0;37;40mT\x1b[4;4H\x1b[0;32;40mx"]
+
+
+def test_clear_and_resize(tmp_path, colors):
+    path = str(tmp_path / "run.cast")
+    cast = pymatrix.AsciicastWriter(path, (24, 80), pymatrix.FrameClock())
+    cast.record(delta({}, True))
+    cast.record(delta({}, True, (30, 100)))
+    cast.close()
+    header, events = read_cast(path)
+    assert events[2:4] == [[0.0, "r", "100x30"],
+                           [0.0, "o", "\x1b[0;32;40m\x1b[2J"]]
+
+
+def test_record_error(tmp_path):
+    with pytest.raises(pymatrix.PyMatrixError):
+        pymatrix.AsciicastWriter(str(tmp_path / "missing" / "run.cast"),
+                                 (24, 80), pymatrix.FrameClock())
@@ -0,0 +1,132 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from pymatrix import common
+from pymatrix import network
+from pymatrix import pymatrix
+
+PALETTE = {1: (2, 0), 10: (15, 0)}
+COLORS = pymatrix.Palette(PALETTE)
+
+
+@pytest.fixture(autouse=True)
+def colors():
+    with mock.patch.object(pymatrix, "color_palette", return_value=PALETTE):
+        with mock.patch.object(pymatrix.Colors, "pair_number",
+                               side_effect=lambda attr: attr & 0xff):
+            yield
+
+
+def delta(shown, cells, redraw=False):
+    return pymatrix.FrameDelta((2, 3), cells, redraw, COLORS, shown)
+
+
+def client(server):
+    test_client = network.BroadcastClient(server)
+    test_client.connection_made(mock.Mock())
+    return test_client
+
+
+def written(test_client):
+    data = b"".join(call.args[0]
+                    for call in test_client.transport.write.call_args_list)
+    test_client.transport.write.reset_mock()
+    return data
+
+
+WHOLE = b"\x1b[?25l\x1b[0;32;40m\x1b[2J"
+
+
+def test_new_client_gets_whole_screen():
+    server = pymatrix.BroadcastServer()
+    server.record(delta({(0, 1): ("a", 10)}, {(0, 1): ("a", 10)}, True))
+    test_client = client(server)
+    assert written(test_client) == WHOLE + b"\x1b[1;2H\x1b[0;38;5;15;40ma"
+    server.record(delta({(0, 1): ("a", 10), (1, 0): ("b", 1)},
+                        {(1, 0): ("b", 1)}))
+    assert written(test_client) == b"\x1b[2;1H\x1b[0;32;40mb"
+
+
+def test_client_before_first_frame():
+    server = pymatrix.BroadcastServer()
+    test_client = client(server)
+    assert written(test_client) == b""
+    server.record(delta({(0, 0): ("a", 1)}, {(0, 0): ("a", 1)}, True))
+    assert written(test_client) == WHOLE + b"\x1b[1;1H\x1b[0;32;40ma"
+
+
+def test_frame_encoded_once():
+    server = pymatrix.BroadcastServer()
+    server.record(delta({}, {}, True))
+    clients = [client(server) for _ in range(3)]
+    with mock.patch.object(common, "ansi_cells",
+                           wraps=pymatrix.ansi_cells) as ansi_cells:
+        server.record(delta({(0, 0): ("a", 1)}, {(0, 0): ("a", 1)}))
+    assert ansi_cells.call_count == 1
+    assert len({written(test_client) for test_client in clients}) == 1
+
+
+def test_slow_client_skipped_then_caught_up():
+    server = pymatrix.BroadcastServer()
+    server.record(delta({}, {}, True))
+    test_client = client(server)
+    written(test_client)
+    test_client.pause_writing()
+    server.record(delta({(0, 0): ("a", 1)}, {(0, 0): ("a", 1)}))
+    assert written(test_client) == b""
+    test_client.resume_writing()
+    server.record(delta({(0, 0): ("a", 1), (0, 1): ("b", 1)},
+                        {(0, 1): ("b", 1)}))
+    assert written(test_client) == WHOLE + b"\x1b[1;1H\x1b[0;32;40mab"
+
+
+def test_redraw_sends_whole_screen():
+    server = pymatrix.BroadcastServer()
+    server.record(delta({}, {}, True))
+    test_client = client(server)
+    written(test_client)
+    server.record(delta({(0, 0): ("a", 1)}, {(0, 0): ("a", 1)}, True))
+    assert written(test_client) == WHOLE + b"\x1b[1;1H\x1b[0;32;40ma"
+
+
+def test_disconnect():
+    server = pymatrix.BroadcastServer()
+    test_client = client(server)
+    test_client.connection_lost(None)
+    assert server.clients == set()
+
+
+def test_serve():
+    async def serve():
+        server = pymatrix.BroadcastServer()
+        await server.start("127.0.0.1", 0)
+        server.record(delta({(0, 0): ("a", 1)}, {(0, 0): ("a", 1)}, True))
+        reader, writer = await asyncio.open_connection("127.0.0.1",
+                                                       server.port)
+        first = await reader.readexactly(len(WHOLE) + 17)
+        server.record(delta({(0, 0): ("b", 1)}, {(0, 0): ("b", 1)}))
+        second = await reader.readexactly(17)
+        server.close()
+        rest = await reader.read()
+        writer.close()
+        return first, second, rest
+
+    first, second, rest = asyncio.run(serve())
+    assert first == WHOLE + b"\x1b[1;1H\x1b[0;32;40ma"
+    assert second == b"\x1b[1;1H\x1b[0;32;40mb"
+    assert rest == b"\x1b[0m\x1b[2J\x1b[H\x1b[?25h"
+
+
+def test_port_in_use():
+    async def serve():
+        server = pymatrix.BroadcastServer()
+        await server.start("127.0.0.1", 0)
+        try:
+            await pymatrix.BroadcastServer().start("127.0.0.1", server.port)
+        finally:
+            server.close()
+
+    with pytest.raises(pymatrix.PyMatrixError):
+        asyncio.run(serve())
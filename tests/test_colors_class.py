@@ -0,0 +1,48 @@
+from unittest import mock
+
+import pytest
+
+from pymatrix import pymatrix
+
+
+@pytest.fixture
+def headless():
+    pymatrix.Colors.headless = True
+    yield
+    pymatrix.Colors.headless = False
+
+
+def test_init_pair_headless(headless):
+    with mock.patch.object(pymatrix.curses, "init_pair") as mock_pair:
+        pymatrix.Colors.init_pair(3, 2, 0)
+    mock_pair.assert_not_called()
+    assert pymatrix.Colors.pairs[3] == (2, 0)
+
+
+def test_init_pair_curses():
+    with mock.patch.object(pymatrix.curses, "init_pair") as mock_pair:
+        pymatrix.Colors.init_pair(3, 4, 0)
+    mock_pair.assert_called_once_with(3, 4, 0)
+    assert pymatrix.Colors.pairs[3] == (4, 0)
+
+
+def test_color_pair_headless(headless):
+    assert pymatrix.Colors.color_pair(10) == 10 << 8
+
+
+def test_color_pair_without_curses():
+    with mock.patch.object(pymatrix.curses, "color_pair") as mock_color_pair:
+        assert pymatrix.Colors.color_pair(2) == 2 << 8
+    mock_color_pair.assert_not_called()
+
+
+def test_init_pairs(headless):
+    pymatrix.Colors.init_pairs({1: (2, 0), 10: (7, 0)})
+    assert pymatrix.Colors.pairs[1] == (2, 0)
+    assert pymatrix.Colors.pairs[10] == (7, 0)
+
+
+def test_pair_number():
+    attr = pymatrix.Colors.color_pair(7) + pymatrix.curses.A_BOLD
+    assert pymatrix.Colors.pair_number(attr) == 7
+    assert pymatrix.Colors.pair_number(0) == 0
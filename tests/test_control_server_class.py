@@ -0,0 +1,60 @@
+import asyncio
+import os
+
+import pytest
+
+from pymatrix import pymatrix
+
+
+async def talk(path, data, replies):
+    server = pymatrix.ControlServer(asyncio.Queue())
+    await server.start(path)
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(data)
+    lines = [await reader.readline() for _ in range(replies)]
+    writer.close()
+    server.close()
+    commands = []
+    while not server.commands.empty():
+        commands.append(server.commands.get_nowait())
+    return lines, commands
+
+
+def test_commands(tmp_path):
+    path = str(tmp_path / "control")
+    lines, commands = asyncio.run(talk(path, b"t 5 up\nbad\n\n^R", 3))
+    assert lines == [b"ok\n", b"error unknown command bad\n", b"ok\n"]
+    assert commands == [[116, 53, 259]]
+    assert not os.path.exists(path)
+
+
+def test_split_lines(tmp_path):
+    async def run():
+        path = str(tmp_path / "control")
+        server = pymatrix.ControlServer(asyncio.Queue())
+        await server.start(path)
+        reader, writer = await asyncio.open_unix_connection(path)
+        writer.write(b"^")
+        await writer.drain()
+        await asyncio.sleep(0.05)
+        writer.write(b"R\n")
+        reply = await reader.readline()
+        writer.close()
+        server.close()
+        return reply, server.commands.get_nowait()
+    assert asyncio.run(run()) == (b"ok\n", [18])
+
+
+def test_stale_socket_replaced(tmp_path):
+    path = str(tmp_path / "control")
+    asyncio.run(talk(path, b"", 0))
+    lines, commands = asyncio.run(talk(path, b"a\n", 1))
+    assert commands == [[97]]
+
+
+def test_start_error(tmp_path):
+    async def run():
+        server = pymatrix.ControlServer(asyncio.Queue())
+        await server.start(str(tmp_path / "missing" / "control"))
+    with pytest.raises(pymatrix.PyMatrixError):
+        asyncio.run(run())
@@ -0,0 +1,103 @@
+from unittest import mock
+
+import pytest
+
+from pymatrix import pymatrix
+
+
+def make_governor(budget):
+    with mock.patch.object(pymatrix.time, "monotonic", return_value=100.0):
+        with mock.patch.object(pymatrix.time, "process_time",
+                               return_value=10.0):
+            return pymatrix.CpuGovernor(budget)
+
+
+def update(governor, wall, cpu):
+    with mock.patch.object(pymatrix.time, "monotonic",
+                           return_value=governor.wall_start + wall):
+        with mock.patch.object(pymatrix.time, "process_time",
+                               return_value=governor.cpu_start + cpu):
+            governor.update()
+
+
+def test_init():
+    governor = make_governor(25)
+    assert governor.budget == 25
+    assert governor.speed == 1.0
+    assert governor.usage == 0.0
+
+
+def test_update_inside_window():
+    governor = make_governor(25)
+    update(governor, 0.5, 0.5)
+    assert governor.speed == 1.0
+    assert governor.usage == 0.0
+
+
+def test_update_over_budget():
+    governor = make_governor(25)
+    update(governor, 1.0, 0.5)
+    assert governor.usage == pytest.approx(50)
+    assert governor.speed == pytest.approx(0.5)
+
+
+def test_update_min_speed():
+    governor = make_governor(1)
+    update(governor, 1.0, 1.0)
+    assert governor.speed == pymatrix.CpuGovernor.MIN_SPEED
+
+
+def test_update_headroom_restores_speed():
+    governor = make_governor(25)
+    governor.speed = 0.5
+    update(governor, 1.0, 0.1)
+    assert governor.speed == pytest.approx(0.625)
+
+
+def test_update_max_speed():
+    governor = make_governor(25)
+    update(governor, 1.0, 0.1)
+    assert governor.speed == 1.0
+
+
+def test_update_near_budget_holds_speed():
+    governor = make_governor(25)
+    governor.speed = 0.5
+    update(governor, 1.0, 0.22)
+    assert governor.speed == 0.5
+
+
+def test_delay():
+    governor = make_governor(25)
+    governor.speed = 0.5
+    assert governor.delay(0.01) == pytest.approx(0.02)
+
+
+def test_spawn_full_speed():
+    governor = make_governor(25)
+    with mock.patch.object(governor.random, "random", return_value=0.99):
+        assert governor.spawn() is True
+
+
+@pytest.mark.parametrize("value, expected", [(0.1, True), (0.6, False)])
+def test_spawn_lowered_speed(value, expected):
+    governor = make_governor(25)
+    governor.speed = 0.5
+    with mock.patch.object(governor.random, "random", return_value=value):
+        assert governor.spawn() is expected
+
+
+def test_spawn_own_random_numbers():
+    governor = make_governor(25)
+    governor.speed = 0.5
+    state = pymatrix.random.getstate()
+    for _ in range(10):
+        governor.spawn()
+    assert pymatrix.random.getstate() == state
+
+
+def test_status():
+    governor = make_governor(25)
+    governor.usage = 24.6
+    governor.speed = 0.5
+    assert governor.status() == "cpu 25%/25% speed 50%"
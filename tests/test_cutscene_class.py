@@ -0,0 +1,60 @@
+from unittest import mock
+
+import pytest
+
+from pymatrix import pymatrix
+
+
+@pytest.fixture(autouse=True)
+def headless():
+    pymatrix.Colors.headless = True
+    yield
+    pymatrix.Colors.headless = False
+
+
+def test_init():
+    cutscene = pymatrix.Cutscene([("Hi", 0.5, 2), ("Bye", 0.1, 1)],
+                                 start=3, end=2)
+    assert cutscene.events == [
+        (3, 1, "H"), (3.5, 2, "i"), (6, 2, None), (6, 1, "B"),
+        (6.1, 2, "y"), (pytest.approx(6.2), 3, "e"),
+        (pytest.approx(7.3), 3, None)]
+    assert cutscene.length == pytest.approx(9.3)
+    assert cutscene.next_time() == 3
+
+
+def test_play():
+    frame = mock.Mock()
+    cutscene = pymatrix.Cutscene([("Hi", 0.5, 2)], start=1, end=1)
+    attr = pymatrix.Colors.color_pair(pymatrix.WAKE_UP_PAIR) + (
+        pymatrix.curses.A_BOLD)
+    assert cutscene.play(frame, 0, 80)
+    assert frame.draw.call_args_list == []
+    assert cutscene.play(frame, 1.5, 80)
+    assert frame.draw.call_args_list == [mock.call(1, 1, "H", attr),
+                                         mock.call(1, 2, "i", attr)]
+    assert cutscene.next_time() == 4
+    frame.reset_mock()
+    assert cutscene.play(frame, 4, 80)
+    assert frame.draw.call_args_list == [mock.call(1, 1, " "),
+                                         mock.call(1, 2, " ")]
+    assert cutscene.next_time() == 5
+    assert not cutscene.play(frame, 5, 80)
+
+
+def test_play_narrow_screen():
+    frame = mock.Mock()
+    cutscene = pymatrix.Cutscene([("Follow", 0, 1)])
+    cutscene.play(frame, 0, 4)
+    assert [c.args[2] for c in frame.draw.call_args_list] == ["F", "o"]
+    frame.reset_mock()
+    cutscene.play(frame, 1, 4)
+    assert [c.args[:2] for c in frame.draw.call_args_list] == [(1, 1),
+                                                               (1, 2)]
+
+
+def test_empty():
+    cutscene = pymatrix.Cutscene([], start=1)
+    assert cutscene.next_time() == 1
+    assert cutscene.play(mock.Mock(), 0.5, 80)
+    assert not cutscene.play(mock.Mock(), 1, 80)
@@ -0,0 +1,81 @@
+from unittest import mock
+
+import pytest
+
+from pymatrix import pymatrix
+
+
+@pytest.fixture(autouse=True)
+def headless():
+    pymatrix.Colors.headless = True
+    yield
+    pymatrix.Colors.headless = False
+
+
+def run(*options):
+    args = pymatrix.argument_parsing(["--seed", "5", *options])
+    return pymatrix.ExportRun(args, (20, 30), 5)
+
+
+def recorded(export, frames, start=0):
+    records = []
+    recorder = mock.Mock(spec=["record"])
+    recorder.record.side_effect = lambda delta: records.append(
+        (export.clock.frames, delta.redraw, dict(delta.cells)))
+    frame = export.frame_buffer([recorder])
+    screen = pymatrix.VirtualScreen(20, 30)
+    while export.clock.frames < frames:
+        export.step(frame, screen)
+    return [record for record in records if record[0] >= start]
+
+
+def test_init():
+    export = run()
+    assert export.clock() == 0
+    assert export.redraw
+    assert export.shown == {}
+    assert export.palette is export.engine.palette
+
+
+def test_step_keeps_cells():
+    export = run()
+    export.step()
+    assert export.shown
+    assert export.changes == {}
+    assert not export.redraw
+    assert export.clock.frames == 1
+
+
+def test_step_max_fps_keeps_changes():
+    export = run("-d", "0", "--max_fps", "10")
+    for _ in range(3):
+        export.step()
+    assert export.shown
+    assert export.changes
+
+
+def test_recolor():
+    export = run("-c", "--max_fps", "1")
+    export.engine.cycle_delay = 2
+    export.step()
+    palette = export.palette
+    for _ in range(3):
+        export.step()
+    assert export.palette is export.engine.palette
+    assert export.palette.pairs != palette.pairs
+    assert export.shown_palette is palette
+    assert export.touched and export.redraw
+
+
+@pytest.mark.parametrize("options", [
+    [], ["-c"], ["-d", "0", "--max_fps", "30"], ["--status"],
+])
+def test_run_up_to_part_carries_on(options):
+    whole = run(*options)
+    whole.engine.cycle_delay = 7
+    expected = recorded(whole, 40, 15)
+    part = run(*options)
+    part.engine.cycle_delay = 7
+    while part.clock.frames < 15:
+        part.step()
+    assert recorded(part, 40) == expected
@@ -0,0 +1,205 @@
+from unittest import mock
+
+from pymatrix import pymatrix
+
+
+def test_init():
+    frame = pymatrix.FrameBuffer()
+    assert frame.shown == {}
+    assert frame.changes == {}
+    assert frame.touched is False
+
+
+def test_draw():
+    frame = pymatrix.FrameBuffer()
+    frame.draw(2, 3, "T", 5)
+    assert frame.changes == {(2, 3): ("T", 5)}
+
+
+def test_draw_same_cell_twice():
+    frame = pymatrix.FrameBuffer()
+    frame.draw(2, 3, "T", 5)
+    frame.draw(2, 3, "X", 1)
+    assert frame.changes == {(2, 3): ("X", 1)}
+
+
+def test_draw_already_shown():
+    frame = pymatrix.FrameBuffer()
+    frame.shown[(2, 3)] = ("T", 5)
+    frame.draw(2, 3, "T", 5)
+    assert frame.changes == {}
+
+
+def test_draw_back_to_shown():
+    frame = pymatrix.FrameBuffer()
+    frame.shown[(2, 3)] = ("T", 5)
+    frame.draw(2, 3, " ")
+    frame.draw(2, 3, "T", 5)
+    assert frame.changes == {}
+
+
+def test_flush():
+    screen = mock.Mock()
+    frame = pymatrix.FrameBuffer()
+    frame.draw(2, 3, "T", 5)
+    assert frame.flush(screen) is True
+    screen.addstr.assert_called_once_with(2, 3, "T", 5)
+    screen.refresh.assert_called_once()
+    assert frame.shown == {(2, 3): ("T", 5)}
+    assert frame.changes == {}
+
+
+def test_flush_no_changes():
+    screen = mock.Mock()
+    frame = pymatrix.FrameBuffer()
+    frame.draw(2, 3, "T", 5)
+    frame.flush(screen)
+    frame.draw(2, 3, "T", 5)
+    assert frame.flush(screen) is False
+    assert screen.refresh.call_count == 1
+
+
+def test_flush_touched():
+    screen = mock.Mock()
+    frame = pymatrix.FrameBuffer()
+    frame.touch()
+    assert frame.flush(screen) is True
+    screen.addstr.assert_not_called()
+    screen.refresh.assert_called_once()
+    assert frame.touched is False
+
+
+def test_clear():
+    screen = mock.Mock()
+    frame = pymatrix.FrameBuffer()
+    frame.draw(2, 3, "T", 5)
+    frame.flush(screen)
+    frame.draw(4, 3, "T", 5)
+    frame.clear(screen)
+    assert frame.shown == {}
+    assert frame.changes == {}
+    screen.clear.assert_called_once()
+    assert screen.refresh.call_count == 2
+
+
+def slow_refresh():
+    pymatrix.time.sleep(0.02)
+
+
+def test_flush_slow_write_drops_next_frame():
+    screen = mock.Mock()
+    screen.refresh.side_effect = slow_refresh
+    frame = pymatrix.FrameBuffer()
+    frame.draw(2, 3, "T", 5)
+    assert frame.flush(screen, 0.005) is True
+    frame.draw(3, 3, "T", 5)
+    assert frame.flush(screen, 0.005) is False
+    assert frame.dropped == 1
+    assert frame.changes == {(3, 3): ("T", 5)}
+
+
+def test_flush_merges_dropped_frames():
+    screen = mock.Mock()
+    screen.refresh.side_effect = slow_refresh
+    frame = pymatrix.FrameBuffer()
+    frame.draw(2, 3, "T", 5)
+    frame.flush(screen, 0.005)
+    frame.draw(3, 3, "T", 5)
+    frame.flush(screen, 0.005)
+    frame.draw(3, 3, "X", 5)
+    frame.draw(4, 3, "T", 5)
+    frame.flush(screen, 0.005)
+    pymatrix.time.sleep(0.05)
+    screen.reset_mock()
+    assert frame.flush(screen, 0.005) is True
+    assert screen.addstr.call_args_list == [mock.call(3, 3, "X", 5),
+                                            mock.call(4, 3, "T", 5)]
+    assert frame.dropped == 2
+
+
+def test_flush_fast_write_does_not_drop():
+    screen = mock.Mock()
+    frame = pymatrix.FrameBuffer()
+    frame.draw(2, 3, "T", 5)
+    frame.flush(screen, 0.005)
+    frame.draw(3, 3, "T", 5)
+    assert frame.flush(screen, 0.005) is True
+    assert frame.dropped == 0
+
+
+def test_flush_without_budget_never_drops():
+    screen = mock.Mock()
+    screen.refresh.side_effect = slow_refresh
+    frame = pymatrix.FrameBuffer()
+    frame.draw(2, 3, "T", 5)
+    frame.flush(screen, 0.005)
+    frame.draw(3, 3, "T", 5)
+    assert frame.flush(screen) is True
+    assert frame.dropped == 0
+
+
+def test_flush_hands_delta_to_recorders():
+    screen = mock.Mock()
+    screen.getmaxyx.return_value = (24, 80)
+    recorders = [mock.Mock(), mock.Mock()]
+    frame = pymatrix.FrameBuffer(recorders=recorders)
+    with mock.patch.object(pymatrix, "color_palette", return_value={}):
+        frame.draw(2, 3, "T", 5)
+        frame.flush(screen)
+        frame.draw(4, 3, "X", 5)
+        frame.flush(screen)
+    first, second = [c.args[0] for c in recorders[0].record.call_args_list]
+    assert [c.args[0] for c in recorders[1].record.call_args_list] == [
+        first, second]
+    assert (first.size, first.cells, first.redraw) == (
+        (24, 80), {(2, 3): ("T", 5)}, True)
+    assert (second.cells, second.redraw) == ({(4, 3): ("X", 5)}, False)
+    assert second.palette is first.palette
+    assert second.shown is frame.shown
+
+
+def test_touch_and_clear_redraw_recorders():
+    screen = mock.Mock()
+    screen.getmaxyx.return_value = (24, 80)
+    recorder = mock.Mock()
+    frame = pymatrix.FrameBuffer(recorders=[recorder])
+    with mock.patch.object(pymatrix, "color_palette", return_value={}):
+        frame.draw(2, 3, "T", 5)
+        frame.flush(screen)
+        frame.touch()
+        frame.flush(screen)
+        frame.clear(screen)
+    deltas = [c.args[0] for c in recorder.record.call_args_list]
+    assert [(delta.cells, delta.redraw) for delta in deltas] == [
+        ({(2, 3): ("T", 5)}, True), ({(2, 3): ("T", 5)}, True), ({}, True)]
+    assert deltas[1].palette is deltas[0].palette
+
+
+def test_recolor_new_palette_without_redraw():
+    screen = mock.Mock()
+    screen.getmaxyx.return_value = (24, 80)
+    recorder = mock.Mock()
+    frame = pymatrix.FrameBuffer(recorders=[recorder])
+    with mock.patch.object(pymatrix, "color_palette", return_value={}):
+        frame.draw(2, 3, "T", 5)
+        frame.flush(screen)
+        frame.recolor()
+        assert frame.flush(screen) is False
+        frame.draw(2, 4, "T", 5)
+        frame.flush(screen)
+    deltas = [c.args[0] for c in recorder.record.call_args_list]
+    assert [(delta.cells, delta.redraw) for delta in deltas] == [
+        ({(2, 3): ("T", 5)}, True), ({(2, 4): ("T", 5)}, False)]
+    assert deltas[1].palette is not deltas[0].palette
+
+
+def test_recolor_given_palette():
+    screen = mock.Mock()
+    screen.getmaxyx.return_value = (24, 80)
+    recorder = mock.Mock()
+    frame = pymatrix.FrameBuffer(recorders=[recorder])
+    palette = pymatrix.Palette({1: (2, 0)})
+    frame.recolor(palette)
+    frame.draw(2, 3, "T", 5)
+    frame.flush(screen)
+    assert recorder.record.call_args.args[0].palette is palette
@@ -0,0 +1,30 @@
+import pytest
+
+from pymatrix import pymatrix
+
+
+def test_init():
+    clock = pymatrix.FrameClock()
+    assert clock() == 0.0
+
+
+def test_tick():
+    clock = pymatrix.FrameClock()
+    clock.tick(0.055)
+    clock.tick(0.055)
+    assert clock() == pytest.approx(0.11)
+
+
+def test_frames():
+    clock = pymatrix.FrameClock()
+    clock.tick(0.055)
+    clock.tick(0.055)
+    assert clock.frames == 2
+
+
+def test_advance():
+    clock = pymatrix.FrameClock()
+    clock.tick(0.055)
+    clock.advance(2.0)
+    assert clock() == pytest.approx(2.055)
+    assert clock.frames == 1
@@ -0,0 +1,49 @@
+from unittest import mock
+
+import pytest
+
+from pymatrix import common
+from pymatrix import pymatrix
+
+
+@pytest.fixture
+def palette():
+    with mock.patch.object(pymatrix.Colors, "pair_number",
+                           side_effect=lambda attr: attr & 0xff):
+        yield pymatrix.Palette({1: (2, 0), 10: (15, 0)})
+
+
+def test_ansi(palette):
+    delta = pymatrix.FrameDelta((2, 3), {(0, 1): ("a", 1), (0, 2): ("b", 1)},
+                                False, palette)
+    assert delta.ansi() == "\x1b[1;2H\x1b[0;32;40mab"
+
+
+def test_ansi_redraw(palette):
+    delta = pymatrix.FrameDelta((2, 3), {(1, 0): ("a", 10)}, True, palette)
+    assert delta.ansi() == ("\x1b[0;32;40m\x1b[2J"
+                            "\x1b[2;1H\x1b[0;38;5;15;40ma")
+
+
+def test_ansi_encoded_once(palette):
+    delta = pymatrix.FrameDelta((2, 3), {(0, 0): ("a", 1)}, False, palette)
+    with mock.patch.object(common, "ansi_cells",
+                           wraps=pymatrix.ansi_cells) as ansi_cells:
+        assert delta.ansi() is delta.ansi()
+    assert ansi_cells.call_count == 1
+
+
+def test_merge(palette):
+    first = pymatrix.FrameDelta((2, 3), {(0, 0): ("a", 1), (0, 1): ("b", 1)},
+                                True, palette)
+    later = pymatrix.FrameDelta((2, 3), {(0, 1): ("c", 10)}, False, palette)
+    merged = first.merge(later)
+    assert merged.cells == {(0, 0): ("a", 1), (0, 1): ("c", 10)}
+    assert merged.redraw is True
+    assert first.cells == {(0, 0): ("a", 1), (0, 1): ("b", 1)}
+
+
+def test_merge_redraw(palette):
+    first = pymatrix.FrameDelta((2, 3), {(0, 0): ("a", 1)}, False, palette)
+    later = pymatrix.FrameDelta((3, 4), {}, True, palette)
+    assert first.merge(later) is later
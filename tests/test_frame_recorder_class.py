@@ -0,0 +1,146 @@
+from unittest import mock
+
+import pytest
+
+from pymatrix import common
+from pymatrix import pymatrix
+
+PALETTE = {pair: (pair, 0) for pair in range(1, 11)}
+COLORS = pymatrix.Palette(PALETTE)
+
+
+@pytest.fixture
+def colors():
+    with mock.patch.object(pymatrix, "color_palette", return_value=PALETTE):
+        with mock.patch.object(pymatrix.Colors, "pair_number",
+                               side_effect=lambda attr: attr & 0xff):
+            yield
+
+
+@pytest.fixture
+def clock():
+    return pymatrix.FrameClock()
+
+
+def delta(cells, redraw=False):
+    return pymatrix.FrameDelta((20, 40), cells, redraw, COLORS)
+
+
+def frames(path):
+    recording = pymatrix.Recording(path)
+    result = [(kind, ms, header, list(cells))
+              for kind, ms, header, cells
+              in recording.frames(recording.seek(0))]
+    return recording, result
+
+
+def test_record_attr(colors):
+    assert common.record_attr(3, PALETTE) == (3, 0, 0)
+    assert common.record_attr(0, PALETTE) == (1, 0, 0)
+    assert common.record_attr(
+        10 + pymatrix.curses.A_BOLD + pymatrix.curses.A_ITALIC,
+        PALETTE) == (10, 0, 3)
+
+
+def test_record_and_read(tmp_path, colors, clock):
+    path = str(tmp_path / "run.pmx")
+    recorder = pymatrix.FrameRecorder(path, clock=clock)
+    recorder.record(delta({(1, 2): ("T", 3), (2, 2): (" ", 0)}, True))
+    clock.tick(0.5)
+    recorder.record(delta({(1, 2): ("x", 10), (1, 3): ("T", 3)}))
+    clock.tick(0.5)
+    recorder.close()
+    recording, result = frames(path)
+    assert recording.glyphs == ["T", "x"]
+    assert recording.attrs == [(1, 0, 0), (3, 0, 0), (10, 0, 0)]
+    assert recording.duration == 1000
+    assert result == [
+        (pymatrix.KEYFRAME, 0, (20, 40, 0), [1, 2, 0, 1]),
+        (pymatrix.DELTA, 500, None, [1, 2, 1, 2, 1, 3, 0, 1]),
+    ]
+    recording.close()
+
+
+def test_record_redraw(tmp_path, colors, clock):
+    path = str(tmp_path / "run.pmx")
+    recorder = pymatrix.FrameRecorder(path, clock=clock)
+    recorder.record(delta({(1, 2): ("T", 3)}, True))
+    clock.tick(0.25)
+    recorder.record(delta({}, True))
+    clock.tick(0.25)
+    recorder.record(delta({(1, 2): ("T", 3)}))
+    clock.tick(0.25)
+    recorder.record(delta({(1, 2): ("T", 3)}, True))
+    recorder.close()
+    recording, result = frames(path)
+    assert [(kind, ms) for kind, ms, _, _ in result] == [
+        (pymatrix.KEYFRAME, 0), (pymatrix.KEYFRAME, 250),
+        (pymatrix.DELTA, 500), (pymatrix.KEYFRAME, 750)
+    ]
+    assert result[1][3] == []
+    assert result[3][3] == [1, 2, 0, 1]
+    recording.close()
+
+
+def test_record_keyframe_interval(tmp_path, colors, clock):
+    path = str(tmp_path / "run.pmx")
+    recorder = pymatrix.FrameRecorder(path, interval=1000, clock=clock)
+    recorder.record(delta({}, True))
+    for _ in range(10):
+        recorder.record(delta({(1, 2): ("T", 3)}))
+        clock.tick(0.375)
+    recorder.close()
+    recording, result = frames(path)
+    keyframes = [ms for kind, ms, _, _ in result if kind == pymatrix.KEYFRAME]
+    assert keyframes == [0, 1125, 2250, 3000]
+    assert [recording.time_at(offset) for offset in recording.index] == [
+        0, 1125, 2250, 3000]
+    recording.close()
+
+
+def test_seek(tmp_path, colors, clock):
+    path = str(tmp_path / "run.pmx")
+    recorder = pymatrix.FrameRecorder(path, interval=1000, clock=clock)
+    recorder.record(delta({}, True))
+    for _ in range(10):
+        recorder.record(delta({(1, 2): ("T", 3)}))
+        clock.tick(0.375)
+    clock.tick(5)
+    recorder.record(delta({(1, 2): ("T", 3)}))
+    recorder.close()
+    recording = pymatrix.Recording(path)
+    assert recording.time_at(recording.seek(0)) == 0
+    assert recording.time_at(recording.seek(1100)) == 0
+    assert recording.time_at(recording.seek(1300)) == 1125
+    assert recording.time_at(recording.seek(2500)) == 2250
+    assert recording.time_at(recording.seek(6000)) == 3000
+    assert recording.time_at(recording.seek(9500)) == 8750
+    assert recording.time_at(recording.seek(-5)) == 0
+    recording.close()
+
+
+def test_seek_empty_recording(tmp_path, colors, clock):
+    path = str(tmp_path / "run.pmx")
+    pymatrix.FrameRecorder(path, clock=clock).close()
+    recording = pymatrix.Recording(path)
+    assert recording.seek(500) == recording.end
+    assert list(recording.frames(recording.seek(500))) == []
+    recording.close()
+
+
+def test_record_error(tmp_path):
+    with pytest.raises(pymatrix.PyMatrixError):
+        pymatrix.FrameRecorder(str(tmp_path / "missing" / "run.pmx"))
+
+
+@pytest.mark.parametrize("data", [b"", b"not a recording at all"])
+def test_recording_invalid(tmp_path, data):
+    path = tmp_path / "run.pmx"
+    path.write_bytes(data)
+    with pytest.raises(pymatrix.PyMatrixError):
+        pymatrix.Recording(str(path))
+
+
+def test_recording_missing(tmp_path):
+    with pytest.raises(pymatrix.PyMatrixError):
+        pymatrix.Recording(str(tmp_path / "run.pmx"))
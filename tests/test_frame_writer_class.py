@@ -0,0 +1,97 @@
+import threading
+from unittest import mock
+
+import pytest
+
+from pymatrix import pymatrix
+
+
+def test_submit_and_wait():
+    writer = pymatrix.FrameWriter()
+    calls = []
+    writer.submit(calls.append, 1)
+    writer.submit(calls.append, 2)
+    writer.wait()
+    assert calls == [1, 2]
+    writer.close()
+    assert not writer.thread.is_alive()
+
+
+def test_runs_on_writer_thread():
+    writer = pymatrix.FrameWriter()
+    threads = []
+    writer.submit(lambda: threads.append(threading.get_ident()))
+    writer.wait()
+    writer.close()
+    assert threads[0] != threading.get_ident()
+
+
+def test_error_raised_on_wait():
+    writer = pymatrix.FrameWriter()
+    writer.submit(pymatrix.write_cells, None, {(0, 0): ("T", 0)})
+    with pytest.raises(AttributeError):
+        writer.wait()
+    writer.wait()
+    writer.close()
+
+
+def test_frame_buffer_flush_with_writer():
+    screen = mock.Mock()
+    writer = pymatrix.FrameWriter()
+    frame = pymatrix.FrameBuffer(writer)
+    frame.draw(2, 3, "T", 5)
+    assert frame.flush(screen) is True
+    frame.sync()
+    screen.addstr.assert_called_once_with(2, 3, "T", 5)
+    screen.refresh.assert_called_once()
+    writer.close()
+
+
+def test_frame_buffer_flush_hands_over_changes():
+    screen = mock.Mock()
+    writer = pymatrix.FrameWriter()
+    frame = pymatrix.FrameBuffer(writer)
+    frame.draw(2, 3, "T", 5)
+    changes = frame.changes
+    frame.flush(screen)
+    frame.draw(4, 3, "T", 5)
+    frame.sync()
+    assert changes == {(2, 3): ("T", 5)}
+    writer.close()
+
+
+def test_busy():
+    writer = pymatrix.FrameWriter()
+    started = threading.Event()
+    release = threading.Event()
+
+    def job():
+        started.set()
+        release.wait()
+
+    assert writer.busy() is False
+    writer.submit(job)
+    started.wait()
+    assert writer.busy() is True
+    release.set()
+    writer.wait()
+    assert writer.busy() is False
+    writer.close()
+
+
+def test_frame_buffer_drops_while_writer_busy():
+    screen = mock.Mock()
+    release = threading.Event()
+    screen.refresh.side_effect = lambda: release.wait()
+    writer = pymatrix.FrameWriter()
+    frame = pymatrix.FrameBuffer(writer)
+    frame.draw(2, 3, "T", 5)
+    assert frame.flush(screen, 0.005) is True
+    frame.draw(3, 3, "T", 5)
+    assert frame.flush(screen, 0.005) is False
+    assert frame.dropped == 1
+    release.set()
+    frame.sync()
+    assert frame.flush(screen, 0.005) is True
+    frame.sync()
+    writer.close()
@@ -0,0 +1,112 @@
+from unittest import mock
+
+import pytest
+
+from pymatrix import pymatrix
+
+PALETTE = {1: (0, 0), 10: (15, 0)}
+WHITE = bytes([255, 255, 255, 0])
+BLACK = bytes(4)
+COLORS = pymatrix.Palette(PALETTE)
+
+
+@pytest.fixture
+def colors():
+    with mock.patch.object(pymatrix, "color_palette", return_value=PALETTE):
+        with mock.patch.object(pymatrix.Colors, "pair_number",
+                               side_effect=lambda attr: attr & 0xff):
+            yield
+
+
+def atlas():
+    return pymatrix.GlyphAtlas(2, 2, {"A": (0b10, 0b01)})
+
+
+def delta(cells, redraw=False, palette=COLORS):
+    return pymatrix.FrameDelta((2, 4), cells, redraw, palette)
+
+
+def framebuffer(path, size=24):
+    path.write_bytes(b"\xaa" * size)
+    return str(path)
+
+
+def test_record(tmp_path, colors):
+    path = tmp_path / "fb"
+    # 4x2 pixels, 32 bits per pixel and 24 bytes per row.
+    writer = pymatrix.FramebufferWriter(framebuffer(path, 48), (4, 2), 32,
+                                        24, atlas())
+    writer.record(delta({(0, 1): ("A", 10)}, True))
+    data = writer.map[:]
+    assert data[:16] == BLACK * 2 + WHITE + BLACK
+    assert data[16:24] == b"\xaa" * 8  # past the end of the row
+    assert data[24:40] == BLACK * 3 + WHITE
+
+
+def test_record_only_changes(tmp_path, colors):
+    path = tmp_path / "fb"
+    writer = pymatrix.FramebufferWriter(framebuffer(path, 32), (4, 2), 32,
+                                        16, atlas())
+    writer.record(delta({}, True))
+    writer.map[:] = b"\xaa" * 32
+    writer.record(delta({(0, 0): ("A", 10)}))
+    assert writer.map[:8] == WHITE + BLACK
+    assert writer.map[8:16] == b"\xaa" * 8
+
+
+def test_redraw(tmp_path, colors):
+    path = tmp_path / "fb"
+    writer = pymatrix.FramebufferWriter(framebuffer(path, 32), (4, 2), 32,
+                                        16, atlas())
+    writer.record(delta({}, True))
+    writer.map[:] = b"\xaa" * 32
+    writer.record(delta({(0, 0): ("A", 10)}, True))
+    assert writer.map[:16] == WHITE + BLACK * 3
+
+
+def test_clear(tmp_path, colors):
+    path = tmp_path / "fb"
+    writer = pymatrix.FramebufferWriter(framebuffer(path, 32), (4, 2), 32,
+                                        16, atlas())
+    writer.record(delta({}, True))
+    assert writer.map[:] == bytes(32)
+
+
+def test_new_palette(tmp_path, colors):
+    path = tmp_path / "fb"
+    writer = pymatrix.FramebufferWriter(framebuffer(path, 32), (4, 2), 32,
+                                        16, atlas())
+    writer.record(delta({(0, 0): ("A", 10)}, True))
+    writer.record(delta({(0, 0): ("A", 10)}, True,
+                        pymatrix.Palette({1: (0, 0), 10: (1, 0)})))
+    assert writer.map[:4] == bytes([0, 0, 205, 0])
+
+
+def test_rgb565(tmp_path, colors):
+    path = tmp_path / "fb"
+    writer = pymatrix.FramebufferWriter(framebuffer(path, 16), (4, 2), 16,
+                                        8, atlas())
+    writer.record(delta({(0, 0): ("A", 10)}, True))
+    assert writer.map[:4] == b"\xff\xff\x00\x00"
+
+
+def test_close(tmp_path, colors):
+    path = tmp_path / "fb"
+    writer = pymatrix.FramebufferWriter(framebuffer(path, 32), (4, 2), 32,
+                                        16, atlas())
+    writer.record(delta({(0, 0): ("A", 10)}, True))
+    writer.close()
+    assert path.read_bytes() == bytes(32)
+
+
+def test_file_too_small(tmp_path):
+    path = tmp_path / "fb"
+    with pytest.raises(pymatrix.PyMatrixError):
+        pymatrix.FramebufferWriter(framebuffer(path, 31), (4, 2), 32, 16,
+                                   atlas())
+
+
+def test_missing_file(tmp_path):
+    with pytest.raises(pymatrix.PyMatrixError):
+        pymatrix.FramebufferWriter(str(tmp_path / "fb"), (4, 2), 32, 16,
+                                   atlas())
@@ -0,0 +1,135 @@
+import gzip
+import struct
+
+import pytest
+
+from pymatrix import fonts
+from pymatrix import pymatrix
+
+BDF = """STARTFONT 2.1
+FONT test
+FONTBOUNDINGBOX 4 4 0 -1
+STARTPROPERTIES 1
+FONT_ASCENT 3
+ENDPROPERTIES
+CHARS 3
+STARTCHAR A
+ENCODING 65
+BBX 4 4 0 -1
+BITMAP
+F0
+90
+F0
+90
+ENDCHAR
+STARTCHAR small
+ENCODING 66
+BBX 2 2 1 0
+BITMAP
+C0
+40
+ENDCHAR
+STARTCHAR unused
+ENCODING 8364
+BBX 4 4 0 -1
+BITMAP
+F0
+F0
+F0
+F0
+ENDCHAR
+ENDFONT
+"""
+
+
+def psf1(table=True):
+    glyphs = bytearray(256 * 2)
+    glyphs[65 * 2:65 * 2 + 2] = b"\xf0\x0f"
+    glyphs[1 * 2:1 * 2 + 2] = b"\x81\x18"
+    data = bytes([0x36, 0x04, 0x02 if table else 0x00, 2]) + glyphs
+    if table:
+        entries = []
+        for i in range(256):
+            if i == 1:
+                entries += [0xFF7A, 0xFFFE, 0x41, 0x42]  # ｺ and a sequence
+            elif i != 65:
+                entries.append(i)
+            else:
+                entries.append(0x41)
+            entries.append(0xFFFF)
+        data += struct.pack(f"<{len(entries)}H", *entries)
+    return data
+
+
+def psf2():
+    height, width, count = 2, 10, 2
+    header = struct.pack("<8I", 0x864ab572, 0, 32, 1, count, 4, height,
+                         width)
+    glyphs = b"\xff\xc0\x00\x00" + b"\x80\x40\x40\x00"
+    table = "A".encode() + b"\xff" + "ｱ".encode() + b"\xfeAB\xff"
+    return header + glyphs + table
+
+
+def test_read_bdf():
+    width, height, glyphs = fonts.read_bdf(BDF, {"A", "B"})
+    assert (width, height) == (4, 4)
+    assert glyphs["A"] == (0b1111, 0b1001, 0b1111, 0b1001)
+    assert glyphs["B"] == (0, 0b0110, 0b0010, 0)
+    assert "€" not in glyphs
+
+
+def test_read_bdf_no_bounding_box():
+    with pytest.raises(ValueError):
+        fonts.read_bdf("STARTFONT 2.1\nENDFONT\n", {"A"})
+
+
+def test_read_psf1_table():
+    width, height, glyphs = fonts.read_psf(psf1(), {"A", "ｺ", "B"})
+    assert (width, height) == (8, 2)
+    assert glyphs["A"] == (0xf0, 0x0f)
+    assert glyphs["ｺ"] == (0x81, 0x18)
+    assert glyphs["B"] == (0, 0)  # glyph 66, not the sequence of glyph 1
+
+
+def test_read_psf1_no_table():
+    width, height, glyphs = fonts.read_psf(psf1(table=False),
+                                              {"A", "ｺ"})
+    assert glyphs == {"A": (0xf0, 0x0f)}
+
+
+def test_read_psf2():
+    width, height, glyphs = fonts.read_psf(psf2(), {"A", "ｱ", "B"})
+    assert (width, height) == (10, 2)
+    assert glyphs["A"] == (0b1111111111, 0)
+    assert glyphs["ｱ"] == (0b1000000001, 0b0100000000)
+    assert "B" not in glyphs
+
+
+def test_read_psf_invalid():
+    with pytest.raises(ValueError):
+        fonts.read_psf(b"1234", {"A"})
+
+
+@pytest.mark.parametrize("name, data", [
+    ("font.bdf", BDF.encode()), ("font.psf", psf1()),
+    ("font.psf.gz", gzip.compress(psf1()))
+])
+def test_load(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    atlas = pymatrix.GlyphAtlas.load(str(path))
+    assert atlas.rows("A")[0] == (0b1111 if name.endswith("bdf") else 0xf0)
+    assert atlas.rows("ﾎ") == (0,) * atlas.height
+    assert pymatrix.GlyphAtlas.load(str(path)) is atlas
+
+
+def test_load_invalid(tmp_path):
+    path = tmp_path / "font.bdf"
+    path.write_bytes(b"not a font")
+    with pytest.raises(pymatrix.PyMatrixError):
+        pymatrix.GlyphAtlas.load(str(path))
+
+
+def test_load_missing(tmp_path):
+    with pytest.raises(pymatrix.PyMatrixError):
+        pymatrix.GlyphAtlas.load(str(tmp_path / "font.bdf"))
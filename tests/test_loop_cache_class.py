@@ -0,0 +1,40 @@
+import struct
+
+import pytest
+
+from pymatrix import pymatrix
+
+
+def write_loop(path, blobs):
+    offsets = [pymatrix.LOOP_HEADER.size + 8 * (len(blobs) + 1)]
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+    path.write_bytes(
+        pymatrix.LOOP_HEADER.pack(b"PYML", 1, 24, 80, len(blobs) - 1, 0.04)
+        + struct.pack(f"<{len(offsets)}Q", *offsets) + b"".join(blobs))
+
+
+def test_blob(tmp_path):
+    path = tmp_path / "loop.pyml"
+    write_loop(path, [b"\x1b[2Jab", b"c", b"", b"de"])
+    cache = pymatrix.LoopCache(str(path))
+    assert (cache.rows, cache.columns, cache.frames) == (24, 80, 3)
+    assert cache.delay == 0.04
+    assert bytes(cache.blob(0)) == b"\x1b[2Jab"
+    assert bytes(cache.blob(1)) == b"c"
+    assert bytes(cache.blob(2)) == b""
+    assert bytes(cache.blob(3)) == b"de"
+    cache.close()
+
+
+@pytest.mark.parametrize("data", [b"PYMX" + bytes(40), b"PYML", b"x"])
+def test_not_a_loop(tmp_path, data):
+    path = tmp_path / "loop.pyml"
+    path.write_bytes(data)
+    with pytest.raises(pymatrix.PyMatrixError):
+        pymatrix.LoopCache(str(path))
+
+
+def test_missing(tmp_path):
+    with pytest.raises(pymatrix.PyMatrixError):
+        pymatrix.LoopCache(str(tmp_path / "loop.pyml"))
@@ -0,0 +1,47 @@
+from unittest import mock
+
+import pytest
+
+from pymatrix import pymatrix
+
+PALETTE = {1: (2, 0), 10: (15, 0)}
+GREEN = "\x1b[0;32;40m"
+WHITE = "\x1b[0;38;5;15;40m"
+COLORS = pymatrix.Palette(PALETTE)
+
+
+@pytest.fixture
+def recorder():
+    with mock.patch.object(pymatrix, "color_palette", return_value=PALETTE):
+        with mock.patch.object(pymatrix.Colors, "pair_number",
+                               side_effect=lambda attr: attr & 0xff):
+            clock = pymatrix.FrameClock()
+            yield pymatrix.LoopRecorder(clock, 0.25)
+
+
+def delta(cells, redraw=False):
+    return pymatrix.FrameDelta((2, 3), cells, redraw, COLORS)
+
+
+def test_record(recorder):
+    recorder.record(delta({(0, 0): ("a", 10)}))
+    recorder.clock.tick(0.25)
+    recorder.clock.tick(0.25)
+    recorder.record(delta({(1, 0): ("b", 1)}))
+    assert recorder.frames == {0: [False, {(0, 0): ("a", WHITE)}],
+                               2: [False, {(1, 0): ("b", GREEN)}]}
+
+
+def test_redraw_records_every_cell(recorder):
+    recorder.record(delta({(0, 0): ("a", 10)}))
+    recorder.clock.tick(0.25)
+    recorder.record(delta({(0, 0): ("a", 10), (1, 0): ("b", 1)}, True))
+    assert recorder.frames[1] == [True, {(0, 0): ("a", WHITE),
+                                         (1, 0): ("b", GREEN)}]
+
+
+def test_clear(recorder):
+    recorder.record(delta({(0, 0): ("a", 10)}))
+    recorder.record(delta({}, True))
+    recorder.record(delta({(1, 0): ("b", 1)}))
+    assert recorder.frames == {0: [True, {(1, 0): ("b", GREEN)}]}
@@ -0,0 +1,300 @@
+import itertools
+
+import pytest
+
+from pymatrix import pymatrix
+
+
+def test_init():
+    engine = pymatrix.MatrixEngine((20, 30))
+    assert engine.height == 20
+    assert engine.width == 30
+    assert engine.x_list == list(range(30))
+    assert engine.y_list == list(range(1, 20))
+    assert engine.char_set == pymatrix.CHAR_LIST
+    assert engine.lines == []
+
+
+@pytest.mark.parametrize("size", [(9, 30), (20, 9)])
+def test_screen_too_small(size):
+    with pytest.raises(pymatrix.PyMatrixError):
+        pymatrix.MatrixEngine(size)
+
+
+def test_step_cells():
+    settings = pymatrix.MatrixSettings(test_mode=True)
+    engine = pymatrix.MatrixEngine((20, 30), settings, seed=1)
+    cells = {}
+    for _ in range(50):
+        cells.update(engine.step())
+    assert all(0 <= y < 20 and 0 <= x < 30 for y, x in cells)
+    assert {char for char, _ in cells.values()} == {"T", " "}
+    assert pymatrix.Colors.color_pair(10) in {attr for _, attr in
+                                              cells.values()}
+
+
+def test_same_seed_same_frames():
+    first = pymatrix.MatrixEngine((20, 30), seed=5)
+    second = pymatrix.MatrixEngine((20, 30), seed=5)
+    other = pymatrix.MatrixEngine((20, 30), seed=6)
+    frames = []
+    for engine in [first, other, second]:
+        frames.append(list(itertools.islice(engine.deltas(), 40)))
+    assert frames[0] == frames[2]
+    assert frames[0] != frames[1]
+
+
+def test_columns():
+    engine = pymatrix.MatrixEngine((20, 40), columns=(10, 20), seed=1)
+    assert engine.x_list == list(range(10, 20))
+    cells = {}
+    for _ in range(100):
+        cells.update(engine.step())
+    assert cells
+    assert all(10 <= x < 20 for _, x in cells)
+
+
+def test_free_columns_set():
+    settings = pymatrix.MatrixSettings(double_space=True)
+    engine = pymatrix.MatrixEngine((20, 30), settings, seed=3)
+    for _ in range(100):
+        engine.step()
+        assert engine.x_free == set(engine.x_list)
+    settings.double_space = False
+    engine.reset_columns()
+    assert engine.x_free == set(engine.x_list)
+
+
+def test_columns_double_space():
+    settings = pymatrix.MatrixSettings(double_space=True)
+    engine = pymatrix.MatrixEngine((20, 40), settings, columns=(5, 11))
+    assert engine.x_list == [6, 8, 10]
+
+
+def test_columns_share_of_new_lines():
+    engine = pymatrix.MatrixEngine((20, 40), columns=(10, 20), seed=1)
+    lines = []
+    for _ in range(4):
+        engine.step()
+        lines.append(len(engine.lines))
+    assert lines == [0, 1, 1, 2]
+
+
+def test_old_scrolling_uses_own_characters():
+    settings = pymatrix.MatrixSettings(direction="old scrolling",
+                                       zero_one=True)
+    engine = pymatrix.MatrixEngine((20, 30), settings, seed=2)
+    other = pymatrix.MatrixEngine((20, 30), pymatrix.MatrixSettings(
+        direction="old scrolling", test_mode=True), seed=2)
+    chars = set()
+    for _ in range(30):
+        chars.update(char for char, _ in engine.step().values())
+        other.step()
+    assert chars == {"0", "1", " "}
+    assert all(line.char_list == ["T"] for line in other.lines)
+
+
+@pytest.mark.parametrize("direction", ["up", "right", "left"])
+def test_directions(direction):
+    settings = pymatrix.MatrixSettings(direction=direction)
+    engine = pymatrix.MatrixEngine((20, 30), settings, seed=3)
+    for _ in range(5):
+        engine.step()
+    assert engine.lines
+    assert all(line.direction == direction for line in engine.lines)
+
+
+def test_double_space():
+    settings = pymatrix.MatrixSettings(double_space=True)
+    engine = pymatrix.MatrixEngine((20, 30), settings, seed=3)
+    cells = {}
+    for _ in range(20):
+        cells.update(engine.step())
+    assert all(x % 2 == 0 for _, x in cells)
+
+
+def test_own_colors():
+    pairs = dict(pymatrix.Colors.pairs)
+    red = pymatrix.MatrixEngine((20, 30), pymatrix.MatrixSettings(
+        color="red", test_mode=True), seed=1)
+    blue = pymatrix.MatrixEngine((20, 30), pymatrix.MatrixSettings(
+        color="blue", test_mode=True), seed=1)
+    colors = []
+    for engine in [red, blue]:
+        cells = {}
+        for _ in range(20):
+            cells.update(engine.step())
+        colors.append({engine.palette.colors(attr)[0]
+                       for char, attr in cells.values() if char != " "})
+    assert colors == [{pymatrix.curses.COLOR_RED, pymatrix.curses.COLOR_WHITE},
+                      {pymatrix.curses.COLOR_BLUE,
+                       pymatrix.curses.COLOR_WHITE}]
+    assert pymatrix.Colors.pairs == pairs
+
+
+def test_update_colors():
+    settings = pymatrix.MatrixSettings()
+    engine = pymatrix.MatrixEngine((20, 30), settings)
+    palette = engine.palette
+    assert engine.update_colors() is False
+    settings.color_mode = "random"
+    assert engine.update_colors() is True
+    assert engine.palette is not palette
+    assert engine.pairs == pymatrix.settings_pairs(settings)
+
+
+def test_cycle_recolor():
+    settings = pymatrix.MatrixSettings(color_mode="cycle")
+    engine = pymatrix.MatrixEngine((20, 30), settings)
+    engine.cycle_delay = 2
+    colors = []
+    for _ in range(7):
+        engine.step()
+        if engine.recolor:
+            engine.recolor = False
+            colors.append(settings.color)
+            assert engine.pairs[1][0] == pymatrix.CURSES_COLOR[settings.color]
+    assert colors == ["red", "green", "blue"]
+
+
+def test_spawning_off():
+    engine = pymatrix.MatrixEngine((20, 30), seed=3)
+    engine.step()
+    engine.spawning = False
+    lines = len(engine.lines)
+    for _ in range(100):
+        engine.step()
+    assert lines == 2
+    assert engine.lines == []
+
+
+def test_clear():
+    engine = pymatrix.MatrixEngine((20, 30), seed=3)
+    engine.step()
+    engine.clear()
+    assert engine.lines == []
+    assert engine.x_list == list(range(30))
+
+
+def run_until_empty(engine, screen):
+    engine.spawning = False
+    for _ in range(200):
+        screen.update(engine.step())
+    assert engine.lines == []
+    assert {char for char, _ in screen.values()} <= {" "}
+
+
+@pytest.mark.parametrize("before, after", [
+    ("down", "up"), ("up", "down"), ("down", "right"), ("left", "up"),
+    ("down", "old scrolling"), ("old scrolling", "left"),
+])
+def test_change_direction(before, after):
+    settings = pymatrix.MatrixSettings(direction=before)
+    engine = pymatrix.MatrixEngine((20, 30), settings, seed=4)
+    screen = {}
+    for _ in range(10):
+        screen.update(engine.step())
+    running = list(engine.lines)
+    settings.direction = after
+    for _ in range(5):
+        screen.update(engine.step())
+    assert all(line in engine.lines for line in running)
+    assert any(line.direction == after for line in engine.lines)
+    assert set(engine.x_list) <= set(range(30))
+    run_until_empty(engine, screen)
+    if after not in ["right", "left"]:
+        assert sorted(engine.x_list) == list(range(30))
+
+
+def test_double_space_keeps_lines():
+    settings = pymatrix.MatrixSettings()
+    engine = pymatrix.MatrixEngine((20, 30), settings, seed=4)
+    screen = {}
+    for _ in range(10):
+        screen.update(engine.step())
+    running = list(engine.lines)
+    settings.double_space = True
+    engine.reset_columns()
+    for _ in range(60):
+        screen.update(engine.step())
+        assert all(x % 2 == 0 for x in engine.x_list)
+    assert all(line.x % 2 == 0 for line in engine.lines
+               if line not in running)
+    run_until_empty(engine, screen)
+
+
+def test_async_speed_same_at_any_frame_rate():
+    engines = []
+    for _ in range(3):
+        settings = pymatrix.MatrixSettings(async_scroll=True)
+        engine = pymatrix.MatrixEngine((40, 30), settings, seed=6)
+        engine.step()
+        engine.spawning = False
+        engines.append(engine)
+    delay = pymatrix.DELAY_SPEED[4]
+    for _ in range(8):
+        engines[0].step(delay)
+        engines[1].step(delay / 2)
+        engines[1].step(delay / 2)
+    engines[2].step(8 * delay)  # one late frame
+    leads = [[line.lead_y for line in engine.lines] for engine in engines]
+    assert leads[0] == leads[1] == leads[2]
+    assert leads[0] != [0] * len(leads[0])
+
+
+def test_async_speeds_differ():
+    settings = pymatrix.MatrixSettings(async_scroll=True)
+    engine = pymatrix.MatrixEngine((40, 30), settings, seed=6)
+    engine.step()
+    engine.spawning = False
+    for _ in range(10):
+        engine.step()
+    assert len({line.lead_y for line in engine.lines}) > 1
+    assert all(line.lead_y <= 11 for line in engine.lines)
+
+
+@pytest.mark.parametrize("direction", ["down", "left", "old scrolling"])
+def test_static_glyphs(direction):
+    settings = pymatrix.MatrixSettings(direction=direction,
+                                       static_glyphs=True)
+    engine = pymatrix.MatrixEngine((20, 30), settings, seed=7)
+    for _ in range(100):
+        for (y, x), (char, _) in engine.step().items():
+            assert char in [" ", engine.glyphs[y][x]]
+    assert len({char for row in engine.glyphs for char in row}) > 1
+
+
+def test_static_glyphs_made_again():
+    settings = pymatrix.MatrixSettings(static_glyphs=True)
+    engine = pymatrix.MatrixEngine((20, 30), settings, seed=7)
+    engine.step()
+    assert len(engine.glyphs) == 20 and len(engine.glyphs[0]) == 30
+    engine.resize((25, 40))
+    assert engine.glyphs is None
+    engine.step()
+    assert len(engine.glyphs) == 25 and len(engine.glyphs[0]) == 40
+    settings.zero_one = True
+    engine.update_characters()
+    engine.step()
+    assert {char for row in engine.glyphs for char in row} == {"0", "1"}
+
+
+def test_glyph_mutations():
+    settings = pymatrix.MatrixSettings(static_glyphs=True, do_not_clear=True,
+                                       glyph_mutations=5)
+    engine = pymatrix.MatrixEngine((20, 30), settings, seed=8)
+    screen = {}
+    for _ in range(30):
+        screen.update(engine.step())
+    engine.spawning = False
+    glyphs = [list(row) for row in engine.glyphs]
+    cells = engine.step()
+    changed = [(y, x) for y in range(20) for x in range(30)
+               if engine.glyphs[y][x] != glyphs[y][x]]
+    assert 0 < len(changed) <= 5
+    for y, x in changed:
+        if (y, x) in screen:
+            assert cells[y, x] == (engine.glyphs[y][x], screen[y, x][1])
+    screen.update(cells)
+    assert all(char == engine.glyphs[y][x]
+               for (y, x), (char, _) in screen.items())
@@ -0,0 +1,72 @@
+import pytest
+
+from pymatrix import pymatrix
+
+
+def test_init():
+    settings = pymatrix.MatrixSettings()
+    assert settings.direction == "down"
+    assert settings.color_mode == "normal"
+    assert settings.color == "green"
+    assert settings.lead_color == "white"
+    assert settings.background == "black"
+    assert settings.delay == 4
+    assert not settings.bold_on
+    assert not settings.double_space
+
+
+@pytest.mark.parametrize("test_args, expected", [
+    ([], ("down", "normal")),
+    (["-v"], ("up", "normal")),
+    (["--scroll_right", "-c"], ("right", "cycle")),
+    (["--scroll_left", "-M"], ("left", "random")),
+    (["-o", "-m"], ("old scrolling", "multiple")),
+])
+def test_from_args(test_args, expected):
+    args = pymatrix.argument_parsing(test_args)
+    settings = pymatrix.MatrixSettings.from_args(args)
+    assert (settings.direction, settings.color_mode) == expected
+
+
+def test_from_args_options():
+    args = pymatrix.argument_parsing(["-b", "-j", "-a", "-W", "-l", "-d", "7",
+                                      "-C", "red", "-L", "blue", "-z"])
+    settings = pymatrix.MatrixSettings.from_args(args)
+    assert settings.bold_on and not settings.bold_all
+    assert settings.italic
+    assert settings.async_scroll
+    assert settings.do_not_clear
+    assert settings.double_space
+    assert settings.delay == 7
+    assert settings.color == "red"
+    assert settings.lead_color == "blue"
+    assert settings.zero_one
+
+
+@pytest.mark.parametrize("test_args, expected", [
+    ([], (False, 0)),
+    (["--static_glyphs"], (True, 0)),
+    (["--glyph_mutations", "3"], (True, 3)),
+])
+def test_from_args_static_glyphs(test_args, expected):
+    args = pymatrix.argument_parsing(test_args)
+    settings = pymatrix.MatrixSettings.from_args(args)
+    assert (settings.static_glyphs, settings.glyph_mutations) == expected
+
+
+def test_from_args_colors():
+    args = pymatrix.argument_parsing(["-O", "--color_number", "50",
+                                      "--wakeup"])
+    settings = pymatrix.MatrixSettings.from_args(args)
+    assert settings.over_ride
+    assert settings.color_number == 50
+    assert settings.wakeup
+
+
+def test_reset():
+    settings = pymatrix.MatrixSettings(color="red", delay=7, test_mode=True,
+                                       over_ride=True, wakeup=True)
+    settings.reset()
+    assert settings.color == "green"
+    assert settings.delay == 4
+    assert settings.test_mode and settings.over_ride and settings.wakeup
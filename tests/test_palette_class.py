@@ -0,0 +1,32 @@
+from unittest import mock
+
+import pytest
+
+from pymatrix import common
+from pymatrix import pymatrix
+
+
+@pytest.fixture
+def palette():
+    with mock.patch.object(pymatrix.Colors, "pair_number",
+                           side_effect=lambda attr: attr & 0xff):
+        yield pymatrix.Palette({1: (2, 0), 10: (15, -1)})
+
+
+def test_colors(palette):
+    assert palette.colors(10 + pymatrix.curses.A_BOLD) == (15, -1, 1)
+    assert palette.colors(0) == (2, 0, 0)
+
+
+def test_escape(palette):
+    assert palette.escape(1) == "\x1b[0;32;40m"
+    assert palette.escape(10) == "\x1b[0;38;5;15;49m"
+
+
+def test_worked_out_once(palette):
+    with mock.patch.object(common, "record_attr",
+                           wraps=common.record_attr) as record_attr:
+        palette.escape(10)
+        palette.escape(10)
+        palette.colors(10)
+    assert record_attr.call_count == 1
@@ -0,0 +1,65 @@
+from pymatrix import pymatrix
+from pymatrix import video
+
+RED = (255, 0, 0)
+BLACK = (0, 0, 0)
+
+
+def make_canvas(width=8, height=4):
+    atlas = pymatrix.GlyphAtlas(2, 2, {"A": (0b10, 0b01)})
+    buffer = bytearray(width * height)
+    plane = video.PixelPlane(buffer, 0, width, 1,
+                                lambda rgb: bytes([rgb[0] // 255]))
+    return video.PixelCanvas(atlas, width, height, [plane]), buffer
+
+
+def colors(attr):
+    return RED, BLACK
+
+
+def test_init():
+    canvas, buffer = make_canvas(9, 5)
+    assert (canvas.columns, canvas.rows) == (4, 2)
+
+
+def test_fill():
+    canvas, buffer = make_canvas()
+    canvas.fill(RED)
+    assert buffer == bytearray([1] * 32)
+
+
+def test_draw():
+    canvas, buffer = make_canvas()
+    canvas.draw({(1, 2): ("A", 3)}, colors)
+    assert buffer == bytearray([0] * 8 * 2
+                               + [0, 0, 0, 0, 1, 0, 0, 0]
+                               + [0, 0, 0, 0, 0, 1, 0, 0])
+
+
+def test_draw_missing_glyph_is_blank():
+    canvas, buffer = make_canvas()
+    canvas.fill(RED)
+    canvas.draw({(0, 0): ("ﾎ", 3)}, lambda attr: (BLACK, BLACK))
+    assert buffer[0:2] == bytearray([0, 0])
+    assert buffer[8:10] == bytearray([0, 0])
+
+
+def test_draw_outside_is_skipped():
+    canvas, buffer = make_canvas()
+    canvas.draw({(2, 0): ("A", 3), (0, 4): ("A", 3)}, colors)
+    assert buffer == bytearray(32)
+
+
+def test_draw_caches_glyphs():
+    canvas, buffer = make_canvas()
+    canvas.draw({(0, 0): ("A", 3), (0, 1): ("A", 3)}, colors)
+    assert list(canvas.cache) == [("A", 3)]
+
+
+def test_draw_rgb_plane():
+    atlas = pymatrix.GlyphAtlas(2, 1, {"A": (0b10,)})
+    buffer = bytearray(2 * 3)
+    plane = video.PixelPlane(buffer, 0, 6, 3, bytes)
+    canvas = video.PixelCanvas(atlas, 2, 1, [plane])
+    canvas.draw({(0, 0): ("A", 1)}, colors)
+    assert buffer == bytearray([255, 0, 0, 0, 0, 0])
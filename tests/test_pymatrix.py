@@ -1,14 +1,27 @@
+import asyncio
+import fcntl
+import json
+import os
+import re
+import select
+import socket
+import struct
+import termios
+import threading
+import time
 from unittest import mock
 import pytest
 from hecate import Runner
 from time import sleep
 
+from pymatrix import common
 from pymatrix import pymatrix
+from pymatrix import video
 
 
 def pymatrix_run(*args):
     options = [a for a in args]
-    return ["python3", "pymatrix/pymatrix.py"] + options
+    return ["python3", "-m", "pymatrix.pymatrix"] + options
 
 
 def test_pymatrix_screen_test_mode():
@@ -158,7 +171,7 @@ def test_pymatrix_version():
 
 
 def test_pymatrix_help():
-    with Runner(*pymatrix_run("--help"), width=80, height=80) as h:
+    with Runner(*pymatrix_run("--help"), width=80, height=200) as h:
         h.await_text("usage:")
 
 
@@ -361,6 +374,23 @@ def test_pymatrix_curses_lead_color_blue_background_override():
     assert pymatrix.curses.pair_content(10) == (21, 255)
 
 
+@pytest.mark.parametrize("settings, expected", [
+    (pymatrix.MatrixSettings(), {1: (2, 0), 7: (2, 0), 10: (7, 0)}),
+    (pymatrix.MatrixSettings(color="red", lead_color="blue",
+                             background="cyan"),
+     {1: (1, 6), 7: (1, 6), 10: (4, 6)}),
+    (pymatrix.MatrixSettings(over_ride=True), {1: (40, 16), 10: (255, 16)}),
+    (pymatrix.MatrixSettings(color_number=50), {1: (50, 0), 7: (50, 0)}),
+    (pymatrix.MatrixSettings(color_mode="multiple", color_number=50),
+     {1: (1, 0), 2: (2, 0), 7: (7, 0), 8: (0, 0)}),
+])
+def test_settings_pairs(settings, expected):
+    pairs = pymatrix.settings_pairs(settings)
+    assert pairs[pymatrix.WAKE_UP_PAIR] in [(2, 0), (40, 16)]
+    for pair, colors in expected.items():
+        assert pairs[pair] == colors
+
+
 def test_pymatrix_display_commands(capsys):
     pymatrix.display_commands()
     captured_output = capsys.readouterr().out
@@ -471,16 +501,15 @@ def test_pymatrix_wakeup_now_keys_katakana_only():
         h.await_text("0")
 
 
-def test_pymatrix_wakeup_do_not_quit_on_q():
-    # this is a long test
+def test_pymatrix_wakeup_quit_on_q():
     with Runner(*pymatrix_run("--test_mode", "--wakeup")) as h:
         h.await_text("T")
         h.default_timeout = 10
         h.await_text("Wake up, Neo...")
         h.write("q")
         h.press("Enter")
-        h.await_text("Knock, knock, Neo.")
-        h.await_text("T")
+        h.default_timeout = 1
+        h.await_exit()
 
 
 def test_pymatrix_wakeup_ignore_multiple_key_presses():
@@ -489,9 +518,9 @@ def test_pymatrix_wakeup_ignore_multiple_key_presses():
         h.await_text("T")
         h.default_timeout = 10
         h.await_text("Wake up, Neo...")
-        h.write("q")
+        h.write("v")
         h.await_text("The Matrix has you...")
-        h.write("q")
+        h.write("v")
         h.await_text("Knock, knock, Neo.")
         h.await_text("T")
 
@@ -502,15 +531,15 @@ def test_pymatrix_wakeup_ignore_alot_of_key_presses():
         h.await_text("T")
         h.default_timeout = 10
         h.await_text("Wake up, Neo...")
-        h.write("q")
+        h.write("d")
         h.await_text("The Matrix has you...")
-        h.write("q")
+        h.write("w")
         h.await_text("Follow the white rabbit.")
-        h.write("q")
-        h.write("q")
-        h.write("q")
-        h.write("q")
-        h.write("q")
+        h.write("a")
+        h.write("b")
+        h.write("c")
+        h.write("d")
+        h.write("e")
         h.await_text("Knock, knock, Neo.")
         h.await_text("T")
 
@@ -525,12 +554,12 @@ def test_pymatrix_wakeup_now_ignore_keys_multiple_key_presses():
         h.write("k")
         h.write("e")
         h.await_text("Wake up, Neo...")
-        h.write("q")
+        h.write("s")
         h.await_text("The Matrix has you...")
-        h.write("q")
+        h.write("s")
         h.await_text("Follow the white rabbit.")
-        h.write("q")
-        h.write("q")
+        h.write("l")
+        h.write("l")
         h.await_text("Knock, knock, Neo.")
         h.await_text("T")
 
@@ -698,6 +727,101 @@ def test_pymatrix_freeze_scroll_right():
         assert h.screenshot() == sc
 
 
+def test_pymatrix_pipeline():
+    with Runner(*pymatrix_run("--test_mode", "--pipeline", "-d1")) as h:
+        h.await_text("T")
+        h.write("f")
+        h.write("q")
+        h.press("Enter")
+        h.await_exit()
+
+
+def test_pymatrix_record_and_play(tmp_path):
+    path = str(tmp_path / "run.pmx")
+    with Runner(*pymatrix_run("--test_mode", "-d1", "--record", path)) as h:
+        h.await_text("T")
+        sleep(1)
+        h.write("q")
+        h.press("Enter")
+        h.await_exit()
+    with Runner(*pymatrix_run("--play", path, "--play_speed", "2")) as h:
+        h.await_text("T")
+        h.write("f")
+        h.write("f")
+        h.press("Right")
+        h.await_exit()
+
+
+def test_pymatrix_play_quit(tmp_path):
+    path = str(tmp_path / "run.pmx")
+    with Runner(*pymatrix_run("--test_mode", "-R2", "--record", path)) as h:
+        h.default_timeout = 3
+        h.await_exit()
+    with Runner(*pymatrix_run("--play", path)) as h:
+        h.await_text("T")
+        h.write("q")
+        h.press("Enter")
+        h.await_exit()
+
+
+def test_pymatrix_play_invalid_file(tmp_path):
+    path = str(tmp_path / "run.pmx")
+    with Runner(*pymatrix_run("--play", path)) as h:
+        h.await_text("Error reading")
+        h.await_exit()
+
+
+def test_pymatrix_loop(tmp_path):
+    cache = str(tmp_path)
+    built = set()
+    for _ in range(2):
+        with Runner(*pymatrix_run("--test_mode", "--loop", "0.05",
+                                  "--loop_cache", cache)) as h:
+            h.default_timeout = 3
+            h.await_text("T")
+            h.write("q")
+            h.press("Enter")
+            h.await_exit()
+        files = list(tmp_path.iterdir())
+        assert len(files) == 1
+        assert files[0].name.startswith("loop-")
+        built.add(files[0].stat().st_ino)
+    assert len(built) == 1  # the second run played the cached loop
+
+
+def test_pymatrix_loop_quit_while_building(tmp_path):
+    with Runner(*pymatrix_run("--loop", "30", "--loop_cache",
+                              str(tmp_path))) as h:
+        h.await_text("Building")
+        h.write("q")
+        h.press("Enter")
+        h.await_exit()
+    assert not list(tmp_path.iterdir())
+
+
+def test_pymatrix_asciicast(tmp_path):
+    path = tmp_path / "run.cast"
+    with Runner(*pymatrix_run("--test_mode", "-R2", "--asciicast",
+                              str(path))) as h:
+        h.default_timeout = 3
+        h.await_text("T")
+        h.await_exit()
+    with open(path, encoding="utf-8") as f:
+        assert json.loads(f.readline())["version"] == 2
+        assert any("T" in json.loads(line)[2] for line in f)
+
+
+def test_pymatrix_status_line():
+    with Runner(*pymatrix_run("--test_mode", "--status",
+                              "--cpu_budget", "50")) as h:
+        h.await_text("dropped")
+        h.await_text("cpu")
+        h.write("S")
+        h.press("Enter")
+        sleep(0.5)
+        assert "dropped" not in h.screenshot()
+
+
 @pytest.mark.parametrize("test_value", ["-v", "--reverse"])
 def test_pymatrix_reverse(test_value):
     with Runner(*pymatrix_run("--test_mode", test_value),
@@ -758,9 +882,9 @@ def test_pymatrix_change_direction_from_down_to_right():
         h.await_text("T")
         sleep(0.1)
         h.press("Right")
-        sleep(0.3)
-        h.await_text("T")
         sleep(0.1)
+        assert "T" in h.screenshot()  # the screen is not cleared
+        sleep(1.5)  # the lines going down run off
         sc = h.screenshot()
         lines = []
         for line in sc.splitlines():
@@ -779,22 +903,19 @@ def test_pymatrix_change_direction_from_down_to_left():
         h.await_text("T")
         sleep(0.1)
         h.press("Left")
-        sleep(0.3)
-        h.await_text("T")
         sleep(0.1)
+        assert "T" in h.screenshot()  # the screen is not cleared
+        sleep(3.5)  # the lines going down run off
         sc = h.screenshot()
         lines = []
         for line in sc.splitlines():
             lines.append(line)
-        column_left = []
         column_right = []
         for line in lines:
             if len(line) == 0:
                 continue
-            column_left.append(line[0])
-            column_right.append(line[18])
+            column_right.append(line[18:19])
         assert "T" in column_right
-        assert "T" not in column_left
 
 
 def test_pymartix_change_direction_from_right_to_down():
@@ -804,9 +925,9 @@ def test_pymartix_change_direction_from_right_to_down():
         h.await_text("T")
         sleep(0.1)
         h.press("Down")
-        sleep(0.3)
-        h.await_text("T")
         sleep(0.1)
+        assert "T" in h.screenshot()  # the screen is not cleared
+        sleep(2.5)  # the lines going right run off
         sc = h.screenshot()
         lines = []
         for line in sc.splitlines():
@@ -821,9 +942,9 @@ def test_pymatrix_scroll_right_default_key():
         h.await_text("T")
         sleep(0.1)
         h.press("d")
-        sleep(0.3)
-        h.await_text("T")
         sleep(0.1)
+        assert "T" in h.screenshot()  # the screen is not cleared
+        sleep(2.5)  # the lines going right run off
         sc = h.screenshot()
         lines = []
         for line in sc.splitlines():
@@ -868,15 +989,15 @@ def test_pymatrix_change_dir():
         assert "T" not in lines[-2] and "T" not in lines[-1]
         sleep(0.1)
         h.press("v")
-        h.await_text("T")
-        sleep(0.2)
+        sleep(0.1)
+        assert "T" in h.screenshot()  # the screen is not cleared
+        sleep(2.5)  # the lines going down run off
         sc = h.screenshot()
         lines = []
         for line in sc.splitlines():
             lines.append(line)
         print(sc)
         assert "T" in lines[-2] or "T" in lines[-1]
-        assert "T" not in lines[0] and "T" not in lines[1]
 
 
 def test_pymatrix_change_dir_up_to_down():
@@ -893,14 +1014,14 @@ def test_pymatrix_change_dir_up_to_down():
         assert "T" not in lines[0] and "T" not in lines[1]
         sleep(0.1)
         h.press("v")
-        h.await_text("T")
-        sleep(0.2)
+        sleep(0.1)
+        assert "T" in h.screenshot()  # the screen is not cleared
+        sleep(2.5)  # the lines going up run off
         sc = h.screenshot()
         lines = []
         for line in sc.splitlines():
             lines.append(line)
         assert "T" in lines[0] or "T" in lines[1]
-        assert "T" not in lines[-2] and "T" not in lines[-1]
 
 
 def test_pymatrix_change_dir_up_to_down_default_key():
@@ -917,14 +1038,21 @@ def test_pymatrix_change_dir_up_to_down_default_key():
         assert "T" not in lines[0] and "T" not in lines[1]
         sleep(0.1)
         h.press("d")
-        h.await_text("T")
-        sleep(0.2)
+        sleep(0.1)
+        assert "T" in h.screenshot()  # the screen is not cleared
+        sleep(2.5)  # the lines going up run off
         sc = h.screenshot()
         lines = []
         for line in sc.splitlines():
             lines.append(line)
         assert "T" in lines[0] or "T" in lines[1]
-        assert "T" not in lines[-2] and "T" not in lines[-1]
+
+
+def await_blank(h, chars, timeout=3):
+    end = time.monotonic() + timeout
+    while any(char in h.screenshot() for char in chars):
+        assert time.monotonic() < end
+        sleep(0.05)
 
 
 def test_pymatrix_clear_screen():
@@ -933,9 +1061,10 @@ def test_pymatrix_clear_screen():
         h.await_text("T")
         h.press("w")
         h.press("Enter")
-        sleep(0.5)
-        sc = h.screenshot()
-        assert "T" not in sc
+        assert "T" in h.screenshot()  # the lines run off
+        await_blank(h, ["T"])
+        sleep(1)
+        assert "T" not in h.screenshot()
         h.await_text("T")
 
 
@@ -946,11 +1075,7 @@ def test_pymatrix_clear_screen_katakana():
         h.await_text("0")
         h.press("w")
         h.press("Enter")
-        sleep(0.5)
-        sc = h.screenshot()
-        assert "T" not in sc
-        assert "ﾎ" not in sc
-        assert "0" not in sc
+        await_blank(h, ["T", "ﾎ", "0"])
         h.await_text("ﾎ")
         h.await_text("0")
 
@@ -978,7 +1103,7 @@ def test_pymatrix_restore_defaults_delay():
 
 @pytest.mark.parametrize("test_value", ["1", "100", "40", "255", "128"])
 def test_pymatrix_valid_color_number(test_value):
-    cmd = f"TERM=xterm-256color python3 pymatrix/pymatrix.py --test_mode" \
+    cmd = f"TERM=xterm-256color python3 -m pymatrix.pymatrix --test_mode" \
           f" --color_number {test_value}"
     with Runner("bash") as h:
         h.await_text("$")
@@ -991,7 +1116,7 @@ def test_pymatrix_valid_color_number(test_value):
 
 @pytest.mark.parametrize("test_value", ["0", "A", "blue", "256"])
 def test_pymatrix_invalid_color_number(test_value):
-    cmd = f"TERM=xterm-256color python3 pymatrix/pymatrix.py --test_mode" \
+    cmd = f"TERM=xterm-256color python3 -m pymatrix.pymatrix --test_mode" \
           f" --color_number {test_value}"
     with Runner("bash") as h:
         h.await_text("$")
@@ -1004,7 +1129,7 @@ def test_pymatrix_invalid_color_number(test_value):
 
 
 def test_pymatrix_command_line_italic():
-    cmd = f"TERM=xterm-256color python3 pymatrix/pymatrix.py --test_mode -j"
+    cmd = f"TERM=xterm-256color python3 -m pymatrix.pymatrix --test_mode -j"
     with Runner("bash") as h:
         h.await_text("$")
         h.write("clear")
@@ -1015,7 +1140,7 @@ def test_pymatrix_command_line_italic():
 
 
 def test_pymatrix_command_line_italic_reverse():
-    cmd = f"TERM=xterm-256color python3 pymatrix/pymatrix.py --test_mode -j -v"
+    cmd = f"TERM=xterm-256color python3 -m pymatrix.pymatrix --test_mode -j -v"
     with Runner("bash") as h:
         h.await_text("$")
         h.write("clear")
@@ -1026,7 +1151,7 @@ def test_pymatrix_command_line_italic_reverse():
 
 
 def test_pymatrix_command_line_italic_zero_one():
-    cmd = f"TERM=xterm-256color python3 pymatrix/pymatrix.py -z -j -v"
+    cmd = f"TERM=xterm-256color python3 -m pymatrix.pymatrix -z -j -v"
     with Runner("bash") as h:
         h.await_text("$")
         h.write("clear")
@@ -1416,3 +1541,750 @@ def test_pymatrix_main_list_commands(capsys):
     assert "Commands available during run" in captured_output
     assert "Delay" in captured_output
     assert "Cycle color delay" in captured_output
+
+
+def test_read_keys():
+    screen = mock.Mock()
+    screen.getch.side_effect = [102, 113, -1]
+    keys = pymatrix.asyncio.Queue()
+    pymatrix.read_keys(screen, keys)
+    assert keys.get_nowait() == 102
+    assert keys.get_nowait() == 113
+    assert keys.empty()
+
+
+def test_wake_up_timer_queues_cutscene():
+    settings = pymatrix.MatrixSettings(test_mode=True, delay=0, wakeup=True)
+
+    async def first_cutscene():
+        cutscenes = pymatrix.asyncio.Queue()
+        timer = pymatrix.asyncio.create_task(pymatrix.wake_up_timer(
+            cutscenes, settings))
+        cutscene = await pymatrix.asyncio.wait_for(cutscenes.get(), 2)
+        timer.cancel()
+        return cutscene
+
+    cutscene = pymatrix.asyncio.run(first_cutscene())
+    assert isinstance(cutscene, pymatrix.Cutscene)
+    assert cutscene.length == pytest.approx(0.06 * 38.03)  # test mode
+
+
+def test_wake_up_timer_follows_speed():
+    # 20 frames at -d 9 are 2.6 seconds, at -d 0 0.1 seconds.
+    settings = pymatrix.MatrixSettings(test_mode=True, delay=9, wakeup=True)
+
+    async def first_cutscene():
+        cutscenes = pymatrix.asyncio.Queue()
+        timer = pymatrix.asyncio.create_task(
+            pymatrix.wake_up_timer(cutscenes, settings))
+        await pymatrix.asyncio.sleep(0.1)
+        settings.delay = 0
+        start = pymatrix.time.monotonic()
+        await pymatrix.asyncio.wait_for(cutscenes.get(), 2)
+        timer.cancel()
+        return pymatrix.time.monotonic() - start
+
+    assert pymatrix.asyncio.run(first_cutscene()) < 0.5
+
+
+def test_wake_up_timer_off():
+    settings = pymatrix.MatrixSettings(test_mode=True, delay=0)
+
+    async def no_cutscene():
+        cutscenes = pymatrix.asyncio.Queue()
+        timer = pymatrix.asyncio.create_task(
+            pymatrix.wake_up_timer(cutscenes, settings))
+        await pymatrix.asyncio.sleep(0.3)
+        timer.cancel()
+        return cutscenes.empty()
+
+    assert pymatrix.asyncio.run(no_cutscene())
+
+
+def test_wake_up_neo():
+    cutscene = pymatrix.wake_up_neo(False)
+    text = "".join(letter or "\n" for _, _, letter in cutscene.events)
+    assert text.split() == ["Wake", "up,", "Neo...", "The", "Matrix", "has",
+                            "you...", "Follow", "the", "white", "rabbit.",
+                            "Knock,", "knock,", "Neo."]
+    assert cutscene.next_time() == 3
+    assert cutscene.length == pytest.approx(38.03)
+
+
+def test_wait_for_key():
+    async def freeze():
+        keys = pymatrix.asyncio.Queue()
+        stop = pymatrix.asyncio.Event()
+        for ch in [97, 98, 102, 113]:
+            keys.put_nowait(ch)
+        ch = await pymatrix.wait_for_key(keys, stop, [102, 113])
+        return ch, keys.qsize()
+
+    assert pymatrix.asyncio.run(freeze()) == (102, 1)
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ((2, 0, 0), "\x1b[0;32;40m"), ((7, 0, 1), "\x1b[0;1;37;40m"),
+    ((40, 16, 3), "\x1b[0;1;3;38;5;40;48;5;16m"),
+    ((-1, -1, 0), "\x1b[0;39;49m")
+])
+def test_sgr(test_value, expected_result):
+    assert common.sgr(test_value) == expected_result
+
+
+def test_ansi_cells():
+    cells = {(1, 2): ("b", 2), (0, 0): ("a", 1), (1, 1): ("c", 2)}
+    result = pymatrix.ansi_cells(cells, lambda attr: f"<{attr}>")
+    assert result == "\x1b[1;1H<1>a\x1b[2;2H<2>cb"
+
+
+def test_ansi_cells_empty():
+    assert pymatrix.ansi_cells({}, str) == ""
+
+
+def test_headless_asciicast(tmp_path):
+    path = tmp_path / "run.cast"
+    pymatrix.main(["--headless", "-R", "5", "--asciicast", str(path),
+                   "--size", "40x20"])
+    assert pymatrix.Colors.headless is False
+    with open(path, encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        events = [json.loads(line) for line in f]
+    assert (header["width"], header["height"]) == (40, 20)
+    assert events[-1][0] == pytest.approx(5, abs=0.1)
+    assert all(a[0] <= b[0] for a, b in zip(events, events[1:]))
+
+
+def test_headless_ansi_same_as_asciicast(tmp_path):
+    cast = tmp_path / "run.cast"
+    ansi = tmp_path / "run.ansi"
+    pymatrix.main(["--headless", "-R", "5", "--asciicast", str(cast),
+                   "--ansi", str(ansi), "--size", "40x20"])
+    with open(cast, encoding="utf-8") as f:
+        f.readline()
+        events = [json.loads(line) for line in f]
+    assert ansi.read_text(encoding="utf-8") == "".join(
+        data for _, kind, data in events if kind == "o")
+
+
+def test_headless_frames(capsys, tmp_path):
+    cast = tmp_path / "run.cast"
+    pymatrix.main(["--frames", "50", "--asciicast", str(cast), "--ansi",
+                   str(tmp_path / "run.ansi"), "-d", "4"])
+    report = capsys.readouterr().err
+    assert re.match(r"50 frames in [\d.]+ seconds, \d+ frames/s, "
+                    r"[\d.]+ MB/s of ANSI", report)
+    with open(cast, encoding="utf-8") as f:
+        events = [json.loads(line) for line in f][1:]
+    assert events[-1][0] == pytest.approx(50 * pymatrix.DELAY_SPEED[4])
+
+
+def test_not_a_tty_writes_ansi_to_stdout(capfd):
+    with mock.patch.object(pymatrix.sys.stdout, "isatty", return_value=False):
+        pymatrix.main(["-R", "1", "--size", "40x20"])
+    out, err = capfd.readouterr()
+    assert out.startswith("\x1b[?25l\x1b[")
+    assert out.endswith("\x1b[0m\x1b[?25h")
+    assert "frames/s" in err
+
+
+@pytest.mark.parametrize("test_args", [[], ["--workers", "3"]])
+def test_headless_seed(capsys, tmp_path, test_args):
+    runs = []
+    for name in ["one.ansi", "two.ansi"]:
+        pymatrix.main(["--frames", "60", "--seed", "5", "--size", "40x20",
+                       "--ansi", str(tmp_path / name)] + test_args)
+        with open(tmp_path / name, "rb") as f:
+            runs.append(f.read())
+    assert runs[0] == runs[1]
+    screen = {}
+    apply_ansi(screen, runs[0])
+    assert any(char != " " for char in screen.values())
+    assert all(y < 20 and x < 40 for y, x in screen)
+    assert "60 frames in" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("test_args", [
+    [], ["-c"], ["-o"], ["-a", "-b"], ["--record", "{}.pyrec"],
+])
+def test_one_worker_same_as_render_loop(capsys, tmp_path, test_args):
+    runs = []
+    for name, workers in [("serial", []), ("workers", ["--workers", "1"])]:
+        path = tmp_path / name
+        pymatrix.main(["--frames", "600", "--seed", "5", "--size", "40x20",
+                       "--ansi", f"{path}.ansi"] + workers
+                      + [arg.format(path) for arg in test_args])
+        runs.append([p.read_bytes() for p in sorted(tmp_path.glob(
+            f"{name}.*"))])
+    assert runs[0] == runs[1]
+    assert "600 frames in" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("test_args, expected", [
+    (["--workers", "2", "--play", "x.pyrec"], "needs --headless"),
+    (["--workers", "2", "--headless", "-R", "1", "--scroll_left"],
+     "left or right"),
+    (["--workers", "2", "--headless", "-R", "1", "--static_glyphs"],
+     "--static_glyphs"),
+])
+def test_workers_errors(capsys, test_args, expected):
+    with mock.patch.object(pymatrix.sys.stdout, "isatty", return_value=True):
+        pymatrix.main(test_args)
+    assert expected in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("test_args", [
+    [], ["-c", "-a"], ["--scroll_left"], ["-d", "0", "--max_fps", "20"],
+    ["--glyph_mutations", "5"], ["--status", "-d", "4", "--max_fps", "3"],
+])
+def test_jobs_same_as_one_process(capsys, tmp_path, test_args):
+    font = tmp_path / "font.bdf"
+    font.write_text("STARTFONT 2.1\nFONTBOUNDINGBOX 4 8 0 0\n"
+                    "STARTCHAR T\nENCODING 84\nBITMAP\n"
+                    + "F0\n" * 8 + "ENDCHAR\nENDFONT\n")
+    runs = []
+    for jobs in ["1", "3"]:
+        paths = [tmp_path / f"{jobs}.{name}" for name in ["ansi", "cast",
+                                                          "ppm"]]
+        pymatrix.main(["--frames", "120", "--seed", "3", "--jobs", jobs,
+                       "--ansi", str(paths[0]), "--asciicast", str(paths[1]),
+                       "--video", str(paths[2]), "--font", str(font),
+                       "--video_size", "160x128", "--video_fps", "10"]
+                      + test_args)
+        # The asciicast header holds the time of the run.
+        runs.append([paths[0].read_bytes(),
+                     paths[1].read_bytes().split(b"\n", 1)[1],
+                     paths[2].read_bytes()])
+        assert "120 frames in" in capsys.readouterr().err
+    assert runs[0] == runs[1]
+
+
+@pytest.mark.parametrize("test_args, expected", [
+    (["--jobs", "2", "--headless", "-R", "1"], "needs --frames"),
+    (["--jobs", "2", "--frames", "9", "--record", "x.pyrec"],
+     "only renders"),
+    (["--jobs", "2", "--frames", "9", "--workers", "2"], "only renders"),
+    (["--jobs", "2", "--frames", "9", "--cpu_budget", "50"], "--cpu_budget"),
+])
+def test_jobs_errors(capsys, test_args, expected):
+    pymatrix.main(test_args)
+    assert expected in capsys.readouterr().out
+
+
+def test_character_set_leaves_old_scrolling_alone():
+    pymatrix.OldScrollingLine.update_char_list(["T"])
+    settings = pymatrix.MatrixSettings(zero_one=True)
+    assert pymatrix.character_set(settings) == ["0", "1"]
+    assert pymatrix.OldScrollingLine.old_scroll_chr_list == ["T"]
+
+
+def test_render_loop_leaves_args_alone():
+    args = pymatrix.argument_parsing(["--headless", "--frames", "5", "-c"])
+    before = vars(args).copy()
+    pymatrix.Colors.headless = True
+    try:
+        asyncio.run(pymatrix.render_loop(
+            pymatrix.VirtualScreen(20, 30), args, asyncio.Queue(),
+            asyncio.Queue(), asyncio.Event()))
+    finally:
+        pymatrix.Colors.headless = False
+    assert vars(args) == before
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ("t 5 B", [116, 53, 66]), ("up down left right", [259, 258, 260, 261]),
+    ("^R ^[ ^W", [18, 27, 23]), ("", []),
+])
+def test_control_keys(test_value, expected_result):
+    assert pymatrix.control_keys(test_value) == expected_result
+
+
+@pytest.mark.parametrize("test_value", ["f", "tt", "^1", "sideways", "é"])
+def test_control_keys_invalid(test_value):
+    with pytest.raises(ValueError):
+        pymatrix.control_keys(test_value)
+
+
+class DeltaList:
+    """ Keeps the frames, and sends the next presses after each one. """
+    def __init__(self, clock, control, presses):
+        self.clock = clock
+        self.control = control
+        self.presses = iter(presses)
+        self.deltas = []
+        self.shown = []
+        self.times = []
+
+    def record(self, delta):
+        self.times.append(self.clock())
+        self.deltas.append((delta.redraw, dict(delta.cells)))
+        self.shown.append(sum(char != " " for char, _ in delta.shown.values()))
+        self.control.put_nowait(next(self.presses, []))
+
+    def close(self):
+        pass
+
+
+def run_controlled(commands, frames, presses=(), extra=()):
+    args = pymatrix.argument_parsing(["--headless", "--frames", str(frames)]
+                                     + list(extra))
+    control = asyncio.Queue()
+    for command in commands:
+        control.put_nowait(command)
+    clock = pymatrix.FrameClock()
+    deltas = DeltaList(clock, control, presses)
+    pymatrix.Colors.headless = True
+    try:
+        asyncio.run(pymatrix.render_loop(
+            pymatrix.VirtualScreen(20, 30), args, asyncio.Queue(),
+            asyncio.Queue(), asyncio.Event(), recorders=[deltas],
+            clock=clock, control=control))
+    finally:
+        pymatrix.Colors.headless = False
+    return deltas
+
+
+@pytest.mark.parametrize("test_value", [
+    [[ord("v")], [259, ord("r")]], [[ord("s")]], [[261], [258]],
+    [[ord("l")]], [[ord("v"), ord("d")]], [[ord("w")]],
+])
+def test_render_loop_commands_do_not_clear(test_value):
+    deltas = run_controlled([[]] * 5 + test_value, 20)
+    clears = [cells for redraw, cells in deltas.deltas
+              if redraw and not cells]
+    assert clears == []
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], 1), ([ord("v"), ord("v"), 261, 258, ord("l"), ord("l")], 1),
+    ([ord("r"), ord("t")], 1), ([ord("r")], 2), ([ord("r"), ord("y")], 2),
+])
+def test_render_loop_commands_redraw(test_value, expected_result):
+    deltas = run_controlled([test_value], 20)
+    assert [redraw for redraw, _ in deltas.deltas].count(True) == (
+        expected_result)
+
+
+def test_render_loop_redraws_capped():
+    # A color key on every frame for 100 frames, about 5.5 seconds.
+    presses = [[ord("r")], [ord("t")]] * 50
+    deltas = run_controlled([], 100, presses)
+    redraws = [redraw for redraw, _ in deltas.deltas].count(True)
+    assert 10 < redraws <= 1 + 5.5 * pymatrix.REPAINTS_PER_SECOND + 1
+
+
+def test_render_loop_max_fps():
+    # 200 frames of -d 0 is one second, written 10 times.
+    extra = ["-d", "0", "--seed", "5"]
+    every = run_controlled([], 200, extra=extra)
+    capped = run_controlled([], 200, extra=extra + ["--max_fps", "10"])
+    assert len(every.deltas) > 150
+    assert len(capped.deltas) <= 10
+    assert all(b - a >= 0.1 - 1e-9
+               for a, b in zip(capped.times, capped.times[1:]))
+    # Each merged frame shows the screen as it was at that time.
+    screens = {}
+    screen = {}
+    for when, (redraw, cells) in zip(every.times, every.deltas):
+        screen.update(cells)
+        screens[when] = dict(screen)
+    screen = {}
+    for when, (redraw, cells) in zip(capped.times, capped.deltas):
+        screen.update(cells)
+        assert screen == screens[when]
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], "red"), (["--disable_keys"], "green"),
+])
+def test_render_loop_drains_keys(test_value, expected_result):
+    args = pymatrix.argument_parsing(["--headless", "--frames", "20"]
+                                     + test_value)
+    settings = pymatrix.MatrixSettings.from_args(args)
+    keys = asyncio.Queue()
+    for ch in [ord("t"), ord("r"), ord("q")]:
+        keys.put_nowait(ch)
+    pymatrix.Colors.headless = True
+    try:
+        frames = asyncio.run(pymatrix.render_loop(
+            pymatrix.VirtualScreen(20, 30), args, keys, asyncio.Queue(),
+            asyncio.Event(), settings=settings))
+    finally:
+        pymatrix.Colors.headless = False
+    assert frames == 1
+    assert settings.color == expected_result
+
+
+def test_render_loop_cutscene():
+    deltas = run_controlled([[ord("w"), ord("A"), ord("k"), ord("e")]], 5)
+    text = "".join(char for redraw, cells in deltas.deltas
+                   for (y, x), (char, attr) in sorted(cells.items())
+                   if y == 1 and attr and not redraw)
+    assert "Wake up, Neo...The Matrix has you..." in text
+    assert deltas.times[-1] > 35  # the cutscene moved the clock on
+
+
+def test_render_loop_w_empties_screen():
+    deltas = run_controlled([[ord("w")]], 120)
+    empty = deltas.shown.index(0)
+    assert deltas.shown[empty + 1] > 0
+    assert deltas.times[empty + 1] - deltas.times[empty] >= 2
+    assert len(deltas.times) < 120  # the empty frames are not written
+
+
+def test_headless_needs_run_timer(capsys, tmp_path):
+    pymatrix.main(["--headless", "--asciicast", str(tmp_path / "run.cast")])
+    assert "Error --headless" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    (0, (0, 0, 0)), (2, (0, 205, 0)), (15, (255, 255, 255)),
+    (16, (0, 0, 0)), (40, (0, 215, 0)), (196, (255, 0, 0)),
+    (232, (8, 8, 8)), (255, (238, 238, 238))
+])
+def test_color_rgb(test_value, expected_result):
+    assert video.color_rgb(test_value) == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ((2, 0, 0), ((0, 205, 0), (0, 0, 0))),
+    ((2, 0, 1), ((0, 255, 0), (0, 0, 0))),
+    ((40, 16, 1), ((0, 215, 0), (0, 0, 0))),
+    ((-1, -1, 0), ((229, 229, 229), (0, 0, 0)))
+])
+def test_attr_rgb(test_value, expected_result):
+    assert video.attr_rgb(test_value) == expected_result
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ((0, 0, 0), (16, 128, 128)), ((255, 255, 255), (235, 128, 128)),
+    ((255, 0, 0), (81, 90, 240))
+])
+def test_rgb_yuv(test_value, expected_result):
+    result = (video.rgb_y(test_value) + video.rgb_cb(test_value)
+              + video.rgb_cr(test_value))
+    assert tuple(result) == expected_result
+
+
+def test_headless_video(tmp_path):
+    font = tmp_path / "font.bdf"
+    font.write_text("STARTFONT 2.1\nFONTBOUNDINGBOX 4 8 0 0\n"
+                    "STARTCHAR T\nENCODING 84\nBITMAP\n"
+                    + "F0\n" * 8 + "ENDCHAR\nENDFONT\n")
+    path = tmp_path / "run.y4m"
+    pymatrix.main(["--headless", "-R", "2", "--video", str(path),
+                   "--font", str(font), "--video_size", "80x80",
+                   "--video_fps", "10", "--test_mode"])
+    data = path.read_bytes()
+    header = b"YUV4MPEG2 W80 H80 F10:1 Ip A1:1 C444\n"
+    assert data.startswith(header)
+    frame_size = len(b"FRAME\n") + 80 * 80 * 3
+    assert (len(data) - len(header)) % frame_size == 0
+    assert 20 <= (len(data) - len(header)) // frame_size <= 21
+    assert bytes([213]) in data  # white lead characters
+
+
+def test_video_needs_font(capsys, tmp_path):
+    pymatrix.main(["--headless", "-R", "2", "--video",
+                   str(tmp_path / "run.y4m")])
+    assert "Error --video needs a --font" in capsys.readouterr().out
+
+
+def test_headless_framebuffer(tmp_path):
+    font = tmp_path / "font.bdf"
+    font.write_text("STARTFONT 2.1\nFONTBOUNDINGBOX 4 8 0 0\n"
+                    "STARTCHAR T\nENCODING 84\nBITMAP\n"
+                    + "F0\n" * 8 + "ENDCHAR\nENDFONT\n")
+    path = tmp_path / "fb"
+    path.write_bytes(b"\xaa" * 80 * 80 * 2)
+    start = pymatrix.time.monotonic()
+    with mock.patch.object(pymatrix.FramebufferWriter, "record",
+                           autospec=True) as record:
+        pymatrix.main(["--headless", "-R", "1", "--framebuffer", str(path),
+                       "--font", str(font), "--fb_size", "80x80",
+                       "--fb_bpp", "16", "--test_mode"])
+    assert pymatrix.time.monotonic() - start >= 0.9  # real time
+    assert record.call_count > 10
+    assert path.read_bytes() == bytes(80 * 80 * 2)  # cleared on close
+
+
+@pytest.mark.parametrize("test_args, message", [
+    ([], "Error --framebuffer needs a --font"),
+    (["--font", "font.bdf"], "Error --framebuffer needs --fb_size"),
+])
+def test_framebuffer_errors(capsys, tmp_path, test_args, message):
+    pymatrix.main(["--headless", "--framebuffer", str(tmp_path / "fb")]
+                  + test_args)
+    assert message in capsys.readouterr().out
+
+
+@pytest.mark.skipif(pymatrix.shared_memory is None,
+                    reason="needs multiprocessing.shared_memory")
+def test_headless_shared_memory():
+    name = f"pymatrix-test-{pymatrix.os.getpid()}"
+    thread = threading.Thread(target=pymatrix.main, args=(
+        ["--headless", "-R", "1", "--shared_memory", name,
+         "--size", "20x10", "--test_mode"],))
+    thread.start()
+    with mock.patch("multiprocessing.resource_tracker.unregister"):
+        for _ in range(100):
+            try:
+                reader = pymatrix.SharedGridReader(name)
+                break
+            except pymatrix.PyMatrixError:
+                pymatrix.time.sleep(0.01)
+        pymatrix.time.sleep(0.5)
+        frame, rows = reader.read()
+        reader.close()
+    thread.join()
+    assert frame > 1
+    assert len(rows) == 10 and len(rows[0]) == 20
+    assert any(char != " " for row in rows for char, *_ in row)
+    with pytest.raises(pymatrix.PyMatrixError):
+        pymatrix.SharedGridReader(name)  # removed at the end of the run
+
+
+def test_headless_serve():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    thread = threading.Thread(target=pymatrix.main, args=(
+        ["--headless", "-R", "1", "--serve", str(port), "--test_mode"],))
+    thread.start()
+    for _ in range(100):
+        try:
+            client = socket.create_connection(("127.0.0.1", port))
+            break
+        except OSError:
+            pymatrix.time.sleep(0.01)
+    with client:
+        data = b""
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    thread.join()
+    assert data.startswith(b"\x1b[?25l")
+    assert data.count(b"\x1b[2J") == 2  # the whole screen and the reset
+    assert data.endswith(b"\x1b[?25h")
+
+
+def test_framebuffer_layout(tmp_path):
+    assert pymatrix.framebuffer_layout(str(tmp_path / "fb")) == {}
+
+
+@pytest.fixture
+def ptys():
+    pairs = [pymatrix.os.openpty() for _ in range(2)]
+    for _, tty in pairs:
+        fcntl.ioctl(tty, termios.TIOCSWINSZ,
+                    struct.pack("HHHH", 10, 20, 0, 0))
+    yield [(master, pymatrix.os.ttyname(tty)) for master, tty in pairs]
+    for master, tty in pairs:
+        pymatrix.os.close(master)
+        pymatrix.os.close(tty)
+
+
+def test_headless_wall(ptys):
+    thread = threading.Thread(target=pymatrix.main, args=(
+        ["-R", "2", "-d", "0", "--wall_columns", "1", "--wall"]
+        + [path for _, path in ptys],))
+    thread.start()
+    data = {master: b"" for master, _ in ptys}
+    while thread.is_alive() or select.select(list(data), [], [], 0)[0]:
+        for master in select.select(list(data), [], [], 0.05)[0]:
+            data[master] += pymatrix.os.read(master, 65536)
+    thread.join()
+    reset = b"\x1b[0m\x1b[2J\x1b[H\x1b[?25h"
+    screens = []
+    for master, _ in ptys:
+        assert data[master].startswith(b"\x1b[?25l")
+        assert data[master].endswith(reset)
+        screen = {}
+        apply_ansi(screen, data[master][:-len(reset)])
+        assert all(y < 10 and x < 20 for y, x in screen)
+        screens.append(screen)
+    # Lines from the top tile carried on into the bottom one.
+    assert any(char != " " for char in screens[1].values())
+
+
+@pytest.mark.parametrize("test_args, expected", [
+    (["--wall", "a", "b", "c", "--wall_columns", "2"], "full rows"),
+    (["--wall", "a"], "--wall_tile"),
+])
+def test_wall_errors(capsys, tmp_path, test_args, expected):
+    pymatrix.main(test_args)
+    assert expected in capsys.readouterr().out
+
+
+def test_wall_tile_size(ptys, tmp_path):
+    assert pymatrix.wall_tile_size([path for _, path in ptys]) == (20, 10)
+    assert pymatrix.wall_tile_size([str(tmp_path / "missing")]) is None
+
+
+ANSI = re.compile(r"\x1b\[(\d+);(\d+)H|(\x1b\[[0-9;?]*[a-zA-Z])|(.)",
+                  re.S)
+
+
+def apply_ansi(screen, data, position=(0, 0)):
+    for match in ANSI.finditer(bytes(data).decode()):
+        if match.group(1):
+            position = (int(match.group(1)) - 1, int(match.group(2)) - 1)
+        elif match.group(3) == "\x1b[2J":
+            screen.clear()
+        elif match.group(4):
+            screen[position] = match.group(4)
+            position = (position[0], position[1] + 1)
+    return position
+
+
+@pytest.mark.parametrize("test_args", [[], ["-d0"], ["-o"], ["-l"]])
+def test_build_loop_seamless(tmp_path, test_args):
+    args = pymatrix.argument_parsing(["--loop", "0.05"] + test_args)
+    path = str(tmp_path / "loop.pyml")
+    pymatrix.Colors.headless = True
+    try:
+        assert pymatrix.asyncio.run(pymatrix.build_loop(
+            args, (24, 80), path, pymatrix.asyncio.Event()))
+    finally:
+        pymatrix.Colors.headless = False
+    cache = pymatrix.LoopCache(path)
+    assert (cache.rows, cache.columns) == (24, 80)
+    assert cache.frames == round(3 / pymatrix.DELAY_SPEED[args.delay])
+    screen = {}
+    position = apply_ansi(screen, cache.blob(0))
+    first = {cell: char for cell, char in screen.items() if char != " "}
+    assert first
+    sizes = []
+    for number in range(1, cache.frames + 1):
+        sizes.append(len(cache.blob(number)))
+        position = apply_ansi(screen, cache.blob(number), position)
+    cache.close()
+    last = {cell: char for cell, char in screen.items() if char != " "}
+    assert last == first
+    # The last frame leads into the first like any other frame.
+    assert sizes[-1] < 2 * sorted(sizes)[len(sizes) // 2]
+
+
+def test_build_loop_stopped(tmp_path):
+    async def build():
+        stop = pymatrix.asyncio.Event()
+        stop.set()
+        return await pymatrix.build_loop(args, (24, 80), path, stop)
+
+    args = pymatrix.argument_parsing(["--loop", "1"])
+    path = str(tmp_path / "loop.pyml")
+    with mock.patch.object(pymatrix.Colors, "headless", True):
+        assert not pymatrix.asyncio.run(build())
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.parametrize("test_value, expected_result", [
+    ([], [ord("a"), ord("q")]), (["-s"], [ord("a")]),
+])
+def test_build_loop_quit_key(tmp_path, test_value, expected_result):
+    async def build():
+        keys = pymatrix.asyncio.Queue()
+        for ch in expected_result:
+            keys.put_nowait(ch)
+        return await pymatrix.build_loop(args, (24, 80), path,
+                                         pymatrix.asyncio.Event(), keys)
+
+    args = pymatrix.argument_parsing(["--loop", "1"] + test_value)
+    path = str(tmp_path / "loop.pyml")
+    with mock.patch.object(pymatrix.Colors, "headless", True):
+        assert not pymatrix.asyncio.run(build())
+    assert not list(tmp_path.iterdir())
+
+
+def test_build_loop_other_keys(tmp_path):
+    async def build():
+        keys = pymatrix.asyncio.Queue()
+        keys.put_nowait(ord("a"))
+        return await pymatrix.build_loop(args, (24, 80), path,
+                                         pymatrix.asyncio.Event(), keys)
+
+    args = pymatrix.argument_parsing(["--loop", "0.01"])
+    path = str(tmp_path / "loop.pyml")
+    with mock.patch.object(pymatrix.Colors, "headless", True):
+        assert pymatrix.asyncio.run(build())
+    assert os.path.exists(path)
+
+
+def test_prune_loop_cache(tmp_path):
+    for number in range(5):
+        path = tmp_path / f"loop-{number}.pyml"
+        path.write_bytes(b"PYML")
+        os.utime(path, (number, number))
+    (tmp_path / "other.txt").write_text("kept")
+    pymatrix.prune_loop_cache(str(tmp_path), 2)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "loop-3.pyml", "loop-4.pyml", "other.txt"]
+
+
+def test_prune_loop_cache_missing(tmp_path):
+    pymatrix.prune_loop_cache(str(tmp_path / "missing"))
+
+
+def test_loop_cache_path():
+    def path(argv, size=(24, 80)):
+        return pymatrix.loop_cache_path(
+            pymatrix.argument_parsing(["--loop", "1"] + argv), size)
+
+    assert path([]) == path(["--status", "-R", "5", "--cpu_budget", "20"])
+    assert path([]) != path(["-d", "2"])
+    assert path([]) != path(["-C", "red"])
+    assert path([]) != path(["--loop", "2"])
+    assert path([]) != path([], (30, 80))
+    assert path(["--loop_cache", "/tmp/loops"]).startswith("/tmp/loops/")
+
+
+def test_loop_cache_path_default(monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", "/tmp/cache")
+    args = pymatrix.argument_parsing(["--loop", "1"])
+    path = pymatrix.loop_cache_path(args, (24, 80))
+    assert path.startswith("/tmp/cache/pymatrix/loop-")
+
+
+def test_loop_headless(capsys):
+    pymatrix.main(["--headless", "--loop", "1", "-R", "1"])
+    assert "Error --loop can not be used" in capsys.readouterr().out
+
+
+def test_wait_for_key_timeout():
+    async def play():
+        keys = pymatrix.asyncio.Queue()
+        stop = pymatrix.asyncio.Event()
+        keys.put_nowait(97)
+        first = await pymatrix.wait_for_key(keys, stop, timeout=0.05)
+        second = await pymatrix.wait_for_key(keys, stop, timeout=0.05)
+        return first, second
+
+    assert pymatrix.asyncio.run(play()) == (97, None)
+
+
+def test_wait_for_key_stop():
+    async def freeze():
+        keys = pymatrix.asyncio.Queue()
+        stop = pymatrix.asyncio.Event()
+        keys.put_nowait(97)
+        pymatrix.asyncio.get_running_loop().call_later(0.05, stop.set)
+        return await pymatrix.wait_for_key(keys, stop, [102])
+
+    assert pymatrix.asyncio.run(freeze()) is None
+
+
+def test_wait_for_key_cancelled():
+    async def cancel():
+        keys = pymatrix.asyncio.Queue()
+        wait = pymatrix.asyncio.ensure_future(pymatrix.wait_for_key(
+            keys, pymatrix.asyncio.Event()))
+        await pymatrix.asyncio.sleep(0.01)
+        wait.cancel()
+        await pymatrix.asyncio.sleep(0.01)
+        keys.put_nowait(113)
+        await pymatrix.asyncio.sleep(0.01)
+        return keys.qsize()
+
+    assert pymatrix.asyncio.run(cancel()) == 1
@@ -0,0 +1,80 @@
+import os
+import struct
+from unittest import mock
+
+import pytest
+
+from pymatrix import pymatrix
+
+PALETTE = {1: (2, 0), 10: (15, 0)}
+COLORS = pymatrix.Palette(PALETTE)
+
+pytestmark = pytest.mark.skipif(pymatrix.shared_memory is None,
+                                reason="needs multiprocessing.shared_memory")
+
+
+@pytest.fixture(autouse=True)
+def resource_tracker():
+    # The writer and reader share the resource tracker of the test process.
+    with mock.patch("multiprocessing.resource_tracker.unregister"):
+        yield
+
+
+@pytest.fixture
+def writer():
+    with mock.patch.object(pymatrix, "color_palette", return_value=PALETTE):
+        with mock.patch.object(pymatrix.Colors, "pair_number",
+                               side_effect=lambda attr: attr & 0xff):
+            grid = pymatrix.SharedGridWriter(f"pymatrix-test-{os.getpid()}",
+                                             (2, 3))
+            yield grid
+            grid.close()
+
+
+def delta(cells, redraw=False):
+    return pymatrix.FrameDelta((2, 3), cells, redraw, COLORS)
+
+
+def test_read(writer):
+    writer.record(delta({(1, 2): ("ｦ", 10)}, True))
+    reader = pymatrix.SharedGridReader(writer.memory.name)
+    frame, rows = reader.read()
+    reader.close()
+    assert frame == 1
+    assert rows == [[(" ", 2, 0, 0)] * 3,
+                    [(" ", 2, 0, 0)] * 2 + [("ｦ", 15, 0, 0)]]
+
+
+def test_read_waits_for_whole_frame(writer):
+    writer.record(delta({}, True))
+    reader = pymatrix.SharedGridReader(writer.memory.name)
+    writer.begin()
+    sequences = iter([1, 2, 3, 4, 4])
+    original = struct.unpack_from
+
+    def unpack_from(fmt, buffer, offset=0):
+        if offset == 8:
+            return (next(sequences),)
+        return original(fmt, buffer, offset)
+
+    with mock.patch.object(pymatrix.struct, "unpack_from",
+                           side_effect=unpack_from):
+        frame, _ = reader.read()
+    reader.close()
+    with pytest.raises(StopIteration):
+        next(sequences)  # the copy made at 2 was torn, the one at 4 is whole
+
+
+def test_not_a_grid():
+    memory = pymatrix.shared_memory.SharedMemory(create=True, size=64)
+    try:
+        with pytest.raises(pymatrix.PyMatrixError):
+            pymatrix.SharedGridReader(memory.name)
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def test_missing():
+    with pytest.raises(pymatrix.PyMatrixError):
+        pymatrix.SharedGridReader(f"pymatrix-missing-{os.getpid()}")
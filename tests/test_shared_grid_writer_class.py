@@ -0,0 +1,102 @@
+import os
+import struct
+from unittest import mock
+
+import pytest
+
+from pymatrix import pymatrix
+
+PALETTE = {1: (2, 0), 10: (15, 0)}
+COLORS = pymatrix.Palette(PALETTE)
+
+pytestmark = pytest.mark.skipif(pymatrix.shared_memory is None,
+                                reason="needs multiprocessing.shared_memory")
+
+
+@pytest.fixture
+def colors():
+    with mock.patch.object(pymatrix, "color_palette", return_value=PALETTE):
+        with mock.patch.object(pymatrix.Colors, "pair_number",
+                               side_effect=lambda attr: attr & 0xff):
+            yield
+
+
+@pytest.fixture
+def writer(colors):
+    grid = pymatrix.SharedGridWriter(f"pymatrix-test-{os.getpid()}", (2, 3))
+    yield grid
+    grid.close()
+
+
+def delta(cells, redraw=False):
+    return pymatrix.FrameDelta((2, 3), cells, redraw, COLORS)
+
+
+def cell(grid, y, x):
+    start = grid.cells_offset + (y * 3 + x) * pymatrix.SHARED_CELL.size
+    return pymatrix.SHARED_CELL.unpack_from(grid.buffer, start)
+
+
+def test_header(writer):
+    header = pymatrix.SHARED_HEADER.unpack_from(writer.buffer, 0)
+    glyphs = len(writer.GLYPHS)
+    assert header == (b"PYMS", 1, glyphs, 0, 0, 3, 2, 8)
+    assert writer.cells_offset % 8 == 0
+    table = struct.unpack_from(f"<{glyphs}I", writer.buffer, 32)
+    assert table[0] == ord(" ")
+    assert chr(table[writer.glyph_index["ｦ"]]) == "ｦ"
+
+
+def test_record(writer):
+    writer.record(delta({(1, 2): ("a", 10 + pymatrix.curses.A_BOLD)}, True))
+    assert cell(writer, 1, 2) == (writer.glyph_index["a"], 15, 0, 1)
+    assert cell(writer, 0, 0) == (0, 2, 0, 0)
+    assert struct.unpack_from("<QQ", writer.buffer, 8) == (2, 1)
+
+
+def test_record_only_changes(writer):
+    writer.record(delta({}, True))
+    writer.record(delta({(0, 0): ("a", 1)}))
+    assert cell(writer, 0, 0)[0] == writer.glyph_index["a"]
+    assert cell(writer, 0, 1)[0] == 0
+    assert struct.unpack_from("<QQ", writer.buffer, 8) == (4, 2)
+
+
+def test_redraw_page_rounded(writer):
+    # Some platforms round the segment up to a whole page.
+    buffer = writer.buffer
+    writer.buffer = memoryview(bytearray(len(buffer) + 4096))
+    try:
+        writer.record(delta({(1, 1): ("a", 1)}, True))
+        assert cell(writer, 1, 1)[0] == writer.glyph_index["a"]
+        assert not any(writer.buffer[writer.cells_end:])
+    finally:
+        writer.buffer = buffer
+
+
+def test_redraw_publishes_every_cell(writer):
+    writer.record(delta({(0, 0): ("a", 1)}))
+    writer.record(delta({(0, 1): ("b", 1)}, True))
+    assert cell(writer, 0, 0)[0] == 0
+    assert cell(writer, 0, 1)[0] == writer.glyph_index["b"]
+
+
+def test_cells_outside_skipped(writer):
+    writer.record(delta({(2, 0): ("a", 1), (0, 3): ("a", 1)}, True))
+    assert struct.unpack_from("<Q", writer.buffer, 16)[0] == 1
+
+
+def test_unknown_char_is_space(writer):
+    writer.record(delta({(0, 0): ("☃", 1)}, True))
+    assert cell(writer, 0, 0)[0] == 0
+
+
+def test_name_in_use(writer):
+    with pytest.raises(pymatrix.PyMatrixError):
+        pymatrix.SharedGridWriter(writer.memory.name, (2, 3))
+
+
+def test_needs_shared_memory():
+    with mock.patch.object(pymatrix, "shared_memory", None):
+        with pytest.raises(pymatrix.PyMatrixError):
+            pymatrix.SharedGridWriter("pymatrix-test", (2, 3))
@@ -403,26 +403,39 @@ def test_okay_to_delete_left_true():
     assert ok_delete is True
 
 
-def test_async_scroll_turn():
+def test_moves():
     line = pymatrix.SingleLine(0, 5, 20, 6, "down")
-    line.async_scroll_rate = 1
-    turn = line.async_scroll_turn()
-    assert turn is False
-    turn = line.async_scroll_turn()
-    assert turn is True
-    turn = line.async_scroll_turn()
-    assert turn is False
+    line.speed = pymatrix.SPEED_ONE // 2
+    assert line.moves(pymatrix.SPEED_ONE) == 0
+    assert line.moves(pymatrix.SPEED_ONE) == 1
+    assert line.moves(pymatrix.SPEED_ONE) == 0
+    assert line.moves(4 * pymatrix.SPEED_ONE) == 2
 
 
-def test_async_scroll_turn_right():
+def test_moves_right():
     line = pymatrix.SingleLine(0, 5, 20, 6, "right")
-    line.async_scroll_rate = 1
-    turn = line.async_scroll_turn()
-    assert turn is False
-    turn = line.async_scroll_turn()
-    assert turn is True
-    turn = line.async_scroll_turn()
-    assert turn is False
+    line.speed = pymatrix.SPEED_ONE // 4
+    assert [line.moves(pymatrix.SPEED_ONE) for _ in range(8)] == [
+        0, 0, 0, 1, 0, 0, 0, 1]
+
+
+def test_moves_any_frame_rate():
+    # The same time in frames of half or a quarter of the length.
+    half = pymatrix.SingleLine(0, 5, 20, 6, "down")
+    quarter = pymatrix.SingleLine(0, 5, 20, 6, "down")
+    half.speed = quarter.speed = 40000
+    moves = [half.moves(pymatrix.SPEED_ONE // 2) for _ in range(40)]
+    assert sum(moves) == sum(quarter.moves(pymatrix.SPEED_ONE // 4)
+                             for _ in range(80))
+    assert sum(moves) == 20 * 40000 // pymatrix.SPEED_ONE
+
+
+def test_speed_range():
+    speeds = {pymatrix.SingleLine(0, 5, 20, 6, "down").speed
+              for _ in range(200)}
+    assert min(speeds) >= pymatrix.SPEED_ONE // 5
+    assert max(speeds) <= pymatrix.SPEED_ONE
+    assert len(speeds) > 100
 
 
 def test_single_line_class_down_init():
@@ -431,8 +444,8 @@ def test_single_line_class_down_init():
         assert line.direction == "down"
         assert line.height == 4
         assert line.x == 5
-        assert line.async_scroll_count == 0
-        assert line.async_scroll_rate == 3
+        assert line.travel == 0
+        assert line.speed == 3
         assert line.line_color_number == 3
         assert line.lead_y == 0
         assert line.y == -1
@@ -445,8 +458,8 @@ def test_single_line_class_up_init():
         assert line.direction == "up"
         assert line.height == 4
         assert line.x == 5
-        assert line.async_scroll_count == 0
-        assert line.async_scroll_rate == 3
+        assert line.travel == 0
+        assert line.speed == 3
         assert line.line_color_number == 3
         assert line.lead_y == 4
         assert line.y == 5
@@ -461,8 +474,8 @@ def test_single_line_class_right_init():
         assert line.width == 5
         assert line.x == -1
         assert line.y == 5
-        assert line.async_scroll_count == 0
-        assert line.async_scroll_rate == 3
+        assert line.travel == 0
+        assert line.speed == 3
         assert line.line_color_number == 3
         assert line.lead_x == 0
         assert line.last_x == -3
@@ -478,8 +491,8 @@ def test_single_line_class_left_init():
         assert line.width == 5
         assert line.x == 5
         assert line.y == 5
-        assert line.async_scroll_count == 0
-        assert line.async_scroll_rate == 3
+        assert line.travel == 0
+        assert line.speed == 3
         assert line.line_color_number == 3
         assert line.lead_y == 0
         assert line.last_y == 0
@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from pymatrix import pymatrix
+
+
+def delta(cells):
+    return pymatrix.FrameDelta((2, 3), cells, False, None)
+
+
+def test_put_and_wait():
+    frames = []
+    writer = pymatrix.SinkWriter(lambda seconds, frame: frames.append(
+        (seconds, frame.cells)))
+    writer.put(0.0, delta({(0, 0): ("a", 1)}))
+    writer.put(0.5, delta({(0, 1): ("b", 1)}))
+    writer.wait()
+    assert frames == [(0.0, {(0, 0): ("a", 1)}), (0.5, {(0, 1): ("b", 1)})]
+    writer.close()
+    assert not writer.thread.is_alive()
+
+
+def test_slow_output_merges_frames():
+    started = threading.Event()
+    release = threading.Event()
+    frames = []
+
+    def write(seconds, frame):
+        started.set()
+        release.wait()
+        frames.append((seconds, frame.cells))
+
+    writer = pymatrix.SinkWriter(write, max_frames=1)
+    writer.put(0.0, delta({(0, 0): ("a", 1)}))
+    started.wait()
+    writer.put(0.1, delta({(0, 1): ("b", 1)}))
+    writer.put(0.2, delta({(0, 1): ("c", 1), (1, 0): ("d", 1)}))
+    writer.put(0.3, delta({(1, 1): ("e", 1)}))
+    assert writer.merged == 2
+    release.set()
+    writer.close()
+    assert frames == [
+        (0.0, {(0, 0): ("a", 1)}),
+        (0.3, {(0, 1): ("c", 1), (1, 0): ("d", 1), (1, 1): ("e", 1)})]
+
+
+def test_block_waits_instead_of_merging():
+    frames = []
+
+    def write(seconds, frame):
+        pymatrix.time.sleep(0.001)
+        frames.append(seconds)
+
+    writer = pymatrix.SinkWriter(write, max_frames=1, block=True)
+    for i in range(20):
+        writer.put(i, delta({}))
+    writer.close()
+    assert writer.merged == 0
+    assert frames == list(range(20))
+
+
+def test_error_raised_on_put():
+    writer = pymatrix.SinkWriter(lambda seconds, frame: 1 / 0)
+    writer.put(0.0, delta({}))
+    writer.wait()
+    with pytest.raises(ZeroDivisionError):
+        writer.put(0.1, delta({}))
+    writer.close()
@@ -0,0 +1,54 @@
+from unittest import mock
+
+import pytest
+
+from pymatrix import pymatrix
+
+
+@pytest.fixture
+def palette():
+    with mock.patch.object(pymatrix.Colors, "pair_number",
+                           side_effect=lambda attr: attr & 0xff):
+        yield pymatrix.Palette({1: (2, 0), 10: (15, 0)})
+
+
+def tile(palette, cells, redraw=False):
+    output = pymatrix.TileOutput(True)
+    output.record(pymatrix.FrameDelta((2, 4), cells, redraw, palette))
+    return output.packed
+
+
+def test_empty(palette):
+    empty = pymatrix.TileOutput(False).packed
+    assert pymatrix.TileDelta((2, 4), [empty, empty], palette).empty()
+    assert pymatrix.TileDelta((2, 4), [empty, tile(palette, {})],
+                              palette).empty()
+    delta = pymatrix.TileDelta((2, 4), [empty, tile(palette, {}, True)],
+                               palette)
+    assert not delta.empty()
+
+
+def test_joins_tiles(palette):
+    first = {(0, 0): ("a", 1)}
+    second = {(1, 3): ("b", 10)}
+    delta = pymatrix.TileDelta((2, 4), [tile(palette, first),
+                                        tile(palette, second)], palette)
+    assert not delta.empty()
+    assert delta.cells == {(0, 0): ("a", 1), (1, 3): ("b", 10)}
+    assert delta.ansi() == (pymatrix.ansi_cells(first, palette.escape)
+                            + pymatrix.ansi_cells(second, palette.escape))
+
+
+def test_redraw(palette):
+    delta = pymatrix.TileDelta((2, 4), [tile(palette, {(0, 0): ("a", 1)}),
+                                        tile(palette, {}, True)], palette)
+    assert delta.redraw
+    assert delta.ansi() == ("\x1b[0;32;40m\x1b[2J"
+                            "\x1b[1;1H\x1b[0;32;40ma")
+
+
+def test_cells_unpacked_once(palette):
+    delta = pymatrix.TileDelta((2, 4), [tile(palette, {(0, 0): ("a", 1)})],
+                               palette)
+    assert delta.cells is delta.cells
+    assert delta.ansi() is delta.ansi()
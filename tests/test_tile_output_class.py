@@ -0,0 +1,60 @@
+from unittest import mock
+
+import pytest
+
+from pymatrix import pymatrix
+
+
+@pytest.fixture
+def palette():
+    with mock.patch.object(pymatrix.Colors, "pair_number",
+                           side_effect=lambda attr: attr & 0xff):
+        yield pymatrix.Palette({1: (2, 0), 10: (15, 0)})
+
+
+def unpack(packed):
+    redraw, length, count, pairs = pymatrix.TILE_HEADER.unpack_from(packed)
+    start = pymatrix.TILE_HEADER.size
+    text = packed[start:start + length].decode()
+    start += length
+    end = start + count * pymatrix.TILE_RECORD.size
+    records = list(pymatrix.TILE_RECORD.iter_unpack(packed[start:end]))
+    assert len(packed) == end + pairs * pymatrix.TILE_PAIR.size
+    return redraw, text, records
+
+
+def test_clear():
+    output = pymatrix.TileOutput(True)
+    assert unpack(output.packed) == (False, "", [])
+
+
+def test_record(palette):
+    output = pymatrix.TileOutput(False)
+    output.record(pymatrix.FrameDelta((2, 3), {(0, 1): ("a", 1)}, False,
+                                      palette))
+    assert unpack(output.packed) == (False, "\x1b[1;2H\x1b[0;32;40ma", [])
+    output.clear()
+    assert unpack(output.packed) == (False, "", [])
+
+
+def test_record_cells(palette):
+    output = pymatrix.TileOutput(True)
+    output.record(pymatrix.FrameDelta((2, 3), {(1, 2): ("ｱ", 10)}, True,
+                                      palette))
+    redraw, text, records = unpack(output.packed)
+    assert redraw
+    assert "\x1b[2J" not in text
+    assert text.endswith("ｱ")
+    assert records == [(1, 2, ord("ｱ"), 10)]
+
+
+def test_record_new_palette(palette):
+    output = pymatrix.TileOutput(False)
+    output.record(pymatrix.FrameDelta((2, 3), {(0, 1): ("a", 1)}, False,
+                                      palette))
+    assert pymatrix.TILE_HEADER.unpack_from(output.packed)[3] == 2
+    assert output.packed.endswith(
+        pymatrix.TILE_PAIR.pack(1, 2, 0) + pymatrix.TILE_PAIR.pack(10, 15, 0))
+    output.record(pymatrix.FrameDelta((2, 3), {(0, 1): ("b", 1)}, False,
+                                      palette))
+    assert pymatrix.TILE_HEADER.unpack_from(output.packed)[3] == 0
@@ -0,0 +1,45 @@
+import pytest
+
+from pymatrix import pymatrix
+
+
+@pytest.fixture
+def workers():
+    settings = pymatrix.MatrixSettings(test_mode=True)
+    workers = pymatrix.TileWorkers(2, (20, 40), settings, 5, True)
+    yield workers
+    workers.close()
+
+
+def test_frame(workers):
+    parts = workers.frame(True)
+    assert len(parts) == 2
+    for part in parts:
+        redraw, length, count, pairs = pymatrix.TILE_HEADER.unpack_from(
+            part)
+        assert redraw
+        assert pairs
+        assert len(part) == (pymatrix.TILE_HEADER.size + length
+                             + count * pymatrix.TILE_RECORD.size
+                             + pairs * pymatrix.TILE_PAIR.size)
+
+
+def test_frame_not_rendered(workers):
+    workers.frame(False)
+    parts = workers.frame(True)
+    assert parts == [pymatrix.TileOutput(True).packed] * 2
+
+
+def test_worker_stopped(workers):
+    process, _ = workers.workers[1]
+    process.kill()
+    process.join()
+    with pytest.raises(pymatrix.PyMatrixError, match="--workers"):
+        for _ in range(3):
+            workers.frame(True)
+
+
+def test_close(workers):
+    workers.frame(True)
+    workers.close()
+    assert not any(process.is_alive() for process, _ in workers.workers)
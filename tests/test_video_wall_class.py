@@ -0,0 +1,116 @@
+import asyncio
+import fcntl
+import os
+import select
+import struct
+import termios
+from unittest import mock
+
+import pytest
+
+from pymatrix import pymatrix
+
+PALETTE = {1: (2, 0), 10: (15, 0)}
+COLORS = pymatrix.Palette(PALETTE)
+CLEAR = b"\x1b[?25l\x1b[0;32;40m\x1b[2J"
+RESET = b"\x1b[0m\x1b[2J\x1b[H\x1b[?25h"
+
+
+@pytest.fixture(autouse=True)
+def colors():
+    with mock.patch.object(pymatrix.Colors, "pair_number",
+                           side_effect=lambda attr: attr & 0xff):
+        yield
+
+
+@pytest.fixture
+def ptys():
+    pairs = [os.openpty() for _ in range(4)]
+    for _, tty in pairs:
+        fcntl.ioctl(tty, termios.TIOCSWINSZ, struct.pack("HHHH", 2, 3, 0, 0))
+    yield [(master, os.ttyname(tty)) for master, tty in pairs]
+    for master, tty in pairs:
+        os.close(master)
+        os.close(tty)
+
+
+def delta(shown, cells, redraw=False):
+    return pymatrix.FrameDelta((4, 6), cells, redraw, COLORS, shown)
+
+
+def read(master):
+    """ Reads until the pty has been quiet for a moment. """
+    data = b""
+    while select.select([master], [], [], 0.05)[0]:
+        data += os.read(master, 4096)
+    return data
+
+
+def run_wall(ptys, *deltas):
+    async def show():
+        wall = pymatrix.VideoWall([path for _, path in ptys], 2, (3, 2))
+        await wall.start()
+        for frame in deltas:
+            wall.record(frame)
+            await asyncio.sleep(0.01)
+        wall.close()
+
+    asyncio.run(show())
+
+
+def test_split():
+    wall = pymatrix.VideoWall(["a", "b", "c", "d"], 2, (3, 2))
+    assert wall.split({(0, 0): ("a", 1), (1, 4): ("b", 1), (3, 5): ("c", 1),
+                       (4, 0): ("d", 1), (0, 6): ("e", 1)}) == [
+        {(0, 0): ("a", 1)}, {(1, 1): ("b", 1)}, {}, {(1, 2): ("c", 1)}]
+
+
+def test_record(ptys):
+    shown = {(1, 4): ("a", 1), (2, 0): ("b", 10)}
+    run_wall(ptys, delta(shown, dict(shown), True),
+             delta(shown, {(2, 0): ("b", 10)}))
+    assert read(ptys[0][0]) == CLEAR + RESET
+    assert read(ptys[1][0]) == CLEAR + b"\x1b[2;2H\x1b[0;32;40ma" + RESET
+    assert read(ptys[2][0]) == (CLEAR + b"\x1b[1;1H\x1b[0;38;5;15;40mb"
+                                + b"\x1b[1;1H\x1b[0;38;5;15;40mb" + RESET)
+    assert read(ptys[3][0]) == CLEAR + RESET
+
+
+def test_slow_tile_gets_whole_slice(ptys):
+    async def show():
+        wall = pymatrix.VideoWall([path for _, path in ptys], 2, (3, 2))
+        await wall.start()
+        wall.record(delta({}, {}, True))
+        await asyncio.sleep(0.01)
+        wall.tiles[1].pause_writing()
+        shown = {(0, 3): ("a", 1)}
+        wall.record(delta(shown, dict(shown)))
+        wall.tiles[1].resume_writing()
+        shown[(0, 4)] = ("b", 1)
+        wall.record(delta(shown, {(0, 4): ("b", 1)}))
+        await asyncio.sleep(0.01)
+        wall.close()
+
+    asyncio.run(show())
+    assert read(ptys[1][0]) == (CLEAR + CLEAR + b"\x1b[1;1H\x1b[0;32;40mab"
+                                + RESET)
+    assert read(ptys[0][0]) == CLEAR + RESET
+
+
+def test_closed_tile_skipped(ptys):
+    async def show():
+        wall = pymatrix.VideoWall([path for _, path in ptys], 2, (3, 2))
+        await wall.start()
+        wall.tiles[0].transport.close()
+        await asyncio.sleep(0.01)
+        wall.record(delta({}, {}, True))
+        wall.close()
+
+    asyncio.run(show())
+    assert read(ptys[1][0]) == CLEAR + RESET
+
+
+def test_open_error(tmp_path):
+    wall = pymatrix.VideoWall([str(tmp_path / "missing")], 1, (3, 2))
+    with pytest.raises(pymatrix.PyMatrixError):
+        asyncio.run(wall.start())
@@ -0,0 +1,147 @@
+from unittest import mock
+
+import pytest
+
+from pymatrix import pymatrix
+
+PALETTE = {1: (0, 0), 10: (15, 0)}
+COLORS = pymatrix.Palette(PALETTE)
+
+
+@pytest.fixture
+def colors():
+    with mock.patch.object(pymatrix, "color_palette", return_value=PALETTE):
+        with mock.patch.object(pymatrix.Colors, "pair_number",
+                               side_effect=lambda attr: attr & 0xff):
+            yield
+
+
+def atlas():
+    return pymatrix.GlyphAtlas(2, 2, {"A": (0b10, 0b01)})
+
+
+def delta(cells, redraw=False):
+    return pymatrix.FrameDelta((2, 2), cells, redraw, COLORS)
+
+
+def ppm_frames(path, width, height):
+    data = path.read_bytes()
+    header = f"P6\n{width} {height}\n255\n".encode()
+    size = len(header) + width * height * 3
+    assert len(data) % size == 0
+    frames = [data[i:i + size] for i in range(0, len(data), size)]
+    assert all(frame.startswith(header) for frame in frames)
+    return [frame[len(header):] for frame in frames]
+
+
+def test_ppm(tmp_path, colors):
+    path = tmp_path / "run.ppm"
+    clock = pymatrix.FrameClock()
+    video = pymatrix.VideoWriter(str(path), "ppm", (4, 2), atlas(), clock, 10)
+    video.record(delta({(0, 1): ("A", 10)}, True))
+    clock.tick(0.25)
+    video.record(delta({(0, 1): (" ", 0)}))
+    clock.tick(0.1)
+    video.close()
+    frames = ppm_frames(path, 4, 2)
+    assert len(frames) == 4
+    white = bytes([255, 255, 255])
+    black = bytes(3)
+    assert frames[0] == black * 2 + white + black + black * 3 + white
+    assert frames[2] == frames[0]
+    assert frames[3] == black * 8
+
+
+def test_frames_merged(tmp_path, colors):
+    path = tmp_path / "run.ppm"
+    clock = pymatrix.FrameClock()
+    video = pymatrix.VideoWriter(str(path), "ppm", (4, 2), atlas(), clock, 10)
+    video.record(delta({}, True))
+    clock.tick(0.01)
+    with mock.patch.object(video.canvas, "draw") as mock_draw:
+        video.record(delta({(0, 0): ("A", 10)}))
+        clock.tick(0.01)
+        video.record(delta({(0, 1): ("A", 10)}))
+        clock.tick(0.1)
+        video.record(delta({}))
+        video.writer.wait()
+    assert [c[0][0] for c in mock_draw.call_args_list] == [
+        {}, {(0, 0): ("A", 10), (0, 1): ("A", 10)}]
+    video.close()
+
+
+def test_y4m(tmp_path, colors):
+    path = tmp_path / "run.y4m"
+    clock = pymatrix.FrameClock()
+    video = pymatrix.VideoWriter(str(path), "y4m", (2, 2), atlas(), clock, 25)
+    video.record(delta({(0, 0): ("A", 10)}, True))
+    clock.tick(0.08)
+    video.close()
+    data = path.read_bytes()
+    header = b"YUV4MPEG2 W2 H2 F25:1 Ip A1:1 C444\n"
+    assert data.startswith(header)
+    frame = b"FRAME\n" + bytes([235, 16, 16, 235]) + bytes([128] * 8)
+    assert data[len(header):] == frame * 2
+
+
+def test_close_writes_one_frame(tmp_path, colors):
+    path = tmp_path / "run.ppm"
+    pymatrix.VideoWriter(str(path), "ppm", (4, 2), atlas(),
+                         pymatrix.FrameClock(), 10).close()
+    assert len(ppm_frames(path, 4, 2)) == 1
+
+
+def test_close_without_tail(tmp_path, colors):
+    path = tmp_path / "run.ppm"
+    clock = pymatrix.FrameClock()
+    video = pymatrix.VideoWriter(str(path), "ppm", (4, 2), atlas(), clock,
+                                 10, tail=False)
+    video.close()
+    assert path.read_bytes() == b""
+
+
+def test_seek_without_screen(tmp_path, colors):
+    path = tmp_path / "run.ppm"
+    clock = pymatrix.FrameClock()
+    video = pymatrix.VideoWriter(str(path), "ppm", (4, 2), atlas(), clock,
+                                 10)
+    clock.tick(0.5)
+    video.seek(0.25)
+    video.close()
+    assert ppm_frames(path, 4, 2) == [bytes(4 * 2 * 3)] * 2
+
+
+def test_parts_same_as_one_run(tmp_path, colors):
+    frames = [delta({(0, 1): ("A", 10)}, True), delta({(0, 0): ("A", 1)}),
+              delta({(0, 1): (" ", 0)}), delta({(0, 0): (" ", 0)})]
+    path = tmp_path / "run.y4m"
+    clock = pymatrix.FrameClock()
+    video = pymatrix.VideoWriter(str(path), "y4m", (4, 2), atlas(), clock, 10)
+    for frame in frames:
+        video.record(frame)
+        clock.tick(0.15)
+    video.close()
+    parts = [tmp_path / "0.y4m", tmp_path / "1.y4m"]
+    clock = pymatrix.FrameClock()
+    video = pymatrix.VideoWriter(str(parts[0]), "y4m", (4, 2), atlas(), clock,
+                                 10, tail=False)
+    for frame in frames[:2]:
+        video.record(frame)
+        clock.tick(0.15)
+    video.close()
+    clock = pymatrix.FrameClock()
+    video = pymatrix.VideoWriter(str(parts[1]), "y4m", (4, 2), atlas(), clock,
+                                 10, head=False)
+    clock.tick(0.3)
+    video.seek(0.3, delta({(0, 1): ("A", 10), (0, 0): ("A", 1)}, True))
+    for frame in frames[2:]:
+        video.record(frame)
+        clock.tick(0.15)
+    video.close()
+    assert parts[0].read_bytes() + parts[1].read_bytes() == path.read_bytes()
+
+
+def test_video_error(tmp_path):
+    with pytest.raises(pymatrix.PyMatrixError):
+        pymatrix.VideoWriter(str(tmp_path / "missing" / "run.ppm"), "ppm",
+                             (4, 2), atlas(), pymatrix.FrameClock(), 10)